@@ -0,0 +1,43 @@
+"""Add active_runs table
+
+Revision ID: 7c4f2a9d1b63
+Revises: 35b559533fd6
+Create Date: 2024-02-12 10:24:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4f2a9d1b63'
+down_revision: Union[str, None] = '35b559533fd6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Runs started by the bot and not answered yet, resumed after a restart
+    op.create_table(
+        'active_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=True),
+        sa.Column('assistant_id', sa.String(), nullable=True),
+        sa.Column('thread_id', sa.String(), nullable=True),
+        sa.Column('run_id', sa.String(), nullable=True),
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('run_id')
+    )
+    op.create_index(op.f('ix_active_runs_id'), 'active_runs', ['id'], unique=False)
+    op.create_index(op.f('ix_active_runs_conversation_id'), 'active_runs', ['conversation_id'], unique=False)
+    op.create_index(op.f('ix_active_runs_assistant_id'), 'active_runs', ['assistant_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_active_runs_assistant_id'), table_name='active_runs')
+    op.drop_index(op.f('ix_active_runs_conversation_id'), table_name='active_runs')
+    op.drop_index(op.f('ix_active_runs_id'), table_name='active_runs')
+    op.drop_table('active_runs')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the billing of a turn for growing threads.
+
+A turn is billed either from the token usage reported by the run, or, when the usage is
+missing, by listing the latest thread messages and tokenizing them with tiktoken. The
+fake OpenAI client answers instantly, so the measured time is the CPU time of billing.
+
+The usage-based billing should take the same time whatever the length of the thread,
+the tokenizing fallback grows with it until THREAD_MESSAGES_LIMIT messages are listed.
+
+Usage:
+    python3 -m benchmarks.billing_benchmark [turns]
+"""
+
+import asyncio
+import sys
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from lib.openai.assistant import Assistant
+from lib.openai.thread_run_manager import ThreadRunManager
+
+THREAD_LENGTHS = (10, 25, 50, 100)
+MESSAGE = ' '.join(['Meal plan with oatmeal, berries and a glass of kefir.'] * 20)  # About 260 tokens
+ANSWER = 'Sounds like a balanced breakfast.'
+ASSISTANT_ID = 'asst_benchmark'
+
+class FakeOpenAIClient:
+    """
+    Answers the thread listing and the assistant retrieval without any network access.
+    """
+
+    def __init__(self, thread_length):
+        message = SimpleNamespace(content=[SimpleNamespace(type='text', text=SimpleNamespace(value=MESSAGE))])
+        self.messages = [message] * min(thread_length, ThreadRunManager.THREAD_MESSAGES_LIMIT)
+        self.beta = SimpleNamespace(
+            threads=SimpleNamespace(messages=SimpleNamespace(list=self.list_messages)),
+            assistants=SimpleNamespace(retrieve=self.retrieve_assistant)
+        )
+
+    async def list_messages(self, thread_id, limit, order):
+        return SimpleNamespace(data=self.messages[:limit])
+
+    async def retrieve_assistant(self, assistant_id):
+        return SimpleNamespace(instructions='You are a helpful dietitian.')
+
+async def bill_turn(openai_client, usage):
+    conversation = SimpleNamespace(id=1, thread_id='thread_benchmark', assistant_id=ASSISTANT_ID, balance=Decimal(10))
+    manager = ThreadRunManager(openai_client, None, SimpleNamespace(bot=None), conversation, None, 1)
+    manager.output_texts = [ANSWER]
+    manager._record_usage(usage)
+    return await manager.calculate_turn_amount()
+
+async def measure(thread_length, with_usage, turns):
+    openai_client = FakeOpenAIClient(thread_length)
+    Assistant._shared_client = openai_client
+    usage = {'prompt_tokens': thread_length * 260, 'completion_tokens': 8} if with_usage else None
+    await bill_turn(openai_client, usage)  # Warm up the encoding
+    start_time = time.perf_counter()
+    for _ in range(turns):
+        await bill_turn(openai_client, usage)
+    return (time.perf_counter() - start_time) / turns
+
+async def main(turns):
+    print(f'Billing time per turn, average of {turns} turns')
+    print(f'{"messages":>9} {"run usage":>12} {"tokenizing":>12}')
+    for thread_length in THREAD_LENGTHS:
+        with_usage = await measure(thread_length, True, turns)
+        tokenizing = await measure(thread_length, False, turns)
+        print(f'{thread_length:>9} {with_usage * 1000:>9.3f} ms {tokenizing * 1000:>9.3f} ms')
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    asyncio.run(main(turns))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the per-message and per-tool-call dispatch overhead.
+
+Compares the previous dispatch (glob over the handlers directory plus importlib lookups
+for every message, inflection plus __import__ for every tool call) with the
+HandlerRegistry lookups built once at startup.
+
+Usage:
+    python3 -m benchmarks.dispatch_benchmark
+"""
+
+import glob
+import importlib
+import os
+import timeit
+import inflection
+from unittest.mock import Mock
+from lib.handler_registry import HandlerRegistry
+
+ITERATIONS = 10000
+HANDLERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib', 'telegram', 'message_handlers')
+
+def module_and_class_exist(module_name, class_name):
+    try:
+        module = importlib.import_module(module_name)
+        return hasattr(module, class_name)
+    except ModuleNotFoundError:
+        return False
+
+def dispatch_message_before(message):
+    handler_files = glob.glob(os.path.join(HANDLERS_DIR, '*.py'))
+    message_types = [os.path.basename(f)[:-11] for f in handler_files if not f.endswith(('__init__.py', 'base_handler.py'))]
+    for message_type in message_types:
+        if getattr(message, message_type):
+            module_name = f"lib.telegram.message_handlers.{message_type}_handler"
+            class_name = f"{message_type.capitalize()}Handler"
+            if module_and_class_exist(module_name, class_name):
+                module = importlib.import_module(module_name)
+                return getattr(module, class_name)
+    return None
+
+def dispatch_message_after(message):
+    return HandlerRegistry.get_message_handler(HandlerRegistry.get_message_type(message))
+
+def dispatch_tool_call_before(function_name):
+    module_name = inflection.underscore(function_name) + '_handler'
+    handler_class_name = inflection.camelize(function_name) + 'Handler'
+    module = __import__(f'lib.openai.function_handlers.{module_name}', fromlist=[handler_class_name])
+    return getattr(module, handler_class_name)
+
+def dispatch_tool_call_after(function_name):
+    return HandlerRegistry.get_function_handler(function_name)
+
+def report(name, before, after):
+    before_us = before / ITERATIONS * 1e6
+    after_us = after / ITERATIONS * 1e6
+    print(f'{name:<10} before: {before_us:8.2f} us/op   after: {after_us:8.2f} us/op   speedup: {before_us / after_us:6.1f}x')
+
+def main():
+    HandlerRegistry.setup()
+    message = Mock(document=None, photo=None, text=None, video=None, voice=Mock())
+
+    # Both implementations must resolve the same handler classes
+    assert dispatch_message_before(message) is dispatch_message_after(message)
+    assert dispatch_tool_call_before('generateImage') is dispatch_tool_call_after('generateImage')
+
+    report('message',
+           timeit.timeit(lambda: dispatch_message_before(message), number=ITERATIONS),
+           timeit.timeit(lambda: dispatch_message_after(message), number=ITERATIONS))
+    report('tool call',
+           timeit.timeit(lambda: dispatch_tool_call_before('generateImage'), number=ITERATIONS),
+           timeit.timeit(lambda: dispatch_tool_call_after('generateImage'), number=ITERATIONS))
+
+if __name__ == "__main__":
+    main()
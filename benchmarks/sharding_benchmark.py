@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the sharded dispatcher with 1 to N worker processes.
+
+Updates from different users are dispatched to workers running an echo bot against a
+local fake Telegram server. Every update costs CPU_WORK_SECONDS of pure Python work,
+like tokenizing a thread, so a single process is bound to one core and throughput
+should grow with the number of workers up to the number of CPU cores.
+
+Usage:
+    python3 -m benchmarks.sharding_benchmark [max_workers] [updates]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+from benchmarks.webhook_benchmark import FakeTelegramServer, HOST, TELEGRAM_PORT, TOKEN
+from lib.telegram.bots.bot_config import BotConfig
+from lib.telegram.sharded_dispatcher import ShardedDispatcher
+
+CPU_WORK_SECONDS = 0.005
+
+class EchoBot:
+    """
+    Minimal bot answering every message after some CPU-bound work.
+    """
+
+    def __init__(self, config: BotConfig):
+        self.application = (Application.builder()
+                            .token(config.telegram_bot_token)
+                            .base_url(f'http://{HOST}:{TELEGRAM_PORT}/bot')
+                            .concurrent_updates(32)
+                            .build())
+        self.application.add_handler(MessageHandler(filters.TEXT, self.echo))
+
+    async def start_processing(self, owns_chat=None) -> None:
+        await self.application.start()
+
+    async def stop_processing(self) -> None:
+        if self.application.running:
+            await self.application.stop()
+
+    async def echo(self, update: Update, context) -> None:
+        deadline = time.process_time() + CPU_WORK_SECONDS
+        while time.process_time() < deadline:
+            pass
+        await context.bot.send_message(update.message.chat_id, update.message.text)
+
+async def send_updates(telegram, dispatcher, user_ids):
+    answers = []
+    for user_id in user_ids:
+        text, data = telegram._create_update(chat_id=user_id)
+        telegram.created_at[text] = time.perf_counter()
+        dispatcher.dispatch(Update.de_json(data, None))
+        answers.append(telegram.answered[text])
+
+    # Fail instead of waiting forever for the answers of a worker that died
+    pending = asyncio.ensure_future(asyncio.gather(*answers))
+    while not pending.done():
+        await asyncio.wait({pending}, timeout=1)
+        if not pending.done():
+            dispatcher.check_workers()
+    pending.result()
+
+async def run_workers(telegram, workers, updates):
+    dispatcher = ShardedDispatcher(EchoBot, BotConfig('benchmark', TOKEN, None), workers)
+    dispatcher.start()
+    try:
+        # Warm up: wait until every worker has started and answered once
+        warm_up_users = {}
+        user_id = 10 ** 6
+        while len(warm_up_users) < workers:
+            update = Update.de_json({'update_id': 0, 'message': {
+                'message_id': 0, 'date': 0, 'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'}}}, None)
+            warm_up_users.setdefault(dispatcher.shard_for(update), user_id)
+            user_id += 1
+        await send_updates(telegram, dispatcher, warm_up_users.values())
+
+        start_time = time.perf_counter()
+        await send_updates(telegram, dispatcher, range(updates))
+        return updates / (time.perf_counter() - start_time)
+    finally:
+        await asyncio.to_thread(dispatcher.stop)
+
+async def main(max_workers, updates):
+    telegram = FakeTelegramServer()
+    await telegram.start()
+    try:
+        print(f'CPU cores: {os.cpu_count()}, CPU work per update: {CPU_WORK_SECONDS * 1000:.0f} ms')
+        baseline = None
+        workers = 1
+        while workers <= max_workers:
+            throughput = await run_workers(telegram, workers, updates)
+            baseline = baseline or throughput
+            print(f'{workers:>2} workers: {throughput:8.1f} updates/sec   speedup: {throughput / baseline:4.2f}x')
+            workers *= 2
+    finally:
+        await telegram.stop()
+
+if __name__ == "__main__":
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    asyncio.run(main(max_workers, updates))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark of streaming assistant runs against polling using a local fake OpenAI server.
+
+The fake server generates every answer like the model would: the first token after
+FIRST_TOKEN_DELAY seconds, then one token every TOKEN_INTERVAL seconds. A polled run is
+reported completed once the whole answer is generated, a streamed run sends the tokens
+as server-sent events while they are generated.
+
+Time to first token is the time between starting the run and the first part of the
+answer being sent to the Telegram chat, as recorded by ThreadRunManager's metrics.
+
+Usage:
+    python3 -m benchmarks.streaming_benchmark [runs]
+"""
+
+import asyncio
+import json
+import sys
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from aiohttp import web
+from openai import AsyncOpenAI
+from lib.metrics import Metrics
+from lib.openai.thread_run_manager import ThreadRunManager
+from lib.telegram.bots.bot_config import BotConfig
+
+HOST = '127.0.0.1'
+OPENAI_PORT = 8083
+FIRST_TOKEN_DELAY = 0.5
+TOKEN_INTERVAL = 0.025
+ANSWER = ' '.join(f'word{index}' for index in range(60))
+POLLING_ASSISTANT_ID = 'asst_polling'
+STREAMING_ASSISTANT_ID = 'asst_streaming'
+
+class FakeOpenAIServer:
+    """
+    Minimal stand-in for the Assistants API runs and messages endpoints.
+    """
+
+    def __init__(self):
+        self.runs = {}  # run id -> time the run was created
+        self.latest_runs = {}  # thread id -> id of its latest run, the author of the answer
+        self.runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/v1/threads/{thread_id}/runs', self.create_run)
+        app.router.add_get('/v1/threads/{thread_id}/runs/{run_id}', self.retrieve_run)
+        app.router.add_get('/v1/threads/{thread_id}/messages', self.list_messages)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, HOST, OPENAI_PORT).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def create_run(self, request):
+        body = await request.json()
+        thread_id = request.match_info['thread_id']
+        run_id = f'run_{uuid.uuid4().hex}'
+        self.runs[run_id] = time.perf_counter()
+        self.latest_runs[thread_id] = run_id
+        if not body.get('stream'):
+            return web.json_response(self._run(thread_id, run_id, 'queued'))
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        await self._send_event(response, 'thread.run.created', self._run(thread_id, run_id, 'queued'))
+        await asyncio.sleep(FIRST_TOKEN_DELAY)
+        for index, token in enumerate(ANSWER.split(' ')):
+            if index:
+                await asyncio.sleep(TOKEN_INTERVAL)
+                token = ' ' + token
+            await self._send_event(response, 'thread.message.delta', {
+                'id': 'msg_benchmark', 'object': 'thread.message.delta',
+                'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': token}}]}
+            })
+        await self._send_event(response, 'thread.message.completed', self._message(thread_id, run_id))
+        await self._send_event(response, 'thread.run.completed', self._run(thread_id, run_id, 'completed'))
+        await response.write(b'event: done\ndata: [DONE]\n\n')
+        return response
+
+    async def retrieve_run(self, request):
+        run_id = request.match_info['run_id']
+        generated = time.perf_counter() - self.runs[run_id] >= self.generation_time()
+        return web.json_response(self._run(request.match_info['thread_id'], run_id,
+                                           'completed' if generated else 'in_progress'))
+
+    async def list_messages(self, request):
+        thread_id = request.match_info['thread_id']
+        return web.json_response({'object': 'list', 'data': [self._message(thread_id, self.latest_runs.get(thread_id))],
+                                  'first_id': 'msg_benchmark', 'last_id': 'msg_benchmark', 'has_more': False})
+
+    @staticmethod
+    def generation_time():
+        return FIRST_TOKEN_DELAY + TOKEN_INTERVAL * (len(ANSWER.split(' ')) - 1)
+
+    @staticmethod
+    async def _send_event(response, event, data):
+        await response.write(f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode())
+
+    @staticmethod
+    def _run(thread_id, run_id, status):
+        return {'id': run_id, 'object': 'thread.run', 'thread_id': thread_id, 'assistant_id': 'asst_benchmark',
+                'status': status, 'created_at': int(time.time()), 'model': 'gpt-4', 'instructions': '',
+                'tools': [], 'file_ids': [], 'metadata': {}}
+
+    @staticmethod
+    def _message(thread_id, run_id):
+        return {'id': 'msg_benchmark', 'object': 'thread.message', 'thread_id': thread_id, 'run_id': run_id,
+                'role': 'assistant', 'created_at': int(time.time()), 'file_ids': [], 'metadata': {},
+                'content': [{'type': 'text', 'text': {'value': ANSWER, 'annotations': []}}]}
+
+class FakeTelegramBot:
+    """
+    Records the messages sent to the chat instead of sending them.
+    """
+
+    def __init__(self):
+        self.edits = 0
+
+    async def send_message(self, chat_id, text):
+        return SimpleNamespace(message_id=1, text=text)
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.edits += 1
+
+async def run_once(openai_client, assistant_id, bot):
+    conversation = SimpleNamespace(id=1, thread_id='thread_benchmark', assistant_id=assistant_id, balance=Decimal(10))
+    manager = ThreadRunManager(openai_client, None, SimpleNamespace(bot=bot), conversation, None, 1)
+    await manager.manage_run()
+
+async def main(runs):
+    server = FakeOpenAIServer()
+    await server.start()
+    openai_client = AsyncOpenAI(api_key='benchmark', base_url=f'http://{HOST}:{OPENAI_PORT}/v1')
+    BotConfig.register(BotConfig('polling', None, POLLING_ASSISTANT_ID))
+    BotConfig.register(BotConfig('streaming', None, STREAMING_ASSISTANT_ID, streaming_runs=True))
+    try:
+        print(f'Answer of {len(ANSWER.split(" "))} tokens generated in {server.generation_time():.2f} seconds, '
+              f'first token after {FIRST_TOKEN_DELAY:.2f} seconds')
+        for name, assistant_id in (('polling', POLLING_ASSISTANT_ID), ('streaming', STREAMING_ASSISTANT_ID)):
+            bot = FakeTelegramBot()
+            for _ in range(runs):
+                await run_once(openai_client, assistant_id, bot)
+            first_token = Metrics.get_histogram(f'{name}.run.{name}.time_to_first_token')
+            duration = Metrics.get_histogram(f'{name}.run.{name}.duration')
+            if first_token is None or duration is None:
+                raise RuntimeError(f'The {name} runs sent no answer to the chat, nothing to compare')
+            print(f'{name:>9}: time to first token avg {first_token.sum / first_token.count:5.2f} s, '
+                  f'max {first_token.max:5.2f} s   run duration avg {duration.sum / duration.count:5.2f} s   '
+                  f'message edits per run: {bot.edits / runs:.1f}')
+    finally:
+        await openai_client.close()
+        await server.stop()
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    asyncio.run(main(runs))
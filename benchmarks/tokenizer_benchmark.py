@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the per-message construction of the tokenizers.
+
+Compares three ways for the handlers, run manager and function handler of a message to
+get their tokenizer:
+
+- before: a Tokenizer per object, each calling tiktoken.encoding_for_model
+- registry: a Tokenizer per object, taking its encoding from the class-level registry
+- shared: the tokenizer shared per model by Tokenizer.get_shared
+
+A photo message builds a photo handler, a run manager and a function handler, so it
+used to create three tokenizers. tiktoken already caches the encodings internally, so
+the saving per message is a few microseconds: the point of the shared tokenizer is that
+no message loads or looks up an encoding, and the encodings are loaded at startup by
+Tokenizer.warm_up.
+
+Usage:
+    python3 -m benchmarks.tokenizer_benchmark
+"""
+
+import timeit
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import tiktoken
+from lib.openai.function_handlers.base_function_handler import BaseFunctionHandler
+from lib.openai.thread_run_manager import ThreadRunManager
+from lib.openai.tokenizer import Tokenizer
+from lib.telegram.message_handlers.photo_handler import PhotoHandler
+
+ITERATIONS = 10000
+GET_SHARED = Tokenizer.get_shared  # The handlers' get_shared is patched with each variant
+
+def tokenizer_before(model=Tokenizer.DEFAULT_MODEL):
+    tokenizer = Tokenizer.__new__(Tokenizer)
+    tokenizer.model = model
+    tokenizer.encoding = tiktoken.encoding_for_model(model)
+    return tokenizer
+
+def tokenizer_registry(model=Tokenizer.DEFAULT_MODEL):
+    return Tokenizer(model)
+
+def tokenizer_shared(model=Tokenizer.DEFAULT_MODEL):
+    return GET_SHARED(model)
+
+VARIANTS = (('before', tokenizer_before), ('registry', tokenizer_registry), ('shared', tokenizer_shared))
+
+def build_message_objects(openai_client, update, conversation):
+    PhotoHandler(openai_client, update, None, conversation)
+    ThreadRunManager(openai_client, update, None, conversation, None, 1)
+    BaseFunctionHandler(openai_client, update, None, conversation)
+
+def report(name, timings):
+    before_us = timings['before'] / ITERATIONS * 1e6
+    columns = []
+    for variant, seconds in timings.items():
+        us = seconds / ITERATIONS * 1e6
+        columns.append(f'{variant}: {us:7.2f} us/op ({before_us / us:4.1f}x)')
+    print(f'{name:<10} ' + '   '.join(columns))
+
+def main():
+    openai_client = Mock()
+    update = SimpleNamespace(message=SimpleNamespace(chat_id=1))
+    conversation = SimpleNamespace(id=1, thread_id='thread_benchmark', assistant_id='asst_benchmark')
+
+    Tokenizer.warm_up()
+    # All the implementations must count the same tokens
+    counts = {factory().num_tokens_from_string('Hello, world!') for _, factory in VARIANTS}
+    assert len(counts) == 1
+
+    report('tokenizer', {name: timeit.timeit(factory, number=ITERATIONS) for name, factory in VARIANTS})
+
+    message_timings = {}
+    for name, factory in VARIANTS:
+        with patch.object(Tokenizer, 'get_shared', factory):
+            message_timings[name] = timeit.timeit(
+                lambda: build_message_objects(openai_client, update, conversation), number=ITERATIONS)
+    report('message', message_timings)
+
+if __name__ == "__main__":
+    main()
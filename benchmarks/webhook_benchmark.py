@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark of webhook mode against long polling using a local fake Telegram server.
+
+The fake server implements the few Bot API methods the bot needs (getMe, getUpdates,
+setWebhook, deleteWebhook and sendMessage). Every update is answered by an echo handler,
+and the end-to-end latency is the time between the update being made available by the
+fake server and the sendMessage request arriving back at it.
+
+The fake server, the webhook sender and the bot share one process, so the throughput
+numbers mostly reflect the per-update HTTP overhead: polling fetches up to 100 updates
+per request while a webhook receives one update per request.
+
+Usage:
+    python3 -m benchmarks.webhook_benchmark [updates] [concurrency]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from aiohttp import ClientSession, web
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+from lib.telegram.webhook_server import WebhookServer
+
+TOKEN = '123456:benchmark'
+HOST = '127.0.0.1'
+TELEGRAM_PORT = 8081
+WEBHOOK_PORT = 8082
+SECRET_TOKEN = 'benchmark-secret'
+LATENCY_SAMPLES = 50
+MAX_WEBHOOK_CONNECTIONS = 40  # Telegram's default max_connections for webhooks
+
+class FakeTelegramServer:
+    """
+    Minimal stand-in for the Telegram Bot API.
+    """
+
+    def __init__(self):
+        self.pending_updates = []
+        self.new_updates = asyncio.Event()
+        self.created_at = {}  # update text -> time the update was made available
+        self.answered = {}  # update text -> future resolved when sendMessage arrives
+        self.next_update_id = 1
+        self.webhook_session = None
+        self.webhook_url = None
+        self.webhook_connections = asyncio.Semaphore(MAX_WEBHOOK_CONNECTIONS)
+        self.runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(f'/bot{TOKEN}/{{method}}', self.handle_method)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, HOST, TELEGRAM_PORT).start()
+        self.webhook_session = ClientSession()
+
+    async def stop(self):
+        await self.webhook_session.close()
+        await self.runner.cleanup()
+
+    async def handle_method(self, request):
+        method = request.match_info['method']
+        params = await request.post()
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}
+        elif method == 'getUpdates':
+            result = await self._get_updates(int(params.get('offset', 0)), float(params.get('timeout', 0)))
+        elif method == 'sendMessage':
+            text = params['text']
+            self.answered[text].set_result(time.perf_counter() - self.created_at[text])
+            result = {'message_id': 1, 'date': int(time.time()), 'chat': {'id': int(params['chat_id']), 'type': 'private'}, 'text': text}
+        else:  # setWebhook, deleteWebhook
+            result = True
+
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _get_updates(self, offset, timeout):
+        self.pending_updates = [update for update in self.pending_updates if update['update_id'] >= offset]
+        if not self.pending_updates:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.pending_updates
+
+    def _create_update(self, chat_id):
+        update_id = self.next_update_id
+        self.next_update_id += 1
+        text = f'update {update_id}'
+        self.answered[text] = asyncio.get_running_loop().create_future()
+        update = {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User'},
+                'text': text
+            }
+        }
+        return text, update
+
+    async def send_update(self, chat_id, webhook):
+        """
+        Makes a new update available to the bot and returns the future of its answer.
+        """
+        text, update = self._create_update(chat_id)
+        self.created_at[text] = time.perf_counter()
+        if webhook:
+            headers = {WebhookServer.SECRET_TOKEN_HEADER: SECRET_TOKEN}
+            async with self.webhook_connections:
+                async with self.webhook_session.post(self.webhook_url, json=update, headers=headers) as response:
+                    response.raise_for_status()
+        else:
+            self.pending_updates.append(update)
+            self.new_updates.set()
+        return self.answered[text]
+
+async def echo(update: Update, context) -> None:
+    await context.bot.send_message(update.message.chat_id, update.message.text)
+
+def build_application(concurrency, webhook):
+    builder = (Application.builder()
+               .token(TOKEN)
+               .base_url(f'http://{HOST}:{TELEGRAM_PORT}/bot')
+               .concurrent_updates(concurrency))
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+    application.add_handler(MessageHandler(filters.TEXT, echo))
+    return application
+
+async def run_mode(telegram, updates, concurrency, webhook):
+    application = build_application(concurrency, webhook)
+    server = None
+
+    async with application:
+        await application.start()
+        if webhook:
+            server = WebhookServer(HOST, WEBHOOK_PORT)
+            server.add_application('bot', application, SECRET_TOKEN)
+            await server.start()
+            telegram.webhook_url = f'http://{HOST}:{WEBHOOK_PORT}/bot'
+        else:
+            await application.updater.start_polling(poll_interval=0.0, timeout=10)
+
+        # Latency: one update at a time
+        latencies = []
+        for _ in range(LATENCY_SAMPLES):
+            answer = await telegram.send_update(chat_id=1, webhook=webhook)
+            latencies.append(await answer)
+
+        # Throughput: a burst of updates from different chats
+        start_time = time.perf_counter()
+        answers = await asyncio.gather(*(telegram.send_update(chat_id, webhook) for chat_id in range(updates)))
+        await asyncio.gather(*answers)
+        elapsed = time.perf_counter() - start_time
+
+        if webhook:
+            await server.stop()
+        else:
+            await application.updater.stop()
+        await application.stop()
+
+    latencies.sort()
+    return {
+        'median_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'updates_per_sec': updates / elapsed,
+    }
+
+async def main(updates, concurrency):
+    telegram = FakeTelegramServer()
+    await telegram.start()
+    try:
+        for name, webhook in (('polling', False), ('webhook', True)):
+            result = await run_mode(telegram, updates, concurrency, webhook)
+            print(f"{name:<8} latency median: {result['median_ms']:6.2f} ms   p95: {result['p95_ms']:6.2f} ms   "
+                  f"throughput: {result['updates_per_sec']:8.1f} updates/sec")
+    finally:
+        await telegram.stop()
+
+if __name__ == "__main__":
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    asyncio.run(main(updates, concurrency))
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+import sys
+from db.engine import create_tables
+from lib.telegram.bots.bot_host import BotHost
+from lib.telegram.bots.diet_bot import DietBot
+from lib.telegram.bots.translator_bot import TranslatorBot
+
+BOTS = {
+    'diet': DietBot,
+    'translator': TranslatorBot,
+}
+
+def main():
+    names = sys.argv[1:] or list(BOTS)
+    unknown = [name for name in names if name not in BOTS]
+    if unknown:
+        print(f"Usage: {sys.argv[0]} [{' '.join(BOTS)}]")
+        sys.exit(1)
+
+    create_tables()
+    host = BotHost([BOTS[name]() for name in names])
+    host.run()
+
+if __name__ == "__main__":
+    main()
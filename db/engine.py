@@ -9,8 +9,12 @@ DATABASE_URI = 'sqlite:///' + db_path
 engine = create_engine(DATABASE_URI, echo=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Import your models after engine creation to avoid circular imports
-# (rest of your model imports here)
-
-# Optional here: Create all tables in the database (if they do not exist)
-Base.metadata.create_all(bind=engine)
+def create_tables() -> None:
+    """
+    Creates the tables that don't exist yet, e.g. in a new database. The entry points call
+    it at startup instead of on import, so importing the models, e.g. in the tests, doesn't
+    create the database file. Changes to existing tables are made by the alembic migrations.
+    """
+    # Import the models here to avoid circular imports, their tables are registered on import
+    from db.models import active_run, conversation, post
+    Base.metadata.create_all(bind=engine)
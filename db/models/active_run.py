@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+from ..base import Base
+
+class ActiveRun(Base):
+    __tablename__ = 'active_runs'
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, index=True)
+    assistant_id = Column(String, index=True)
+    thread_id = Column(String)
+    run_id = Column(String, unique=True)
+    chat_id = Column(Integer)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -5,9 +5,11 @@ import sys
 # Adjust the path as necessary
 sys.path.append('/home/impotepus/aihelper/lib')
 
+from db.engine import create_tables
 from lib.telegram.bots.diet_bot import DietBot
 
 def main():
+    create_tables()
     bot = DietBot()
     bot.run()
 
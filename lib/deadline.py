@@ -0,0 +1,101 @@
+import asyncio
+import time
+from typing import Awaitable, TypeVar
+
+from lib.metrics import Metrics
+
+_T = TypeVar('_T')
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a stage of a request runs out of time.
+    """
+
+    def __init__(self, stage: str, budget: float):
+        """
+        :param stage: Name of the stage, e.g. 'download'.
+        :param budget: Seconds the stage had.
+        """
+        super().__init__(f"The {stage} stage exceeded its budget of {budget:.1f} seconds")
+        self.stage = stage
+        self.budget = budget
+
+class Deadline:
+    """
+    Time budget of a request, created when its update arrives and passed along the pipeline.
+
+    Every stage (downloading a file, transcribing it, waiting for the run, sending the
+    answer) gets at most its own budget from STAGE_BUDGETS and never more than what is
+    left of the request's total budget. A stage that runs out of time raises
+    DeadlineExceeded, so a stuck request fails fast instead of holding a worker.
+
+    Metrics, prefixed with the deadline name:
+    <name>.deadline.exceeded.<stage> (counter): stages that ran out of time.
+    """
+
+    TOTAL = 600  # Seconds from receiving the update to the end of its processing
+    STAGE_BUDGETS = {
+        'download': 30,  # Downloading a file sent by the user
+        'transcription': 60,  # Describing a photo, voice message or video
+        'run': 300,  # Waiting for the assistant run, including its tool calls
+        'send': 30,  # Sending a message to Telegram
+    }
+
+    def __init__(self, total: float = TOTAL, budgets: dict = None, name: str = 'bot'):
+        """
+        Initialize the deadline.
+
+        :param total: Seconds the whole request may take.
+        :param budgets: Budgets overriding STAGE_BUDGETS, by stage name.
+        :param name: Prefix of the metrics, usually the bot name.
+        """
+        self.expires_at = time.monotonic() + total
+        self.budgets = {**self.STAGE_BUDGETS, **(budgets or {})}
+        self.name = name
+
+    def remaining(self) -> float:
+        """
+        Returns the seconds left of the total budget, negative once it expired.
+        """
+        return self.expires_at - time.monotonic()
+
+    def budget(self, stage: str) -> float:
+        """
+        Returns the seconds a stage starting now may take.
+
+        :param stage: Name of the stage, e.g. 'download'.
+        :raises DeadlineExceeded: If the total budget is already spent.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.exceeded(stage, 0)
+        return min(self.budgets.get(stage, remaining), remaining)
+
+    async def run(self, stage: str, awaitable: Awaitable[_T]) -> _T:
+        """
+        Awaits a stage, cancelling it when it runs out of time.
+
+        :param stage: Name of the stage, e.g. 'transcription'.
+        :param awaitable: The work of the stage.
+        :raises DeadlineExceeded: If the stage didn't finish within its budget.
+        """
+        try:
+            budget = self.budget(stage)
+        except DeadlineExceeded:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+        try:
+            return await asyncio.wait_for(awaitable, budget)
+        except asyncio.TimeoutError:
+            self.exceeded(stage, budget)
+
+    def exceeded(self, stage: str, budget: float) -> None:
+        """
+        Records that a stage ran out of time and raises DeadlineExceeded.
+
+        :param stage: Name of the stage.
+        :param budget: Seconds the stage had.
+        """
+        Metrics.increment(f'{self.name}.deadline.exceeded.{stage}')
+        raise DeadlineExceeded(stage, budget)
@@ -0,0 +1,100 @@
+import importlib
+import pkgutil
+import inflection
+
+class HandlerRegistry:
+    """
+    Maps Telegram message types and assistant tool functions to their handler classes.
+
+    The handler packages are scanned once at startup, so dispatching a message or a
+    tool call is a dictionary lookup instead of a file glob and module import.
+    """
+
+    MESSAGE_HANDLERS_PACKAGE = 'lib.telegram.message_handlers'
+    FUNCTION_HANDLERS_PACKAGE = 'lib.openai.function_handlers'
+    HANDLER_SUFFIX = '_handler'
+
+    _message_handlers = None  # message type -> handler class, e.g. 'photo' -> PhotoHandler
+    _function_handlers = None  # function name -> handler class, e.g. 'generateImage' -> GenerateImageHandler
+
+    @classmethod
+    def setup(cls) -> None:
+        """
+        Imports all message and function handlers and builds the lookup tables.
+        """
+        cls._message_handlers = {}
+        for message_type, handler_class in cls._load_handlers(cls.MESSAGE_HANDLERS_PACKAGE):
+            cls._message_handlers[message_type] = handler_class
+
+        cls._function_handlers = {}
+        for function_name, handler_class in cls._load_handlers(cls.FUNCTION_HANDLERS_PACKAGE):
+            # Assistant functions are declared in camel case (generateImage), accept both spellings
+            cls._function_handlers[function_name] = handler_class
+            cls._function_handlers[inflection.camelize(function_name, False)] = handler_class
+
+    @classmethod
+    def _load_handlers(cls, package_name: str):
+        """
+        Yields (name, handler class) pairs for every "<name>_handler" module of a package.
+
+        :param package_name: Dotted name of the package containing the handlers.
+        """
+        package = importlib.import_module(package_name)
+        for module_info in sorted(pkgutil.iter_modules(package.__path__), key=lambda info: info.name):
+            module_name = module_info.name
+            if not module_name.endswith(cls.HANDLER_SUFFIX) or module_name.startswith('base_'):
+                continue
+
+            name = module_name[:-len(cls.HANDLER_SUFFIX)]
+            module = importlib.import_module(f'{package_name}.{module_name}')
+            handler_class = getattr(module, inflection.camelize(name) + 'Handler', None)
+            if handler_class:
+                yield name, handler_class
+            else:
+                print(f"Handler class not found in {package_name}.{module_name}")
+
+    @classmethod
+    def _ensure_loaded(cls) -> None:
+        if cls._message_handlers is None or cls._function_handlers is None:
+            cls.setup()
+
+    @classmethod
+    def get_message_types(cls):
+        """
+        Returns the list of supported message types like 'text', 'photo', etc.
+        """
+        cls._ensure_loaded()
+        return list(cls._message_handlers)
+
+    @classmethod
+    def get_message_type(cls, message):
+        """
+        Returns the type of a Telegram message, or None if no handler supports it.
+
+        :param message: Telegram message object.
+        """
+        cls._ensure_loaded()
+        for message_type in cls._message_handlers:
+            if getattr(message, message_type, None):
+                return message_type
+        return None
+
+    @classmethod
+    def get_message_handler(cls, message_type: str):
+        """
+        Returns the handler class for a message type, or None if it is not supported.
+
+        :param message_type: The type of the message, e.g. 'text' or 'photo'.
+        """
+        cls._ensure_loaded()
+        return cls._message_handlers.get(message_type)
+
+    @classmethod
+    def get_function_handler(cls, function_name: str):
+        """
+        Returns the handler class for an assistant tool function, or None if it is not supported.
+
+        :param function_name: Name of the function requested by the assistant, e.g. 'generateImage'.
+        """
+        cls._ensure_loaded()
+        return cls._function_handlers.get(function_name)
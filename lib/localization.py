@@ -1,25 +1,53 @@
 import gettext
 import os
+from contextvars import ContextVar
 from pathlib import Path
 
 class Localization:
+    """
+    Translates the bot messages with gettext.
+
+    setup() selects the process default language. change_language() selects the language
+    of the current request only: it is kept in a context variable, so every update, running
+    in its own asyncio task, translates to its user's language even while other updates
+    switch theirs.
+    """
+
     _translator = None
     _current_language = None
     ALLOWED_LANGUAGES = ['en', 'ru', 'ua']  # Allowed languages
     _translation_cache = {}  # Cache for translations
+    _request_translator = ContextVar('request_translator', default=None)  # Translator of the current request
 
     @classmethod
     def setup(cls, domain='aihelper', language=None):
+        cls._current_language = cls.resolve_language(language)
+        cls._translator = cls.get_translator(cls._current_language, domain)
+        cls._translator.install()
+
+    @classmethod
+    def resolve_language(cls, language):
+        """
+        Returns the language if it is allowed, otherwise the LANGUAGE environment variable or 'en'.
+
+        :param language: Language code, e.g. the user's Telegram language code.
+        """
         if language in cls.ALLOWED_LANGUAGES:
-            cls._current_language = language
-        else:
-            cls._current_language = os.environ.get('LANGUAGE', 'en') if os.environ.get('LANGUAGE') in cls.ALLOWED_LANGUAGES else 'en'
+            return language
+        return os.environ.get('LANGUAGE', 'en') if os.environ.get('LANGUAGE') in cls.ALLOWED_LANGUAGES else 'en'
 
-        cache_key = cls._current_language
+    @classmethod
+    def get_translator(cls, language, domain='aihelper'):
+        """
+        Returns the translator of an allowed language, loaded on first use only.
+
+        :param language: Language code, one of ALLOWED_LANGUAGES.
+        :param domain: The gettext domain.
+        """
+        cache_key = language
 
         if cache_key in cls._translation_cache:
-            cls._translator = cls._translation_cache[cache_key]
-            return
+            return cls._translation_cache[cache_key]
 
         # Define the locale directory
         project_root = Path(__file__).parent.parent
@@ -29,21 +57,31 @@ class Localization:
         gettext.bindtextdomain(domain, str(locale_path))
         gettext.textdomain(domain)
 
-        # Load the translation for the current language
-        translator = gettext.translation(domain, str(locale_path), languages=[cls._current_language], fallback=True)
-        translator.install()
-        cls._translator = translator
+        # Load the translation for the language
+        translator = gettext.translation(domain, str(locale_path), languages=[language], fallback=True)
         cls._translation_cache[cache_key] = translator
+        return translator
+
+    @classmethod
+    def use_language(cls, language):
+        """
+        Selects the language of the current request, i.e. of the running asyncio task and of
+        the tasks it creates afterwards. Other requests keep their own language.
+
+        :param language: Language code, the default language is used if it isn't allowed.
+        """
+        cls._request_translator.set(cls.get_translator(cls.resolve_language(language)))
 
     @classmethod
     def get_text(cls, message):
-        if cls._translator:
-            return cls._translator.gettext(message)
+        translator = cls._request_translator.get() or cls._translator
+        if translator:
+            return translator.gettext(message)
         else:
             return message
 
 def change_language(language):
-    Localization.setup(language=language)
+    Localization.use_language(language)
 
 # Setup the initial language
 Localization.setup()
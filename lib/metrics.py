@@ -0,0 +1,142 @@
+import bisect
+import threading
+
+class Histogram:
+    """
+    Distribution of observed values, e.g. wait times in seconds, kept in fixed buckets.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self, buckets=None):
+        """
+        Initialize the histogram.
+
+        :param buckets: Sorted upper bounds of the buckets.
+        """
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last bucket collects values above the largest bound
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value) -> None:
+        """
+        Adds a value to the histogram.
+
+        :param value: The observed value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float):
+        """
+        Returns the upper bound of the bucket containing the given percentile.
+
+        :param percent: The percentile, from 0 to 100.
+        """
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else 0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'max': self.max,
+        }
+
+class Metrics:
+    """
+    Process-wide registry of counters, gauges and histograms.
+
+    Metric names are dotted strings like 'diet.scheduler.wait_time'. The values are kept
+    in memory and can be read with snapshot(), e.g. by the webhook server's /metrics route.
+    """
+
+    _counters = {}
+    _gauges = {}
+    _histograms = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def increment(cls, name: str, value=1) -> None:
+        """
+        Increases a counter.
+
+        :param name: Name of the counter.
+        :param value: The amount to add.
+        """
+        with cls._lock:
+            cls._counters[name] = cls._counters.get(name, 0) + value
+
+    @classmethod
+    def set_gauge(cls, name: str, value) -> None:
+        """
+        Sets a gauge to its current value.
+
+        :param name: Name of the gauge.
+        :param value: The current value.
+        """
+        with cls._lock:
+            cls._gauges[name] = value
+
+    @classmethod
+    def observe(cls, name: str, value, buckets=None) -> None:
+        """
+        Adds a value to a histogram, creating it on first use.
+
+        :param name: Name of the histogram.
+        :param value: The observed value.
+        :param buckets: Bucket bounds used when the histogram is created.
+        """
+        with cls._lock:
+            histogram = cls._histograms.get(name)
+            if histogram is None:
+                histogram = cls._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    @classmethod
+    def get_counter(cls, name: str):
+        return cls._counters.get(name, 0)
+
+    @classmethod
+    def get_gauge(cls, name: str):
+        return cls._gauges.get(name, 0)
+
+    @classmethod
+    def get_histogram(cls, name: str) -> Histogram:
+        return cls._histograms.get(name)
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """
+        Returns the current values of all metrics.
+        """
+        with cls._lock:
+            return {
+                'counters': dict(cls._counters),
+                'gauges': dict(cls._gauges),
+                'histograms': {name: histogram.to_dict() for name, histogram in cls._histograms.items()},
+            }
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Removes all metrics.
+        """
+        with cls._lock:
+            cls._counters = {}
+            cls._gauges = {}
+            cls._histograms = {}
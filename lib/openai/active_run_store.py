@@ -0,0 +1,90 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.engine import SessionLocal
+from db.models.active_run import ActiveRun
+
+class ActiveRunStore:
+    """
+    Records the assistant runs that were started but not answered yet.
+
+    A run is added as soon as it is created and removed once its answer was sent, so
+    the runs left after a crash or a restart are the ones whose users never got an
+    answer. The bot resumes them on startup instead of leaving them active on OpenAI,
+    where they would block the next message of their thread.
+
+    Failing to record a run doesn't stop it from being answered, it only can't be resumed.
+
+    The writes run in a single thread of the store, so they don't block the event loop
+    while SQLite waits for its write lock, and a run is never removed before it was added.
+    """
+
+    def __init__(self, assistant_id: str = None, session_factory=SessionLocal):
+        """
+        Initialize the store.
+
+        :param assistant_id: Only the runs of this assistant are listed, all if None.
+        :param session_factory: Creates the database sessions.
+        """
+        self.assistant_id = assistant_id
+        self.session_factory = session_factory
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='active-run-store')
+
+    async def add(self, conversation, run_id: str, chat_id: int) -> None:
+        """
+        Records a run that was just created.
+
+        :param conversation: The conversation the run answers.
+        :param run_id: ID of the run.
+        :param chat_id: ID of the chat the answer is sent to.
+        """
+        # Read in the event loop, the conversation belongs to the session of the update
+        active_run = ActiveRun(
+            conversation_id=conversation.id,
+            assistant_id=conversation.assistant_id,
+            thread_id=conversation.thread_id,
+            run_id=run_id,
+            chat_id=chat_id
+        )
+        await self._write(self._add, active_run)
+
+    async def remove(self, run_id: str) -> None:
+        """
+        Forgets a run that was answered, failed or cancelled.
+
+        :param run_id: ID of the run.
+        """
+        await self._write(self._remove, run_id)
+
+    async def _write(self, write, *args) -> None:
+        # Awaiting can be cancelled, the write is still done in its turn
+        await asyncio.get_running_loop().run_in_executor(self._writer, write, *args)
+
+    def _add(self, active_run: ActiveRun) -> None:
+        try:
+            with self.session_factory() as session:
+                session.add(active_run)
+                session.commit()
+        except SQLAlchemyError as e:
+            print(f"Failed to record the active run {active_run.run_id}: {e}")
+
+    def _remove(self, run_id: str) -> None:
+        try:
+            with self.session_factory() as session:
+                session.query(ActiveRun).filter_by(run_id=run_id).delete()
+                session.commit()
+        except SQLAlchemyError as e:
+            print(f"Failed to remove the active run {run_id}: {e}")
+
+    def list(self) -> List[ActiveRun]:
+        """
+        Returns the recorded runs, oldest first.
+        """
+        with self.session_factory() as session:
+            query = session.query(ActiveRun)
+            if self.assistant_id:
+                query = query.filter(ActiveRun.assistant_id == self.assistant_id)
+            return query.order_by(ActiveRun.id).all()
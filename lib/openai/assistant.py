@@ -1,36 +1,110 @@
 import os
-from openai import OpenAI
+import time
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 class Assistant:
+    """
+    OpenAI assistant answering the users of a bot.
 
-    ASSISTANT_ID = None
+    The assistant's metadata (instructions, model and the token count of the instructions)
+    is cached for the whole process for METADATA_TTL seconds, so answering a message
+    doesn't retrieve the assistant again. Updating the assistant through this class
+    invalidates the cache, changes made elsewhere are seen after the TTL.
+    """
 
-    def __init__(self, openai_client=None):
+    ASSISTANT_ID = None  # Default assistant ID, used when none is passed to the constructor
+    METADATA_TTL = 300  # Seconds the metadata of an assistant is cached
+
+    _shared_client = None  # Async OpenAI client shared by all bots of the process
+    _metadata_cache = {}  # assistant id -> (expiry time, metadata)
+
+    def __init__(self, openai_client=None, assistant_id=None):
         """
         Initializes the Assistant class with an OpenAI client and an assistant ID.
-        If not provided, it initializes the OpenAI client and fetches the assistant ID from environment variables.
+        If not provided, it uses the process-wide async OpenAI client and the default assistant ID.
+
+        :param openai_client: The async OpenAI client.
+        :param assistant_id: ID of the OpenAI assistant.
         """
-        self.openai = openai_client if openai_client else OpenAI()
+        self.openai = openai_client if openai_client else self.get_shared_client()
+        self.assistant_id = assistant_id or self.ASSISTANT_ID
 
-        if not self.ASSISTANT_ID:
+        if not self.assistant_id:
             raise ValueError("Assistant ID is not provided and not found in environment variables.")
 
+    @classmethod
+    def get_shared_client(cls):
+        """
+        Returns the async OpenAI client shared by the whole process, so that all bots
+        reuse the same HTTP connection pool.
+        """
+        if cls._shared_client is None:
+            cls._shared_client = AsyncOpenAI()
+        return cls._shared_client
+
     def get_openai_client(self):
         """
         Returns the OpenAI client instance.
         """
         return self.openai
 
-    def add_function_to_assistant(self, name, description, instructions, properties=[], required=[]):
+    @classmethod
+    def invalidate(cls, assistant_id=None):
+        """
+        Removes the cached metadata of an assistant, e.g. after it was updated.
+
+        :param assistant_id: ID of the assistant, all assistants if None.
+        """
+        if assistant_id:
+            cls._metadata_cache.pop(assistant_id, None)
+        else:
+            cls._metadata_cache.clear()
+
+    async def metadata(self):
+        """
+        Returns the assistant's metadata, retrieved at most once per METADATA_TTL seconds.
+
+        :return: Dict with the 'instructions' and the 'model' of the assistant, and the
+                 'prompt_tokens' of the instructions by tokenizer model, filled by prompt_tokens.
+        """
+        cached = self._metadata_cache.get(self.assistant_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        assistant_details = await self.openai.beta.assistants.retrieve(self.assistant_id)
+        if not hasattr(assistant_details, 'instructions'):
+            raise AttributeError("Assistant object does not have 'instructions' attribute")
+        metadata = {
+            'instructions': assistant_details.instructions,
+            'model': getattr(assistant_details, 'model', None),
+            'prompt_tokens': {}
+        }
+        self._metadata_cache[self.assistant_id] = (time.monotonic() + self.METADATA_TTL, metadata)
+        return metadata
+
+    async def prompt_tokens(self, tokenizer):
+        """
+        Returns the number of tokens of the assistant's instructions, counted once per cached metadata.
+
+        :param tokenizer: The Tokenizer counting the tokens.
+        """
+        metadata = await self.metadata()
+        counts = metadata['prompt_tokens']
+        if tokenizer.model not in counts:
+            instructions = metadata['instructions']
+            counts[tokenizer.model] = tokenizer.num_tokens_from_string(instructions) if instructions else 0
+        return counts[tokenizer.model]
+
+    async def add_function_to_assistant(self, name, description, instructions, properties=[], required=[]):
         """
         Adds a function to the assistant with the specified details.
         """
-        self.openai.beta.assistants.update(
-            self.ASSISTANT_ID,
+        await self.openai.beta.assistants.update(
+            self.assistant_id,
             instructions=instructions,
             model="gpt-4-1106-preview",
             tools=[{
@@ -46,26 +120,22 @@ class Assistant:
                 }
             }]
         )
+        # After the update, so metadata retrieved meanwhile isn't kept
+        self.invalidate(self.assistant_id)
 
-    def prompt(self):
+    async def prompt(self):
         """
-        Retrieves the current assistant's instructions.
+        Returns the current assistant's instructions.
         """
-        assistant_details = self.openai.beta.assistants.retrieve(self.ASSISTANT_ID)
-        if hasattr(assistant_details, 'instructions'):
-            return assistant_details.instructions
-        else:
-            raise AttributeError("Assistant object does not have 'instructions' attribute")
+        return (await self.metadata())['instructions']
 
 # Example of usage:
-# import os
-# from openai import OpenAI
+# import asyncio
 # from dotenv import load_dotenv
-# from lib.telegram.assistant import Assistant
+# from lib.openai.assistant import Assistant
 
 # load_dotenv()
-# openai = OpenAI()
 # assistant = Assistant()
 
 # properties = { "description": {"type": "string", "description": "Image description (prompt) for dall-e-3."}}
-# assistant.add_function_to_assistant('generateImage', 'Generate image', 'Now you are able to generate image with that function. Use the provided functions to generate image.', properties, ['description'])
+# asyncio.run(assistant.add_function_to_assistant('generateImage', 'Generate image', 'Now you are able to generate image with that function. Use the provided functions to generate image.', properties, ['description']))
@@ -6,7 +6,7 @@ class BaseFunctionHandler:
         self.update = update
         self.context = context
         self.conversation = conversation
-        self.tokenizer = Tokenizer()
+        self.tokenizer = Tokenizer.get_shared()
 
     async def handle(self, tool_call_id, args):
         """
@@ -1,5 +1,6 @@
 from lib.openai.image import Image
 from lib.telegram.payment import Payment
+from lib.telegram.bots.bot_config import BotConfig
 from lib.localization import _
 from lib.openai.function_handlers.base_function_handler import BaseFunctionHandler
 
@@ -15,7 +16,7 @@ class GenerateImageHandler(BaseFunctionHandler):
             message = _("Insufficient balance to process the generating image.")
             print(message)
             await self.context.bot.send_message(self.update.message.chat_id, message)
-            payment = Payment()
+            payment = Payment(BotConfig.for_assistant(self.conversation.assistant_id))
             await payment.send_invoice(self.update, self.context, False)
             return {
                 "tool_call_id": tool_call_id,
@@ -25,7 +26,7 @@ class GenerateImageHandler(BaseFunctionHandler):
         try:
             # Generate the image
             image = Image(self.openai)
-            image_url, revised_prompt = image.generate(args['description'])
+            image_url, revised_prompt = await image.generate(args['description'])
 
             # Update the balance
             amount += self.tokenizer.tokens_to_money_from_string(revised_prompt)
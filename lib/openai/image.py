@@ -4,10 +4,10 @@ class Image:
     def __init__(self, openai):
         self.openai = openai
 
-    def generate(self, image_description):
+    async def generate(self, image_description):
         print(f'Generating image with description: "{image_description}"')
         try:
-            response = self.openai.images.generate(
+            response = await self.openai.images.generate(
                 prompt=image_description,
                 model="dall-e-3",
                 quality="standard",
@@ -25,12 +25,13 @@ class Image:
 
 # Example of usage:
 
-# from openai import OpenAI
+# import asyncio
+# from openai import AsyncOpenAI
 # from dotenv import load_dotenv
-# from lib.telegram.image import Image
+# from lib.openai.image import Image
 
 # load_dotenv()
-# openai = OpenAI()
+# openai = AsyncOpenAI()
 # image = Image(openai)
 
-# image.generate('Сгенерируй картинку кота в пижаме возле камина')
+# asyncio.run(image.generate('Сгенерируй картинку кота в пижаме возле камина'))
@@ -0,0 +1,54 @@
+import random
+from typing import Iterator
+
+class PollingStrategy:
+    """
+    Delays between the status checks of an assistant run.
+
+    Short runs are polled every initial_delay seconds for the first fast_polls checks,
+    so their answer isn't held back by a long sleep. Longer runs are polled with an
+    exponential backoff up to max_delay, which bounds the number of runs.retrieve calls.
+    Every delay is randomized by +/- jitter, so runs started together don't poll together.
+    """
+
+    def __init__(self, initial_delay: float = 0.5, fast_polls: int = 4, multiplier: float = 1.5,
+                 max_delay: float = 10.0, jitter: float = 0.1):
+        """
+        Initialize the strategy.
+
+        :param initial_delay: Seconds between the first polls.
+        :param fast_polls: Number of polls made every initial_delay seconds before backing off.
+        :param multiplier: Factor the delay grows by after each of the following polls.
+        :param max_delay: Maximum number of seconds between two polls.
+        :param jitter: Maximum relative random change of a delay, e.g. 0.1 for +/- 10%.
+        """
+        if initial_delay <= 0 or max_delay < initial_delay:
+            raise ValueError("The delays must be positive and max_delay at least initial_delay.")
+        if multiplier < 1 or not 0 <= jitter < 1:
+            raise ValueError("The multiplier must be at least 1 and the jitter between 0 and 1.")
+
+        self.initial_delay = initial_delay
+        self.fast_polls = fast_polls
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """
+        Returns the number of seconds to wait after a poll.
+
+        :param attempt: Number of polls already made, starting at 1.
+        """
+        backoff_steps = max(attempt - self.fast_polls, 0)
+        delay = min(self.initial_delay * self.multiplier ** backoff_steps, self.max_delay)
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(delay, self.max_delay)
+
+    def delays(self) -> Iterator[float]:
+        """
+        Yields the delays after the first, second, etc. poll.
+        """
+        attempt = 1
+        while True:
+            yield self.delay(attempt)
+            attempt += 1
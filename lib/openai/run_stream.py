@@ -0,0 +1,50 @@
+from typing import Any, AsyncIterator, TypeVar
+
+from openai import APIError, AsyncStream
+
+_T = TypeVar('_T')
+
+class RunEvent:
+    """
+    Server-sent event of a streaming assistant run, e.g. 'thread.message.delta'.
+    """
+
+    def __init__(self, event: str, data: Any):
+        """
+        :param event: Name of the event.
+        :param data: The decoded JSON payload of the event.
+        """
+        self.event = event
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f'RunEvent(event={self.event!r})'
+
+class RunEventStream(AsyncStream[_T]):
+    """
+    Stream of the events of an assistant run created with "stream": true.
+
+    The openai package version used here only knows unnamed chat completion events, so
+    the Assistants events are decoded here. Iterating yields RunEvent objects until the
+    "done" event. The client expects a parametrized stream class: RunEventStream[RunEvent].
+    """
+
+    async def __stream__(self) -> AsyncIterator[RunEvent]:
+        iterator = self._iter_events()
+
+        async for sse in iterator:
+            if sse.event == 'done' or sse.data.startswith('[DONE]'):
+                break
+
+            if sse.event == 'error':
+                raise APIError(
+                    message="An error occurred during streaming",
+                    request=self.response.request,
+                    body=sse.json(),
+                )
+
+            yield RunEvent(sse.event, sse.json())
+
+        # Ensure the entire stream is consumed
+        async for sse in iterator:
+            ...
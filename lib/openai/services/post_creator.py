@@ -2,7 +2,7 @@ import asyncio
 from typing import Optional
 from db.engine import SessionLocal
 from db.models.post import Post
-from openai import OpenAI
+from openai import AsyncOpenAI
 from lib.openai.image import Image
 
 class PostCreator:
@@ -21,7 +21,7 @@ class PostCreator:
 
         self.model = model
         self.assistant_id = assistant_id
-        self.openai = OpenAI()
+        self.openai = AsyncOpenAI()
         self.image = Image(self.openai)
 
     async def create_post(self, message: str, prompt: str = '', language: str = 'ru') -> Optional[Post]:
@@ -32,13 +32,13 @@ class PostCreator:
         :return: Optional[Post] - The created Post object or None if creation failed.
         """
         # Send the prompt to OpenAI and get a response
-        text_content = self._create_openai_non_thread_message(message=message, prompt=prompt)
+        text_content = await self._create_openai_non_thread_message(message=message, prompt=prompt)
 
-        title = self._create_openai_non_thread_message(message='Сделай заголовок для этого текста: ' + text_content, prompt=prompt)
+        title = await self._create_openai_non_thread_message(message='Сделай заголовок для этого текста: ' + text_content, prompt=prompt)
 
         # Here you'd include your logic for image generation if needed
         # For now, we'll assume no image is generated
-        image_url, revised_prompt = self.image.generate(text_content)
+        image_url, revised_prompt = await self.image.generate(text_content)
 
         # Create and save the post to the database
         session = SessionLocal()
@@ -60,7 +60,7 @@ class PostCreator:
         finally:
             session.close()
 
-    def _create_openai_non_thread_message(self, message: str, prompt: Optional[str] = None):
+    async def _create_openai_non_thread_message(self, message: str, prompt: Optional[str] = None):
         """
         Generate a non-thread response using the OpenAI API.
 
@@ -76,7 +76,7 @@ class PostCreator:
             messages.append({"role": "user", "content": message})
 
             # Send the request to OpenAI
-            response = self.openai.chat.completions.create(
+            response = await self.openai.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=2.0,
@@ -0,0 +1,127 @@
+import asyncio
+from collections import deque
+
+from lib.metrics import Metrics
+
+class ThreadPool:
+    """
+    Keeps a few empty OpenAI threads ready, so a conversation gets a new thread without
+    waiting for threads.create. Threads that are replaced are deleted in the background.
+
+    A background task refills the pool after every thread taken from it. When the pool is
+    empty, the thread is created on the spot. The background tasks start on first use or
+    with start(); close() stops them and deletes the pooled and the replaced threads.
+
+    Metrics, prefixed with the pool name:
+    <name>.thread_pool.hits (counter): threads taken from the pool.
+    <name>.thread_pool.misses (counter): threads created on the spot because the pool was empty.
+    <name>.thread_pool.ready (gauge): threads in the pool.
+    <name>.thread_pool.pending_deletions (gauge): replaced threads waiting to be deleted.
+    """
+
+    SIZE = 5  # Threads kept ready
+    RETRY_DELAY = 10  # Seconds to wait before refilling again after threads.create failed
+    CLOSE_TIMEOUT = 10  # Seconds close() waits for the pending deletions
+
+    def __init__(self, openai_client, size: int = SIZE, name: str = 'bot'):
+        """
+        Initialize the pool.
+
+        :param openai_client: The OpenAI client creating and deleting the threads.
+        :param size: Number of threads kept ready.
+        :param name: Prefix of the pool metrics, usually the bot name.
+        """
+        self.openai = openai_client
+        self.size = size
+        self.name = name
+        self.threads = deque()  # IDs of the ready threads
+        self.deletions = None  # asyncio.Queue of the IDs of the threads to delete
+        self.refill_needed = None
+        self.tasks = []
+
+    def start(self) -> None:
+        """
+        Starts filling the pool and deleting replaced threads in the running event loop.
+        """
+        if any(not task.done() for task in self.tasks):
+            return
+        self.deletions = asyncio.Queue()
+        self.refill_needed = asyncio.Event()
+        self.refill_needed.set()
+        self.tasks = [asyncio.create_task(self._refill()), asyncio.create_task(self._delete())]
+
+    async def acquire(self) -> str:
+        """
+        Returns the ID of a new, empty thread.
+        """
+        self.start()
+        self.refill_needed.set()
+        if self.threads:
+            thread_id = self.threads.popleft()
+            Metrics.increment(self._metric('hits'))
+        else:
+            thread_id = (await self.openai.beta.threads.create()).id
+            Metrics.increment(self._metric('misses'))
+        Metrics.set_gauge(self._metric('ready'), len(self.threads))
+        return thread_id
+
+    def release(self, thread_id: str) -> None:
+        """
+        Schedules the deletion of a thread that is no longer used.
+
+        :param thread_id: ID of the thread.
+        """
+        if not thread_id:
+            return
+        self.start()
+        self.deletions.put_nowait(thread_id)
+        Metrics.set_gauge(self._metric('pending_deletions'), self.deletions.qsize())
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """
+        Stops refilling the pool and deletes the ready threads and the threads waiting for deletion.
+
+        :param timeout: Maximum number of seconds to wait for the deletions.
+        """
+        if all(task.done() for task in self.tasks):
+            self.tasks = []  # Never started, or started in an event loop that is closed
+            return
+        refill_task, delete_task = self.tasks
+        refill_task.cancel()
+        while self.threads:
+            self.deletions.put_nowait(self.threads.popleft())
+        try:
+            await asyncio.wait_for(self.deletions.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f'Thread pool {self.name}: {self.deletions.qsize()} threads were not deleted in time')
+        delete_task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _refill(self) -> None:
+        while True:
+            await self.refill_needed.wait()
+            self.refill_needed.clear()
+            while len(self.threads) < self.size:
+                try:
+                    thread = await self.openai.beta.threads.create()
+                except Exception as e:
+                    print(f'Thread pool {self.name}: failed to create a thread: {e}')
+                    await asyncio.sleep(self.RETRY_DELAY)
+                    continue
+                self.threads.append(thread.id)
+                Metrics.set_gauge(self._metric('ready'), len(self.threads))
+
+    async def _delete(self) -> None:
+        while True:
+            thread_id = await self.deletions.get()
+            try:
+                await self.openai.beta.threads.delete(thread_id)
+            except Exception as e:
+                print(f'Thread pool {self.name}: failed to delete thread {thread_id}: {e}')
+            finally:
+                self.deletions.task_done()
+                Metrics.set_gauge(self._metric('pending_deletions'), self.deletions.qsize())
+
+    def _metric(self, name: str) -> str:
+        return f'{self.name}.thread_pool.{name}'
@@ -1,111 +1,517 @@
 import time
 import json
 import asyncio
-import inflection
 import random
+from openai import APIStatusError, BadRequestError
+from openai._models import construct_type
+from openai.types.beta.threads import Run, ThreadMessage
 from lib.telegram.answer import Answer
+from lib.telegram.bots.bot_config import BotConfig
+from lib.deadline import Deadline
 from db.models.conversation import Conversation
+from lib.metrics import Metrics
+from lib.openai.polling_strategy import PollingStrategy
+from lib.openai.run_stream import RunEvent, RunEventStream
 from lib.openai.tokenizer import Tokenizer
 from datetime import timedelta
 from decimal import Decimal
-from lib.telegram.payment import Payment
 from lib.localization import _
-import lib.openai.function_handlers.base_function_handler as fh_base
+from lib.handler_registry import HandlerRegistry
 
 class ThreadRunManager:
-    MAX_RUN_DURATION = 3600  # 60 minutes
+    """
+    Runs the assistant on the conversation's thread and sends its answer to the user.
+
+    By default the run is polled until it completes. Bots configured with streaming_runs
+    receive the run's events as they happen instead: the answer is sent as soon as the
+    first tokens are generated and the message is edited while the rest arrives.
+
+    The run must end within the 'run' budget of the request's deadline, otherwise it is
+    cancelled and DeadlineExceeded is raised.
+
+    The turn is billed from the token usage OpenAI reports for its runs, see
+    calculate_turn_amount. Only when the usage is missing, e.g. no run completed, the
+    thread and the answers are tokenized locally instead.
+
+    With a run_store, every run is recorded until its answer is sent, so the runs
+    interrupted by a crash can be resumed with resume_run after a restart.
+
+    Metrics, prefixed with the bot name:
+    <name>.run.<mode>.time_to_first_token (histogram): seconds from starting the run to
+        sending the first part of the answer, mode is 'polling' or 'streaming'.
+    <name>.run.<mode>.duration (histogram): seconds from starting the run to its end.
+    <name>.run.polling.polls (histogram): runs.retrieve calls made for a polled run.
+    <name>.run.polling.completion_latency (histogram): seconds from creating a polled run
+        to seeing it completed.
+    """
 
-    def __init__(self, openai_client, update, context, conversation, session, chat_id):
+    MAX_RUN_DURATION = 3600  # 60 minutes
+    POLLING_STRATEGY = PollingStrategy()
+    POLL_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377)
+    RUN_FAILED_STATUSES = ('failed', 'cancelled', 'expired')
+    RUN_ACTIVE_STATUSES = ('queued', 'in_progress', 'requires_action', 'cancelling')
+    CANCEL_TIMEOUT = 10  # Seconds to wait for a cancelled run to end before starting the next one
+    MAX_PARALLEL_TOOL_CALLS = 4  # Tool calls of a run handled at the same time
+    THREAD_MESSAGES_LIMIT = 100  # Latest messages listed for the answer and the billing of a turn
+
+    ADDITIONAL_MESSAGES_RETRY_INTERVAL = 3600  # Seconds before sending messages with the run creation again after a refusal
+    _additional_messages_refused_at = {}  # assistant id -> time the API refused additional messages
+    RUN_EVENTS_HEADERS = {'OpenAI-Beta': 'assistants=v1'}
+    RUN_END_EVENTS = ('thread.run.completed', 'thread.run.failed', 'thread.run.cancelled', 'thread.run.expired')
+
+    def __init__(self, openai_client, update, context, conversation, session, chat_id, thread_pool=None,
+                 run_store=None, deadline=None):
         self.openai = openai_client
+        self.deadline = deadline or Deadline()
+        self.thread_pool = thread_pool
+        self.run_store = run_store
+        self.chat_id = chat_id
         self.update = update
         self.context = context
         self.session = session
         self.conversation = conversation
         self.thread_id = conversation.thread_id
         self.assistant_id = conversation.assistant_id
-        self.answer = Answer(openai_client, context, chat_id, self.thread_id)
-        self.tokenizer = Tokenizer()
+        self.answer = Answer(openai_client, context, chat_id, self.thread_id, self.deadline)
+        self.tokenizer = Tokenizer.get_shared()
         self.thread_recreation_interval = timedelta(hours=1)
-        self.payment = Payment()
+        self.run_id = None
+        self.run_mode = 'polling'
+        self.run_started_at = None
+        self.first_token_sent = False
+        self.streaming_message = None  # StreamingMessage of the answer being streamed
+        self.usage = None  # Tokens used by the runs of the update: {'prompt_tokens': ..., 'completion_tokens': ...}
+        self.output_texts = []  # Answers sent to the user, tokenized when the usage is missing
+        self.thread_messages = None  # (thread id, latest messages) listed during the update
+        self.new_messages = []  # Messages not yet in the thread, sent with the run creation
 
     # Run handling
 
-    async def manage_run(self):
+    async def manage_run(self, new_messages=None):
+        """
+        Runs the assistant on the thread and sends its answer to the user.
+
+        :param new_messages: User messages to add to the thread, e.g. {"role": "user", "content": "Hi"}.
+                             They are sent with the run creation, saving a request per message.
+        """
+        self.new_messages = list(new_messages or [])
+        self.run_started_at = time.perf_counter()
+        self.first_token_sent = False
+        if self.streaming_enabled():
+            self.run_mode = 'streaming'
+            try:
+                await self.stream_run()
+                return
+            except APIStatusError as e:
+                if self.run_id:
+                    raise
+                # The run wasn't created, e.g. streaming isn't available for the assistant
+                print(f"Failed to start a streaming run, polling it instead: {e}")
+
+        self.run_mode = 'polling'
+        # Before creating the run, so a spent budget doesn't leave a run nobody waits for
+        timeout = min(self.MAX_RUN_DURATION, self.deadline.budget('run'))
         run_id = await self.create_run()
-        await self.process_run(run_id)
+        await self._track_run(run_id)
+        try:
+            await self.process_run(run_id, timeout)
+        finally:
+            await self._untrack_run()
+        self._observe_run('duration')
+
+    async def resume_run(self, run_id):
+        """
+        Waits for a run started before a restart and sends its answer to the user.
+
+        The events of a streamed run can't be received again, so the run is polled.
+
+        :param run_id: ID of the run.
+        """
+        self.run_id = run_id
+        self.run_mode = 'polling'
+        self.run_started_at = None  # Unknown, the resumed run isn't measured
+        try:
+            await self.process_run(run_id)
+        finally:
+            await self._untrack_run()
+
+    async def stream_run(self):
+        """
+        Creates a run and processes its events as they arrive, including tool calls. A run
+        that fails to end in time, or whose processing fails or is cancelled, is cancelled.
+        """
+        self.run_id = None
+        current_stream = None
+
+        async def create(messages):
+            body = {'assistant_id': self.assistant_id}
+            if messages:
+                body['additional_messages'] = messages
+            return await self._request_run_events(f'/threads/{self.thread_id}/runs', body)
+
+        async def process(stream):
+            nonlocal current_stream
+            # Submitting tool outputs continues the run in a new stream
+            while stream is not None:
+                current_stream = stream
+                stream = await self.process_run_events(stream)
+
+        # Before creating the run, so a spent budget doesn't leave a run nobody waits for
+        timeout = min(self.MAX_RUN_DURATION, self.deadline.budget('run'))
+        current_stream = await self._create_run_with_messages(create)
+        try:
+            try:
+                await asyncio.wait_for(process(current_stream), timeout)
+            except asyncio.TimeoutError:
+                self.deadline.exceeded('run', timeout)
+        except (Exception, asyncio.CancelledError):
+            # Don't leave the run active on OpenAI, it would block the next message of the thread.
+            # Interrupted before its 'thread.run.created' event, the run is looked up on the thread.
+            run_id = self.run_id or await self._find_active_run_id()
+            print(f"Run {run_id} interrupted, cancelling it.")
+            await self.cancel_run(self.thread_id, run_id)
+            raise
+        finally:
+            await current_stream.response.aclose()
+            await self._untrack_run()
+        self._observe_run('duration')
+
+    async def _find_active_run_id(self):
+        """
+        Returns the ID of the latest run of the thread if it is still active, otherwise None.
+        """
+        try:
+            runs = await self.openai.beta.threads.runs.list(thread_id=self.thread_id, limit=1)
+            return next((run.id for run in runs.data if run.status in self.RUN_ACTIVE_STATUSES), None)
+        except Exception as e:
+            print(f"Error occurred while looking up the active run: {e}")
+            return None
+
+    async def process_run_events(self, stream):
+        """
+        Sends the streamed answer to the user.
+
+        :param stream: The RunEventStream of the run.
+        :return: The stream continuing the run after its tool outputs were submitted, or None when the run ended.
+        """
+        self.streaming_message = None
+        async for event in stream:
+            if event.event == 'thread.run.created':
+                await self._track_run(event.data['id'])
+            elif event.event == 'thread.message.delta':
+                for content in event.data['delta'].get('content', []):
+                    if content.get('type') != 'text':
+                        continue
+                    if self.streaming_message is None:
+                        self.streaming_message = self.answer.start_streaming_message()
+                    await self.streaming_message.append(content['text'].get('value') or '')
+                    if self.streaming_message.messages:
+                        self._first_token_sent()
+            elif event.event == 'thread.message.completed':
+                message = construct_type(value=event.data, type_=ThreadMessage)
+                await self._process_message(message, self.streaming_message)
+                self.streaming_message = None
+            elif event.event == 'thread.run.requires_action':
+                run = construct_type(value=event.data, type_=Run)
+                tool_outputs = await self._get_tool_outputs(run)
+                await stream.response.aclose()
+                return await self._request_run_events(
+                    f'/threads/{self.thread_id}/runs/{run.id}/submit_tool_outputs', {'tool_outputs': tool_outputs})
+            elif event.event in self.RUN_END_EVENTS:
+                self._record_usage(event.data.get('usage'))
+                if event.event != 'thread.run.completed':
+                    print(f"Run {self.run_id} ended with status {event.data.get('status')}: {event.data.get('last_error')}")
+                if self.streaming_message:
+                    await self.streaming_message.finish()
+                break
+        return None
+
+    async def _request_run_events(self, path, body):
+        return await self.openai.post(
+            path,
+            body={**body, 'stream': True},
+            cast_to=object,
+            options={'headers': self.RUN_EVENTS_HEADERS},
+            stream=True,
+            stream_cls=RunEventStream[RunEvent]
+        )
+
+    async def _track_run(self, run_id):
+        self.run_id = run_id
+        if self.run_store:
+            await self.run_store.add(self.conversation, run_id, self.chat_id)
+
+    async def _untrack_run(self):
+        if self.run_store and self.run_id:
+            await self.run_store.remove(self.run_id)
+
+    def _first_token_sent(self):
+        if not self.first_token_sent:
+            self.first_token_sent = True
+            self._observe_run('time_to_first_token')
+
+    def _observe_run(self, name):
+        if self.run_started_at is None:
+            return
+        self._observe(name, time.perf_counter() - self.run_started_at)
+
+    def _observe(self, name, value, buckets=None):
+        config = BotConfig.for_assistant(self.assistant_id)
+        bot_name = config.name if config else 'bot'
+        Metrics.observe(f'{bot_name}.run.{self.run_mode}.{name}', value, buckets)
+
+    def streaming_enabled(self):
+        config = BotConfig.for_assistant(self.assistant_id)
+        return bool(config and config.streaming_runs)
 
     async def create_run(self):
-        run = self.openai.beta.threads.runs.create(
-            thread_id=self.thread_id, assistant_id=self.assistant_id)
-        return run.id
+        async def create(messages):
+            extra = {'extra_body': {'additional_messages': messages}} if messages else {}
+            run = await self.openai.beta.threads.runs.create(
+                thread_id=self.thread_id, assistant_id=self.assistant_id, **extra)
+            return run.id
+
+        return await self._create_run_with_messages(create)
+
+    async def add_messages(self, messages):
+        """
+        Adds user messages to the thread without starting a run.
+
+        :param messages: The messages, e.g. {"role": "user", "content": "Hi"}.
+        """
+        for message in messages:
+            await self.openai.beta.threads.messages.create(thread_id=self.thread_id, **message)
 
-    async def process_run(self, run_id):
+    async def _create_run_with_messages(self, create):
+        """
+        Creates a run with the new messages in the same request if possible, otherwise adds
+        them to the thread first.
+
+        :param create: Coroutine function creating the run, called with the messages to send along or None.
+        :return: The result of create.
+        """
+        messages, self.new_messages = self.new_messages, []
+        # Messages with files are created separately, additional messages take attachments instead of file_ids
+        if messages and self.additional_messages_supported() and not any('file_ids' in message for message in messages):
+            try:
+                return await create(messages)
+            except BadRequestError as e:
+                if 'additional_messages' not in str(e):
+                    self.new_messages = messages  # Not added, e.g. for the fallback to polling
+                    raise
+                print(f"Runs can't be created with additional messages, adding them to the thread first: {e}")
+                self._additional_messages_refused_at[self.assistant_id] = time.monotonic()
+            except Exception:
+                self.new_messages = messages
+                raise
+
+        await self.add_messages(messages)
+        return await create(None)
+
+    def additional_messages_supported(self):
+        """
+        Returns whether the runs of the assistant are created with the new messages. After the
+        API refused them, the messages are added to the thread first for
+        ADDITIONAL_MESSAGES_RETRY_INTERVAL seconds, then sending them along is tried again.
+        """
+        refused_at = self._additional_messages_refused_at.get(self.assistant_id)
+        return refused_at is None or time.monotonic() - refused_at >= self.ADDITIONAL_MESSAGES_RETRY_INTERVAL
+
+    async def process_run(self, run_id, timeout=None):
+        """
+        Polls a run until it ends and sends its answer. A run that fails to end in time, or
+        whose processing fails or is cancelled, is cancelled.
+
+        :param run_id: ID of the run.
+        :param timeout: Seconds the run may take, the budget of the 'run' stage if None.
+        """
         start_time = time.time()
-        run = await self.wait_for_run_completion(run_id, start_time)
+        try:
+            run = await self.wait_for_run_completion(run_id, start_time, timeout)
+        except (Exception, asyncio.CancelledError):
+            # Don't leave the run active on OpenAI, it would block the next message of the thread
+            print(f"Run {run_id} interrupted, cancelling it.")
+            await self.cancel_run(self.thread_id, run_id)
+            raise
         if run:
             await self.handle_run_response(run)
 
-    def cancel_run(self, thread_id, run_id):
+    async def wait_for_run_end(self, timeout=CANCEL_TIMEOUT):
+        """
+        Waits until the run is no longer active, e.g. after cancelling it. The thread
+        accepts no new messages and runs before that.
+
+        :param timeout: Maximum number of seconds to wait.
+        """
+        if not self.run_id:
+            return
+
+        deadline = time.time() + timeout
+        delays = self.POLLING_STRATEGY.delays()
+        while time.time() < deadline:
+            try:
+                run = await self.openai.beta.threads.runs.retrieve(thread_id=self.thread_id, run_id=self.run_id)
+            except Exception as e:
+                print(f"Error occurred while waiting for run {self.run_id} to end: {e}")
+                return
+            if run.status not in self.RUN_ACTIVE_STATUSES:
+                return
+            await asyncio.sleep(next(delays))
+        print(f"Run {self.run_id} still active after {timeout} seconds.")
+
+    async def interrupt_answer(self):
+        """
+        Marks the partly streamed answer of a cancelled run as interrupted and decreases
+        the balance for the text the user already got.
+        """
+        streaming_message, self.streaming_message = self.streaming_message, None
+        if not streaming_message or not streaming_message.messages:
+            return
+
+        amount = self.tokenizer.tokens_to_money_from_string(streaming_message.text, "output")
+        print(f'---->>> Conversation balance decreased by: {amount} for interrupted output text')
+        self.conversation.balance -= amount
+        await streaming_message.finish(f"{streaming_message.text}\n\n{_('(Interrupted by your new message)')}")
+
+    async def cancel_run(self, thread_id, run_id):
         if not thread_id or not run_id:
             print("Failed to cancel run with invalid IDs.")
             return
 
         try:
-            self.openai.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            await self.openai.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
         except Exception as e:
             print(f"Error occurred while cancelling the run: {e}")
 
     # Thread handling
 
-    def create_thread(self, session, conversation):
-        thread = self.openai.beta.threads.create()
-        self.thread_id = thread.id
-        conversation.thread_id = thread.id
-        session.query(Conversation).filter_by(id=conversation.id).update({"thread_id": thread.id})
+    async def create_thread(self, session, conversation):
+        if self.thread_pool:
+            thread_id = await self.thread_pool.acquire()
+        else:
+            thread_id = (await self.openai.beta.threads.create()).id
+        self.thread_id = thread_id
+        conversation.thread_id = thread_id
+        session.query(Conversation).filter_by(id=conversation.id).update({"thread_id": thread_id})
         session.commit()
 
-    def recreate_thread(self, session, conversation):
-        self.openai.beta.threads.delete(conversation.thread_id)
-        self.create_thread(session, conversation)
-
-    async def wait_for_run_completion(self, run_id, start_time):
-        while time.time() - start_time < self.MAX_RUN_DURATION:
-            run = self.openai.beta.threads.runs.retrieve(
+    async def recreate_thread(self, session, conversation):
+        if not conversation.thread_id:
+            pass  # Already deleted, e.g. by the ThreadSweeper
+        elif self.thread_pool:
+            # The old thread is deleted in the background, the user doesn't wait for it
+            self.thread_pool.release(conversation.thread_id)
+        else:
+            await self.openai.beta.threads.delete(conversation.thread_id)
+        await self.create_thread(session, conversation)
+
+    async def wait_for_run_completion(self, run_id, start_time, timeout=None):
+        polls = 0
+        delays = self.POLLING_STRATEGY.delays()
+        if timeout is None:
+            timeout = min(self.MAX_RUN_DURATION, self.deadline.budget('run'))
+        while time.time() - start_time < timeout:
+            run = await self.openai.beta.threads.runs.retrieve(
                 thread_id=self.thread_id, run_id=run_id)
+            polls += 1
             if run.status == "completed":
+                self._record_usage(getattr(run, 'usage', None))
+                self._observe('polls', polls, self.POLL_COUNT_BUCKETS)
+                self._observe('completion_latency', time.time() - start_time)
                 return run
+            elif run.status in self.RUN_FAILED_STATUSES:
+                self._record_usage(getattr(run, 'usage', None))
+                print(f"Run {run_id} ended with status {run.status}: {run.last_error}")
+                self._observe('polls', polls, self.POLL_COUNT_BUCKETS)
+                return None
             elif run.status == 'requires_action':
                 await self.submit_tool_outputs(run)
-            await asyncio.sleep(3)
-        self.cancel_run(self.thread_id, run_id)
-        return None
+                # The run continues with the tool outputs, poll it quickly again
+                delays = self.POLLING_STRATEGY.delays()
+            await asyncio.sleep(next(delays))
+        self._observe('polls', polls, self.POLL_COUNT_BUCKETS)
+        self.deadline.exceeded('run', timeout)  # process_run cancels the run
 
     async def handle_run_response(self, run):
-        messages = self.openai.beta.threads.messages.list(thread_id=self.thread_id)
-        for content in messages.data[0].content:
+        messages = await self.list_thread_messages(refresh=True)
+        # Newest first, only the answers of this run, e.g. not a message the user sent meanwhile
+        run_messages = [message for message in messages if message.run_id == run.id and message.role == 'assistant']
+        for message in reversed(run_messages):
+            await self._process_message(message)
+
+    def _record_usage(self, usage):
+        """
+        Adds the token usage of an ended run to the usage of the update.
+
+        :param usage: The run's usage, a dict or an object with prompt_tokens and completion_tokens, or None.
+        """
+        names = ('prompt_tokens', 'completion_tokens')
+        tokens = [usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None) for name in names]
+        if not all(isinstance(count, int) for count in tokens):
+            return  # Not reported, e.g. by an older API version
+        if self.usage is None:
+            self.usage = dict.fromkeys(names, 0)
+        for name, count in zip(names, tokens):
+            self.usage[name] += count
+
+    async def calculate_turn_amount(self):
+        """
+        Returns the cost of the tokens the assistant used to answer the update.
+
+        The prompt and completion tokens reported by OpenAI for the runs are billed, so the
+        cost of billing doesn't grow with the thread. Without a reported usage, the latest
+        thread messages and the assistant's prompt are billed as input and the answers sent
+        to the user as output, all tokenized locally.
+        """
+        if self.usage:
+            return self.tokenizer.tokens_to_money_from_usage(self.usage['prompt_tokens'], self.usage['completion_tokens'])
+
+        messages = await self.list_thread_messages()
+        amount = await self.tokenizer.calculate_thread_total_amount(messages, self.assistant_id)
+        for text in self.output_texts:
+            amount += self.tokenizer.tokens_to_money_from_string(text, "output")
+        return amount
+
+    async def list_thread_messages(self, refresh=False):
+        """
+        Returns the latest THREAD_MESSAGES_LIMIT messages of the thread, newest first.
+
+        The listing is kept for the rest of the update, so answering a run and billing
+        the thread share one request.
+
+        :param refresh: Whether to list the messages again, e.g. after a run added its answer.
+        """
+        if refresh or self.thread_messages is None or self.thread_messages[0] != self.thread_id:
+            messages = await self.openai.beta.threads.messages.list(
+                thread_id=self.thread_id, limit=self.THREAD_MESSAGES_LIMIT, order='desc')
+            self.thread_messages = (self.thread_id, messages.data)
+        return self.thread_messages[1]
+
+    async def _process_message(self, message, streaming_message=None):
+        for content in message.content:
             if content.type == 'text':
-                await self._process_text_content(content)
+                await self._process_text_content(content, streaming_message)
+                streaming_message = None
             elif content.type == 'image_file':
                 await self._process_image_content(content)
 
-    async def _process_text_content(self, content):
+    async def _process_text_content(self, content, streaming_message=None):
         """
-        Process text content from the OpenAI thread message.
-        Decrease the conversation balance based on text length and sends the response back to the user.
+        Process text content from the OpenAI thread message and sends the response back to the user.
+        The text is billed with the turn, see calculate_turn_amount.
 
         :param content: Content object containing text details.
+        :param streaming_message: The StreamingMessage already showing the text, if the run was streamed.
         """
         response_text = content.text.value
         print(f'AI responded: {response_text}')
-
-        # Decrease balance for the output text
-        amount = self.tokenizer.tokens_to_money_from_string(response_text, "output")
-        print(f'---->>> Conversation balance decreased by: {amount} for output text')
-        self.conversation.balance -= amount
+        self.output_texts.append(response_text)
 
         # Define a threshold for a short message
         short_message_threshold = 100
-        if len(response_text) <= short_message_threshold and random.randint(1, 10) == 1:
+        if streaming_message:
+            await streaming_message.finish(response_text)
+        elif len(response_text) <= short_message_threshold and random.randint(1, 10) == 1:
             await self.answer.answer_with_voice(response_text)
 
             # Update the balance for output voice
@@ -114,6 +520,7 @@ class ThreadRunManager:
             self.conversation.balance -= amount
         else:
             await self.answer.answer_with_text(response_text)
+        self._first_token_sent()
 
         # Check for annotations and send document if present
         if 'annotations' in content.text:
@@ -162,31 +569,43 @@ class ThreadRunManager:
 
         args = json.loads(tool_call.function.arguments)
 
-        # Convert function name from camel case to snake case for the module
-        module_name = inflection.underscore(function_name) + '_handler'  # Append '_handler'
+        # Look up the handler class registered for the function (e.g., "generateImage" -> GenerateImageHandler)
+        handler_class = HandlerRegistry.get_function_handler(function_name)
+        if not handler_class:
+            print(f"Handler for function {function_name} not found.")
+            return self._default_tool_function(tool_call.id, args)
 
-        # Convert function name to handler class name (e.g., "generate_image" -> "GenerateImageHandler")
-        handler_class_name = inflection.camelize(function_name) + 'Handler'
+        handler = handler_class(self.openai, self.update, self.context, self.conversation)
+        return await handler.handle(tool_call.id, args)
 
-        try:
-            # Dynamically import the handler class
-            module = __import__(f'lib.openai.function_handlers.{module_name}', fromlist=[handler_class_name])
-            handler_class = getattr(module, handler_class_name, fh_base.BaseFunctionHandler)
+    async def _get_tool_outputs(self, run):
+        """
+        Handles the tool calls of a run concurrently, at most MAX_PARALLEL_TOOL_CALLS at a time.
 
-            # Instantiate the handler class
-            handler = handler_class(self.openai, self.update, self.context, self.conversation)
-            return await handler.handle(tool_call.id, args)
-        except ModuleNotFoundError as e:
-            print(f"Module not found: {e}")
-            # Handle the error or return a default response
+        :param run: The run requiring action.
+        :return: The outputs, in the order of the tool calls.
+        """
+        slots = asyncio.Semaphore(self.MAX_PARALLEL_TOOL_CALLS)
+
+        async def handle(tool_call):
+            async with slots:
+                try:
+                    return await self._handle_tool_call(tool_call)
+                except Exception as e:
+                    # A failed call must not lose the outputs of the others, the assistant gets the error instead
+                    print(f"Error occurred while handling tool call {tool_call.id}: {e}")
+                    return {
+                        "tool_call_id": tool_call.id,
+                        "output": f"Error: {e}"
+                    }
+
+        tool_calls = run.required_action.submit_tool_outputs.tool_calls
+        return list(await asyncio.gather(*(handle(tool_call) for tool_call in tool_calls)))
 
     async def submit_tool_outputs(self, run):
-        tool_outputs = []
-        for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-            output = await self._handle_tool_call(tool_call)
-            tool_outputs.append(output)
+        tool_outputs = await self._get_tool_outputs(run)
 
-        self.openai.beta.threads.runs.submit_tool_outputs(
+        await self.openai.beta.threads.runs.submit_tool_outputs(
             thread_id=self.thread_id,
             run_id=run.id,
             tool_outputs=tool_outputs
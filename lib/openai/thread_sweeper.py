@@ -0,0 +1,131 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from db.engine import SessionLocal
+from db.models.conversation import Conversation
+from lib.metrics import Metrics
+
+class ThreadSweeper:
+    """
+    Deletes the OpenAI threads of idle conversations.
+
+    A conversation idle for longer than the thread recreation interval gets a new thread
+    when its user comes back, so its old thread is never used again. The sweeper finds
+    these conversations by updated_at, clears their thread_id and deletes their threads,
+    in batches and at most requests_per_second deletions per second. The returning user's
+    conversation then gets a new thread without waiting for the deletion.
+
+    thread_id is only cleared if it didn't change since the batch was read, so a
+    conversation that got a new thread in the meantime keeps it. In dry-run mode the
+    expired conversations are only counted.
+
+    Metrics, prefixed with the sweeper name:
+    <name>.sweeper.deleted (counter): threads deleted.
+    <name>.sweeper.failed (counter): threads whose deletion failed.
+    <name>.sweeper.duration (histogram): seconds taken by a sweep.
+    """
+
+    IDLE_INTERVAL = timedelta(hours=1)  # Same as ThreadRunManager.thread_recreation_interval
+    BATCH_SIZE = 50  # Conversations read and updated at once
+    REQUESTS_PER_SECOND = 5  # Maximum number of threads.delete calls per second
+
+    def __init__(self, openai_client, assistant_id: str = None, name: str = 'bot',
+                 idle_interval: timedelta = IDLE_INTERVAL, batch_size: int = BATCH_SIZE,
+                 requests_per_second: float = REQUESTS_PER_SECOND, dry_run: bool = False,
+                 session_factory=SessionLocal):
+        """
+        Initialize the sweeper.
+
+        :param openai_client: The OpenAI client deleting the threads.
+        :param assistant_id: Only the conversations of this assistant are swept, all if None.
+        :param name: Prefix of the sweeper metrics, usually the bot name.
+        :param idle_interval: Time since the last update after which a thread is expired.
+        :param batch_size: Number of conversations processed at once.
+        :param requests_per_second: Maximum rate of thread deletions.
+        :param dry_run: Whether to only count the expired threads.
+        :param session_factory: Creates the database sessions.
+        """
+        self.openai = openai_client
+        self.assistant_id = assistant_id
+        self.name = name
+        self.idle_interval = idle_interval
+        self.batch_size = batch_size
+        self.requests_per_second = requests_per_second
+        self.dry_run = dry_run
+        self.session_factory = session_factory
+        self._next_request_at = 0
+
+    async def sweep(self) -> dict:
+        """
+        Deletes the threads of all the conversations idle for longer than idle_interval.
+
+        :return: Statistics of the sweep: expired, deleted, failed and skipped threads, elapsed
+                 seconds and deleted threads per second.
+        """
+        start_time = time.perf_counter()
+        stats = {'expired': 0, 'deleted': 0, 'failed': 0, 'skipped': 0, 'dry_run': self.dry_run}
+        expired_before = datetime.utcnow() - self.idle_interval
+        last_id = 0
+
+        while True:
+            batch = self._get_expired_batch(expired_before, last_id)
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            stats['expired'] += len(batch)
+            if not self.dry_run:
+                await self._sweep_batch(batch, stats)
+
+        elapsed = time.perf_counter() - start_time
+        stats['elapsed'] = elapsed
+        stats['threads_per_second'] = stats['deleted'] / elapsed if elapsed else 0
+        Metrics.observe(self._metric('duration'), elapsed)
+        print(f"Thread sweeper {self.name}{' (dry run)' if self.dry_run else ''}: {stats['expired']} expired, "
+              f"{stats['deleted']} deleted, {stats['failed']} failed, {stats['skipped']} skipped "
+              f"in {elapsed:.1f} s ({stats['threads_per_second']:.1f} threads/s)")
+        return stats
+
+    def _get_expired_batch(self, expired_before: datetime, last_id: int) -> list:
+        with self.session_factory() as session:
+            query = session.query(Conversation.id, Conversation.thread_id).filter(
+                Conversation.id > last_id,
+                Conversation.thread_id.isnot(None),
+                Conversation.updated_at < expired_before
+            )
+            if self.assistant_id:
+                query = query.filter(Conversation.assistant_id == self.assistant_id)
+            return [tuple(row) for row in query.order_by(Conversation.id).limit(self.batch_size).all()]
+
+    async def _sweep_batch(self, batch: list, stats: dict) -> None:
+        cleared = []
+        with self.session_factory() as session:
+            for conversation_id, thread_id in batch:
+                # updated_at keeps the time of the user's last message
+                updated = session.query(Conversation).filter_by(id=conversation_id, thread_id=thread_id).update(
+                    {'thread_id': None, 'updated_at': Conversation.updated_at}, synchronize_session=False)
+                if updated:
+                    cleared.append(thread_id)
+                else:
+                    stats['skipped'] += 1  # The conversation got a new thread since the batch was read
+            session.commit()
+
+        for thread_id in cleared:
+            await self._wait_for_rate_limit()
+            try:
+                await self.openai.beta.threads.delete(thread_id)
+                stats['deleted'] += 1
+                Metrics.increment(self._metric('deleted'))
+            except Exception as e:
+                print(f"Thread sweeper {self.name}: failed to delete thread {thread_id}: {e}")
+                stats['failed'] += 1
+                Metrics.increment(self._metric('failed'))
+
+    async def _wait_for_rate_limit(self) -> None:
+        now = time.monotonic()
+        if self._next_request_at > now:
+            await asyncio.sleep(self._next_request_at - now)
+        self._next_request_at = max(now, self._next_request_at) + 1 / self.requests_per_second
+
+    def _metric(self, name: str) -> str:
+        return f'{self.name}.sweeper.{name}'
@@ -1,8 +1,35 @@
+import asyncio
+import threading
 import tiktoken
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from lib.openai.assistant import Assistant
 
 class Tokenizer:
+    """
+    Counts tokens with tiktoken and prices them, with the profit margin.
+
+    One tokenizer per model is shared by the whole process, see get_shared, and the tiktoken
+    encodings are loaded once per model into a registry shared by all the tokenizers.
+    warm_up loads them at startup, so the first message doesn't wait for them. A tokenizer
+    only holds its model and encoding, and tiktoken encodings can be used from several threads.
+
+    Thread messages never change once written, so their token counts are kept by message
+    ID in a bounded LRU, and every turn only tokenizes the messages it didn't see before.
+    The LRU is also shared by all the tokenizers of the process and guarded by a lock,
+    so that tokenizers can be used from several threads.
+
+    Large texts, e.g. extracted documents, are counted with count_tokens: they are split into
+    chunks of about CHUNK_SIZE characters before a space, the chunks are encoded in parallel
+    by a thread pool shared by the process, outside the event loop, and only their token
+    counts are kept.
+    """
+
+    DEFAULT_MODEL = "gpt-3.5-turbo"
+    MESSAGE_TOKENS_CACHE_SIZE = 10000  # Token counts of thread messages kept in memory
+    CHUNK_SIZE = 100000  # Characters encoded at once when counting large texts
+    COUNTING_THREADS = 4  # Chunks encoded in parallel, tiktoken releases the GIL while encoding
     MAX_OUTPUT_TOKENS = 4096
     PROFIT_MARGIN = Decimal('0.31') # 31% profit margin
     MINIMUM_COST = Decimal('0.003')
@@ -26,14 +53,53 @@ class Tokenizer:
         "dall-e-3": 0.040
     }
 
-    def __init__(self, model="gpt-3.5-turbo"):
+    _encodings = {}  # model -> tiktoken encoding, shared by the whole process
+    _shared_tokenizers = {}  # model -> Tokenizer
+    _message_tokens = OrderedDict()  # (model, message id) -> tokens, least recently used first
+    _message_tokens_lock = threading.Lock()
+    _counting_executor = ThreadPoolExecutor(COUNTING_THREADS, thread_name_prefix='tokenizer')  # Starts threads on first use
+
+    def __init__(self, model=DEFAULT_MODEL):
         """
         Initializes the tokenizer with a specific model.
 
         :param model: The model to be used for tokenization.
         """
         self.model = model
-        self.encoding = tiktoken.encoding_for_model(model)
+        self.encoding = self.get_encoding(model)
+
+    @classmethod
+    def get_encoding(cls, model=DEFAULT_MODEL):
+        """
+        Returns the tiktoken encoding of a model, loaded on first use only.
+
+        :param model: The model to be used for tokenization.
+        """
+        if model not in cls._encodings:
+            cls._encodings[model] = tiktoken.encoding_for_model(model)
+        return cls._encodings[model]
+
+    @classmethod
+    def get_shared(cls, model=DEFAULT_MODEL):
+        """
+        Returns the tokenizer of a model shared by the whole process, so that handlers
+        and run managers don't create one per message.
+
+        :param model: The model to be used for tokenization.
+        """
+        if model not in cls._shared_tokenizers:
+            cls._shared_tokenizers[model] = cls(model)
+        return cls._shared_tokenizers[model]
+
+    @classmethod
+    def warm_up(cls, models=(DEFAULT_MODEL,)):
+        """
+        Loads the encodings of the models and creates their shared tokenizers, e.g. at startup.
+
+        :param models: The models to be used for tokenization.
+        """
+        for model in models:
+            cls.get_shared(model)
 
     def num_tokens_from_string(self, string: str) -> int:
         """
@@ -44,6 +110,71 @@ class Tokenizer:
         """
         return len(self.encoding.encode(string))
 
+    def num_tokens_from_strings(self, strings: list) -> list:
+        """
+        Returns the number of tokens in each of the given strings, encoding the chunks of
+        large strings in parallel. Special tokens are counted as plain text.
+
+        :param strings: The text strings to tokenize.
+        :return: The number of tokens in each string, in the same order.
+        """
+        chunks = [self._split_text(string) for string in strings]
+        all_chunks = [chunk for string_chunks in chunks for chunk in string_chunks]
+        if len(all_chunks) > 1:
+            counts = self._counting_executor.map(self._count_chunk_tokens, all_chunks)
+        else:
+            counts = map(self._count_chunk_tokens, all_chunks)
+        return self._sum_chunk_counts(chunks, counts)
+
+    async def count_tokens(self, strings: list) -> list:
+        """
+        Returns the number of tokens in each of the given strings without blocking the event
+        loop, so that counting a large document doesn't stall the other chats.
+
+        :param strings: The text strings to tokenize.
+        :return: The number of tokens in each string, in the same order.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = [self._split_text(string) for string in strings]
+        counts = await asyncio.gather(*(
+            loop.run_in_executor(self._counting_executor, self._count_chunk_tokens, chunk)
+            for string_chunks in chunks for chunk in string_chunks
+        ))
+        return self._sum_chunk_counts(chunks, counts)
+
+    def _count_chunk_tokens(self, chunk: str) -> int:
+        return len(self.encoding.encode_ordinary(chunk))
+
+    @staticmethod
+    def _sum_chunk_counts(chunks: list, counts) -> list:
+        """
+        Adds up the token counts of the chunks of each string.
+
+        :param chunks: The chunks of each string.
+        :param counts: The token counts of all the chunks, in the same order.
+        """
+        counts = iter(counts)
+        return [sum(next(counts) for _ in string_chunks) for string_chunks in chunks]
+
+    def _split_text(self, text: str) -> list:
+        """
+        Splits a text into chunks of at most CHUNK_SIZE characters. A chunk ends before a space
+        that follows a non-space character, where tiktoken starts a new token anyway, so the
+        chunks have the same tokens as the whole text.
+        """
+        chunks = []
+        start = 0
+        while len(text) - start > self.CHUNK_SIZE:
+            end = text.rfind(' ', start + 1, start + self.CHUNK_SIZE)
+            while end > start and text[end - 1].isspace():
+                end = text.rfind(' ', start + 1, end)
+            if end <= start:
+                end = start + self.CHUNK_SIZE  # No space to split at, e.g. a long run of symbols
+            chunks.append(text[start:end])
+            start = end
+        chunks.append(text[start:])
+        return chunks
+
     def tokens_to_money(self, tokens: int, token_type: str = "input") -> Decimal:
         """
         Calculates the cost of a given number of tokens, including a profit margin.
@@ -87,6 +218,16 @@ class Tokenizer:
         # Use the existing method to calculate the cost
         return self.tokens_to_money(tokens, token_type)
 
+    def tokens_to_money_from_usage(self, prompt_tokens: int, completion_tokens: int) -> Decimal:
+        """
+        Calculates the cost of the tokens an assistant run reported in its usage.
+
+        :param prompt_tokens: The number of input tokens, including the thread and the instructions.
+        :param completion_tokens: The number of output tokens.
+        :return: The cost in Decimal of the input and the output tokens.
+        """
+        return self.tokens_to_money(prompt_tokens, 'input') + self.tokens_to_money(completion_tokens, 'output')
+
     def tokens_to_money_to_voice(self, string: str) -> Decimal:
         """
         Calculates the cost of converting a given string to voice using TTS.
@@ -252,32 +393,51 @@ class Tokenizer:
         :param messages: A list of messages from a conversation.
         :return: The total number of tokens in the messages.
         """
-        total_tokens = 0
-        for message in messages:
-            if message.content and message.content[0].type == 'text':
-                text = message.content[0].text.value
-                total_tokens += self.num_tokens_from_string(text)
+        return sum(self.num_tokens_from_message(message) for message in messages)
 
-        return total_tokens
+    def num_tokens_from_message(self, message) -> int:
+        """
+        Returns the number of tokens in the text of a thread message, counted only once per
+        message ID. Messages without an ID, e.g. not yet added to the thread, are always tokenized.
 
-    def calculate_assistant_prompt_tokens(self):
+        :param message: A message from a conversation thread.
+        :return: The number of tokens in the message, 0 if it has no text.
+        """
+        message_id = getattr(message, 'id', None)
+        key = (self.model, message_id) if isinstance(message_id, str) else None
+        with self._message_tokens_lock:
+            if key in self._message_tokens:
+                self._message_tokens.move_to_end(key)
+                return self._message_tokens[key]
+
+        # Encoded outside the lock, so that other threads don't wait for a long message
+        tokens = 0
+        if message.content and message.content[0].type == 'text':
+            tokens = self.num_tokens_from_string(message.content[0].text.value)
+
+        if key:
+            with self._message_tokens_lock:
+                self._message_tokens[key] = tokens
+                self._message_tokens.move_to_end(key)
+                if len(self._message_tokens) > self.MESSAGE_TOKENS_CACHE_SIZE:
+                    self._message_tokens.popitem(last=False)
+        return tokens
+
+    async def calculate_assistant_prompt_tokens(self, assistant_id=None):
         """
         Calculates the total number of tokens used in the assistant's prompt.
 
-        This method retrieves the prompt text from the assistant and calculates the
-        number of tokens it consists of. The prompt text is the initial set of instructions
-        or information that the assistant uses to guide its responses or actions.
+        The prompt text is the initial set of instructions or information that the assistant
+        uses to guide its responses or actions. The instructions and their token count are
+        cached with the assistant's metadata, see Assistant.metadata.
 
+        :param assistant_id: ID of the assistant, the default assistant is used if not provided.
         :return: The total number of tokens in the assistant's prompt.
         """
-        assistant = Assistant()
-        prompt_text = assistant.prompt()
-        if prompt_text:
-            return self.num_tokens_from_string(prompt_text)
-        else:
-            return 0
+        assistant = Assistant(assistant_id=assistant_id)
+        return await assistant.prompt_tokens(self)
 
-    def calculate_thread_total_amount(self, messages):
+    async def calculate_thread_total_amount(self, messages, assistant_id=None):
         """
         Calculates the total cost of processing a thread of messages based on token usage.
 
@@ -286,10 +446,11 @@ class Tokenizer:
         It considers both the input and output tokens generated during the conversation.
 
         :param messages: A list of messages from a conversation thread.
+        :param assistant_id: ID of the assistant the thread belongs to.
         :return: The total cost in Decimal for processing the tokens in the thread.
         """
         messages_tokens = self.calculate_thread_tokens(messages)
-        prompt_tokens = self.calculate_assistant_prompt_tokens()        
+        prompt_tokens = await self.calculate_assistant_prompt_tokens(assistant_id)
         if prompt_tokens is not None:
             return self.tokens_to_money(messages_tokens + prompt_tokens, 'input')
         else:
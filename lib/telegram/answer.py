@@ -1,11 +1,93 @@
 import os
+import time
+import asyncio
 from pathlib import Path
 from docx import Document
 from io import BytesIO
+from telegram.error import BadRequest, RetryAfter
+from lib.deadline import Deadline
 from lib.localization import _
 
+class StreamingMessage:
+    """
+    Telegram message showing a text that is still being generated.
+
+    The first part of the text is sent right away, the rest is added by editing the
+    message. Telegram limits how often a message can be edited, so edits are throttled
+    to one per EDIT_INTERVAL seconds and made only when enough new text has arrived.
+    """
+
+    EDIT_INTERVAL = 1.0  # Minimum number of seconds between two edits
+    MIN_EDIT_CHARS = 20  # Minimum number of new characters worth an edit
+    MAX_MESSAGE_LENGTH = 4096  # Telegram's limit, longer texts are split into several messages
+
+    def __init__(self, bot, chat_id):
+        """
+        :param bot: The Telegram bot sending the message.
+        :param chat_id: The ID of the Telegram chat.
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.text = ''
+        self.messages = []  # Sent messages, the last one is being edited
+        self.sent_texts = []  # Texts currently shown by the sent messages
+        self.last_edit_at = 0
+
+    async def append(self, text: str) -> None:
+        """
+        Adds generated text, updating the Telegram message if the throttling allows it.
+
+        :param text: The new part of the text.
+        """
+        self.text += text
+        if not self.text.strip():
+            return
+
+        shown = sum(len(sent_text) for sent_text in self.sent_texts)
+        if self.messages and (time.monotonic() - self.last_edit_at < self.EDIT_INTERVAL
+                              or len(self.text) - shown < self.MIN_EDIT_CHARS):
+            return
+        await self._show(self.text)
+
+    async def finish(self, text: str = None) -> None:
+        """
+        Shows the complete text.
+
+        :param text: The final text, replacing the streamed one, e.g. the completed message.
+        """
+        if text is not None:
+            self.text = text
+        if self.text.strip():
+            await self._show(self.text, final=True)
+
+    async def _show(self, text: str, final: bool = False) -> None:
+        chunks = [text[start:start + self.MAX_MESSAGE_LENGTH]
+                  for start in range(0, len(text), self.MAX_MESSAGE_LENGTH)]
+        for index, chunk in enumerate(chunks):
+            if index >= len(self.messages):
+                self.messages.append(await self.bot.send_message(self.chat_id, chunk))
+                self.sent_texts.append(chunk)
+            elif chunk != self.sent_texts[index]:
+                await self._edit(index, chunk, final)
+        self.last_edit_at = time.monotonic()
+
+    async def _edit(self, index: int, text: str, final: bool = False) -> None:
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.messages[index].message_id)
+            self.sent_texts[index] = text
+        except RetryAfter as e:
+            print(f"Streaming message edit throttled by Telegram for {e.retry_after} seconds")
+            if final:
+                # The final text must be shown, intermediate edits can be skipped
+                await asyncio.sleep(e.retry_after)
+                await self._edit(index, text, final)
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                raise
+            self.sent_texts[index] = text
+
 class Answer:
-    def __init__(self, openai_client, context, chat_id, thread_id):
+    def __init__(self, openai_client, context, chat_id, thread_id, deadline: Deadline = None):
         """
         Initialize the Answer object with necessary parameters.
 
@@ -13,11 +95,13 @@ class Answer:
         :param context: The context of the bot, containing relevant information and utilities.
         :param chat_id: The ID of the Telegram chat where messages will be sent.
         :param thread_id: The ID of the thread for the conversation.
+        :param deadline: Deadline of the request, every message must be sent within its 'send' budget.
         """
         self.openai = openai_client
         self.context = context
         self.chat_id = chat_id
         self.thread_id = thread_id
+        self.deadline = deadline or Deadline()
 
     async def answer_with_text(self, message):
         """
@@ -25,7 +109,13 @@ class Answer:
 
         :param message: The content of the text message to be sent.
         """
-        await self.context.bot.send_message(self.chat_id, message)
+        await self.deadline.run('send', self.context.bot.send_message(self.chat_id, message))
+
+    def start_streaming_message(self) -> StreamingMessage:
+        """
+        Create a text message that is sent and updated while the answer is being generated.
+        """
+        return StreamingMessage(self.context.bot, self.chat_id)
 
     async def answer_with_voice(self, message):
         """
@@ -37,7 +127,7 @@ class Answer:
         :param message: The text content to be converted into a voice message.
         """
         # Generate a voice message using the OpenAI API
-        response = self.openai.audio.speech.create(
+        response = await self.openai.audio.speech.create(
             model="tts-1",
             voice="nova",
             input=message
@@ -50,7 +140,7 @@ class Answer:
         voice_file.seek(0) # Reset the pointer to the beginning of the BytesIO object
 
         # Send the voice message to the Telegram chat
-        await self.context.bot.send_voice(self.chat_id, voice=voice_file)
+        await self.deadline.run('send', self.context.bot.send_voice(self.chat_id, voice=voice_file))
 
     async def answer_with_image(self, file_id):
         """
@@ -61,18 +151,19 @@ class Answer:
 
         :param file_id: The ID of the file to fetch and send as an image.
         """
-        async with self.openai.files.content(file_id) as response:
-            if response.status == 200:
-                image_data_bytes = await response.read()
+        try:
+            response = await self.openai.files.content(file_id)
+        except Exception as e:
+            # Handle error in fetching the image
+            print(f"Failed to fetch image with file_id {file_id}: {e}")
+            await self.context.bot.send_message(self.chat_id, _("Failed to fetch image with file."))
+            return
 
-                # Use BytesIO to create a file-like object from the bytes, which can be sent directly
-                image_file = BytesIO(image_data_bytes)
-                image_file.name = f"{file_id}.png"  # Set a name for the file to be sent
+        # Use BytesIO to create a file-like object from the bytes, which can be sent directly
+        image_file = BytesIO(response.content)
+        image_file.name = f"{file_id}.png"  # Set a name for the file to be sent
 
-                await self.context.bot.send_photo(self.chat_id, photo=image_file)
-            else:
-                # Handle error in fetching the image
-                await self.context.bot.send_message(self.chat_id, _("Failed to fetch image with file."))
+        await self.deadline.run('send', self.context.bot.send_photo(self.chat_id, photo=image_file))
 
     async def answer_with_annotation(self, annotation_data):
         """
@@ -88,19 +179,19 @@ class Answer:
         file_extension = os.path.splitext(annotation_data['text'])[1]
 
         # Fetch the file content from the OpenAI API
-        async with self.openai.files.content(file_id) as response:
-            if response.status == 200:
-                file_data_bytes = await response.read()
+        try:
+            response = await self.openai.files.content(file_id)
+        except Exception as e:
+            # Handle error in fetching the file
+            print(f"Failed to fetch document with file_id {file_id}: {e}")
+            return
 
-                # Use BytesIO to create a file-like object from the bytes
-                document_file = BytesIO(file_data_bytes)
-                document_file.name = f"{file_id}{file_extension}"  # Set a name for the file to be sent
+        # Use BytesIO to create a file-like object from the bytes
+        document_file = BytesIO(response.content)
+        document_file.name = f"{file_id}{file_extension}"  # Set a name for the file to be sent
 
-                # Send the document to the Telegram chat
-                await self.context.bot.send_document(self.chat_id, document_file)
-            else:
-                # Handle error in fetching the file
-                print(f"Failed to fetch document with file_id {file_id}.")
+        # Send the document to the Telegram chat
+        await self.deadline.run('send', self.context.bot.send_document(self.chat_id, document_file))
 
     async def answer_with_document(self, text: str):
         """
@@ -122,4 +213,4 @@ class Answer:
         doc_file.seek(0)  # Reset the pointer to the beginning of the BytesIO object
 
         # Send the document to the Telegram chat
-        await self.context.bot.send_document(self.chat_id, doc_file)
+        await self.deadline.run('send', self.context.bot.send_document(self.chat_id, doc_file))
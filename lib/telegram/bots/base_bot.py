@@ -1,10 +1,9 @@
-import glob
-import importlib
+import asyncio
 import logging
-import os
+import signal
 from contextlib import contextmanager
 from datetime import datetime
-from typing import Generator, List
+from typing import Callable, Generator, List
 
 from sqlalchemy.exc import SQLAlchemyError
 from telegram import Update
@@ -16,12 +15,22 @@ from telegram.ext import (Application, CallbackContext, CallbackQueryHandler,
 from db.engine import SessionLocal
 from db.models.conversation import Conversation
 from lib.constraints_checker import ConstraintsChecker
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.handler_registry import HandlerRegistry
 from lib.localization import _, change_language
+from lib.metrics import Metrics
+from lib.openai.active_run_store import ActiveRunStore
 from lib.openai.assistant import Assistant
+from lib.openai.thread_pool import ThreadPool
 from lib.openai.thread_run_manager import ThreadRunManager
 from lib.openai.tokenizer import Tokenizer
+from lib.telegram.bots.bot_config import BotConfig
+from lib.telegram.bots.bot_host import BotHost
+from lib.telegram.chat_scheduler import ChatScheduler
 from lib.telegram.helpers import Helpers
 from lib.telegram.payment import Payment
+from lib.telegram.request_context import RequestContext
+from lib.telegram.webhook_server import WebhookServer
 
 class BaseBot:
     """
@@ -32,20 +41,50 @@ class BaseBot:
     """
 
     TELEGRAM_BOT_TOKEN = None
+    CONCURRENT_UPDATES = 32  # Number of chats processed at the same time, updates of one chat run in order
 
-    def __init__(self) -> None:
+    DRAIN_TIMEOUT = 20  # Seconds to let in-flight updates finish on shutdown before cancelling them
+    MAX_QUEUED_UPDATES = 256  # Waiting updates above which new messages are answered with a "busy" reply
+    THREAD_POOL_SIZE = 5  # Empty OpenAI threads kept ready for new and recreated conversations
+
+    # Messages handled by message_handler, the only updates rejected under load
+    USER_MESSAGES = filters.UpdateType.MESSAGE & ~filters.COMMAND & ~filters.SUCCESSFUL_PAYMENT
+    # Messages that are answered by an assistant run
+    RUN_MESSAGES = USER_MESSAGES & ~filters.Document.ALL
+    # Messages rejected first under load
+    EXPENSIVE_MESSAGES = filters.VIDEO | filters.Document.ALL
+
+    def __init__(self, config: BotConfig = None) -> None:
         """
         Initializes the bot and sets up command handlers.
+
+        :param config: Configuration of the bot, read from the environment if not provided.
         """
-        self.assistant = Assistant()
-        self.payment = Payment()
-        self.tokenizer = Tokenizer()
+        self.config = config or BotConfig.from_env()
+        BotConfig.register(self.config)
+        self.TELEGRAM_BOT_TOKEN = self.config.telegram_bot_token
+        self.assistant = Assistant(assistant_id=self.config.assistant_id)
+        self.payment = Payment(self.config)
+        # Loads the encodings at startup, so the first message doesn't wait for them
+        Tokenizer.warm_up()
+        self.tokenizer = Tokenizer.get_shared()
         self.openai = self.assistant.get_openai_client()
-        self.application = Application.builder().token(self.TELEGRAM_BOT_TOKEN).build()
-        self.conversation = None
-        self.update = None
-        self.context = None
-        self.thread_run_manager = None
+        self.thread_pool = ThreadPool(self.openai, self.THREAD_POOL_SIZE, self.config.name)
+        self.run_store = ActiveRunStore(self.config.assistant_id)
+        self.resumed_runs = set()  # Tasks answering the runs interrupted by the last shutdown
+        self.scheduler = ChatScheduler(
+            self.config.concurrent_updates or self.CONCURRENT_UPDATES,
+            self.config.name,
+            max_queued_updates=self.MAX_QUEUED_UPDATES,
+            is_sheddable=self.USER_MESSAGES.check_update,
+            is_expensive=self.EXPENSIVE_MESSAGES.check_update,
+            rejection_handler=self.reply_busy
+        )
+        HandlerRegistry.setup()
+        self.application = (Application.builder()
+                            .token(self.TELEGRAM_BOT_TOKEN)
+                            .concurrent_updates(self.scheduler)
+                            .build())
         self._setup_handlers()
 
     # Private Utility Methods
@@ -74,7 +113,7 @@ class BaseBot:
         # Error handler
         self.application.add_error_handler(self.error_handler)
 
-    def _create_conversation(self, session: SessionLocal, update: Update) -> Conversation:
+    async def _create_conversation(self, session: SessionLocal, update: Update) -> Conversation:
         """
         Creates a new conversation record in the database.
 
@@ -82,16 +121,16 @@ class BaseBot:
         :param update: The Telegram update object containing the user's message.
         :return: The newly created Conversation object.
         """
-        # Create a new thread in OpenAI
-        thread = self.openai.beta.threads.create()
+        # Take a new thread in OpenAI
+        thread_id = await self.thread_pool.acquire()
 
         # Create a new Conversation object with user and thread details
         conversation = Conversation(
             user_id=update.message.from_user.id,
             language_code=update.message.from_user.language_code,
             username=update.message.from_user.username,
-            thread_id=thread.id,
-            assistant_id=Assistant.ASSISTANT_ID
+            thread_id=thread_id,
+            assistant_id=self.config.assistant_id
         )
 
         session.add(conversation)
@@ -101,7 +140,7 @@ class BaseBot:
         print(f"New conversation created at: {conversation.updated_at}")
         return conversation
 
-    def _get_or_create_conversation(self, session: SessionLocal) -> Conversation:
+    async def _get_or_create_conversation(self, session: SessionLocal, update: Update) -> Conversation:
         """
         Retrieves an existing conversation from the database or creates a new one.
 
@@ -109,13 +148,14 @@ class BaseBot:
         If found, it returns this conversation; otherwise, it creates a new conversation.
 
         :param session: The database session used to query or create the conversation.
+        :param update: The Telegram update object containing the user's message.
         :return: A Conversation object representing the current conversation.
         """
         # Attempt to find an existing conversation for the current user and assistant
         return (session.query(Conversation).filter_by(
-                    user_id=self.update.message.from_user.id,
-                    assistant_id=Assistant.ASSISTANT_ID).first() or 
-                self._create_conversation(session, self.update))
+                    user_id=update.message.from_user.id,
+                    assistant_id=self.config.assistant_id).first() or 
+                await self._create_conversation(session, update))
 
     @contextmanager
     def session_scope(self) -> Generator[SessionLocal, None, None]:
@@ -171,7 +211,7 @@ class BaseBot:
         with self.session_scope() as session:
             conversation = session.query(Conversation).filter_by(
                 user_id=user_id,
-                assistant_id=Assistant.ASSISTANT_ID
+                assistant_id=self.config.assistant_id
             ).first()
 
             if conversation:
@@ -201,7 +241,7 @@ class BaseBot:
             try:
                 conversation = session.query(Conversation).filter_by(
                     user_id=user_id,
-                    assistant_id=Assistant.ASSISTANT_ID
+                    assistant_id=self.config.assistant_id
                 ).first()
 
                 if conversation:
@@ -209,8 +249,8 @@ class BaseBot:
 
                     await context.bot.send_message(chat_id, _('Goodbye! If you need assistance again, just send me a message.'))
 
-                    thread_run_manager = ThreadRunManager(self.openai, update, context, conversation, session, chat_id)
-                    thread_run_manager.recreate_thread(session, conversation)
+                    thread_run_manager = ThreadRunManager(self.openai, update, context, conversation, session, chat_id, self.thread_pool)
+                    await thread_run_manager.recreate_thread(session, conversation)
                 else:
                     print(f'No active conversation found, chat_id: {chat_id}')
 
@@ -256,17 +296,36 @@ class BaseBot:
         :param update: Telegram update object containing message and chat details.
         :param context: Telegram context object for managing bot state and data.
         """
-        self.update = update
-        self.context = context
+        # Started when the update arrived, the time it waited for its chat counts too
+        deadline = self.scheduler.current_deadline()
         with self.session_scope() as session:
-            self.log_user_interaction()
-            successful_interaction = await self.handle_interaction(session)
-
-            # Check if the message is not a document before managing the run
-            if successful_interaction and not update.message.document:
-                await self.thread_run_manager.manage_run()
-
-            await self.update_balance_and_cleanup(session)
+            request = RequestContext(update, context, session, deadline)
+            self.log_user_interaction(request)
+            try:
+                successful_interaction = await self.handle_interaction(request)
+
+                # Check if the message is not a document before managing the run
+                if successful_interaction and not update.message.document:
+                    if await self.wait_for_more_messages(request):
+                        # The run of the last message of the burst answers this one too
+                        await request.thread_run_manager.add_messages(request.new_messages)
+                        print(f'Message coalesced with the next message, chat_id: {request.chat_id}')
+                        Metrics.increment(f'{self.config.name}.messages.coalesced')
+                        return
+
+                    if self.config.latest_message_wins:
+                        await self.manage_run_until_superseded(request)
+                    else:
+                        await request.thread_run_manager.manage_run(request.new_messages)
+            except DeadlineExceeded as e:
+                await self.handle_deadline_exceeded(request, e)
+            except asyncio.CancelledError:
+                # Cancelled on shutdown, charge for what was already processed
+                print(f'Interaction interrupted by shutdown, chat_id: {request.chat_id}')
+                await self.update_balance_and_cleanup(request)
+                raise
+
+            await self.update_balance_and_cleanup(request)
 
     # Interaction Handling Methods
 
@@ -290,31 +349,35 @@ class BaseBot:
     #     except Exception as e:
     #         await self.handle_general_exception(session, e)
 
-    async def handle_interaction(self, session: SessionLocal) -> bool:
+    async def handle_interaction(self, request: RequestContext) -> bool:
         """
         Handles user interaction with the bot.
 
-        :param session: Database session for transactions.
+        :param request: Context of the update being processed.
         """
         max_retries = 2
         for attempt in range(max_retries):
             try:
-                self.conversation = self._get_or_create_conversation(session)
-                change_language(self.conversation.language_code)
+                request.conversation = await self._get_or_create_conversation(request.session, request.update)
+                change_language(request.conversation.language_code)
 
-                if self.is_balance_insufficient():
-                    await self.prompt_for_payment()
+                if self.is_balance_insufficient(request):
+                    await self.prompt_for_payment(request)
                     return False
 
-                return await self.process_message(session)
+                return await self.process_message(request)
 
             except BadRequest as e:
-                await self.handle_bad_request(e)
+                await self.handle_bad_request(request, e)
                 return False  # Do not retry for BadRequest exceptions
 
+            except DeadlineExceeded as e:
+                await self.handle_deadline_exceeded(request, e)
+                return False  # No time left for a retry
+
             except Exception as e:
                 try:
-                    await self.handle_general_exception(session, e)
+                    await self.handle_general_exception(request, e)
                 except Exception:
                     return False  # Do not retry if the exception is re-raised
                 # If handle_general_exception doesn't raise an exception, continue for a retry
@@ -322,119 +385,158 @@ class BaseBot:
 
         return False  # Return False if all retries failed
 
-    async def process_message(self, session: SessionLocal) -> bool:
+    async def process_message(self, request: RequestContext) -> bool:
         """
         Processes the received message based on its type (text, photo, video, etc.)
 
-        :param session: Database session for handling transactions.
+        :param request: Context of the update being processed.
         """
-        self.thread_run_manager = ThreadRunManager(self.openai, self.update, self.context, self.conversation, session, self.update.message.chat_id)
-        if datetime.utcnow() - self.conversation.updated_at >= self.thread_run_manager.thread_recreation_interval:
-            self.thread_run_manager.recreate_thread(session, self.conversation)
+        request.thread_run_manager = ThreadRunManager(self.openai, request.update, request.context, request.conversation, request.session, request.chat_id, self.thread_pool, self.run_store, request.deadline)
+        if (not request.conversation.thread_id
+                or datetime.utcnow() - request.conversation.updated_at >= request.thread_run_manager.thread_recreation_interval):
+            await request.thread_run_manager.recreate_thread(request.session, request.conversation)
 
-        for message_type in self.get_message_handler_types():
-            if getattr(self.update.message, message_type):
-                success = await self.handle_message_type(message_type)
-                if not success:
-                    await self.context.bot.send_message(self.update.message.chat_id, _(f'Failed to process the {message_type}.'))
-                    return False
-                return True
-        return False
+        message_type = HandlerRegistry.get_message_type(request.message)
+        if not message_type:
+            return False
 
-    async def handle_message_type(self, message_type: str) -> bool:
-        """
-        Handles a specific message type by dynamically importing the corresponding handler.
+        success = await self.handle_message_type(request, message_type)
+        if not success:
+            await request.context.bot.send_message(request.chat_id, _(f'Failed to process the {message_type}.'))
+            return False
+        return True
+
+    async def handle_message_type(self, request: RequestContext, message_type: str) -> bool:
         """
-        module_name = f"lib.telegram.message_handlers.{message_type}_handler"
-        class_name = f"{message_type.capitalize()}Handler"
+        Handles a specific message type with the handler registered for it.
 
-        # Check if the module and class exist
-        if self.module_and_class_exist(module_name, class_name):
-            module = importlib.import_module(module_name)
-            handler_class = getattr(module, class_name)
-            handler = handler_class(self.openai, self.update, self.context, self.conversation)
+        :param request: Context of the update being processed.
+        :param message_type: The type of the message, e.g. 'text' or 'photo'.
+        """
+        handler_class = HandlerRegistry.get_message_handler(message_type)
+        if handler_class:
+            handler = handler_class(self.openai, request.update, request.context, request.conversation, request.deadline)
 
             # Differentiate between text and other message types
             if message_type == 'text':
                 # For text messages, pass the text content to handle_message
-                return handler.handle_message(self.update.message.text)
+                success = await handler.handle_message(request.message.text)
             elif hasattr(handler, 'handle_message'):
                 # For other message types, call handle_message without arguments
-                return await handler.handle_message()
+                success = await handler.handle_message()
             else:
                 print(f"No handle_message method found for {message_type} handler.")
                 return False
+            request.new_messages.extend(handler.new_messages)
+            return success
         else:
             print(f"Handler for {message_type} not found.")
             return False
 
-    def module_and_class_exist(self, module_name: str, class_name: str) -> bool:
-        """
-        Checks if a module and class exist in the project.
-        """
-        try:
-            module = importlib.import_module(module_name)
-            return hasattr(module, class_name)
-        except ModuleNotFoundError:
-            return False
-
     # Utility Methods
 
     def get_message_handler_types(self) -> List[str]:
         """
-        Dynamically lists all message handler types based on the files in the handlers directory.
+        Lists all message handler types registered at startup.
 
         :return: List of message handler types like 'text', 'photo', etc.
         """
-        # Get the directory of the current file (base_bot.py)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
+        return HandlerRegistry.get_message_types()
 
-        # Adjust the path to point to the correct message_handlers directory
-        handlers_dir = os.path.join(current_dir, '..', 'message_handlers')
+    async def wait_for_more_messages(self, request: RequestContext) -> bool:
+        """
+        Waits up to config.debounce_window seconds for the next message of the chat.
+
+        Messages sent in a burst are all added to the thread, and only the last one
+        starts a run and updates the balance.
+
+        :param request: Context of the update being processed.
+        :return: True if another message of the chat is waiting to be processed.
+        """
+        if not self.config.debounce_window:
+            return False
+        return await self.scheduler.wait_for_next_update(request.chat_id, self.config.debounce_window,
+                                                         self.RUN_MESSAGES.check_update)
 
-        # Glob for .py files in the message handlers directory
-        handler_files = glob.glob(os.path.join(handlers_dir, '*.py'))
+    async def manage_run_until_superseded(self, request: RequestContext) -> bool:
+        """
+        Runs the assistant like manage_run, but cancels the run as soon as the user sends
+        another message, which is then answered by a new run. Used by bots configured
+        with latest_message_wins.
+
+        :param request: Context of the update being processed.
+        :return: True if the run was cancelled because of a new message.
+        """
+        manager = request.thread_run_manager
+        run_task = asyncio.create_task(manager.manage_run(request.new_messages))
+        next_message = asyncio.create_task(self.scheduler.wait_for_next_update(
+            request.chat_id, ThreadRunManager.MAX_RUN_DURATION, self.RUN_MESSAGES.check_update))
+        try:
+            await asyncio.wait({run_task, next_message}, return_when=asyncio.FIRST_COMPLETED)
+            if not run_task.done() and not next_message.result():
+                await asyncio.wait({run_task})  # No new message, e.g. not processed by the scheduler
+        finally:
+            next_message.cancel()
+            superseded = not run_task.done()
+            if superseded:
+                # Cancelling the task cancels the run on OpenAI
+                run_task.cancel()
+                await asyncio.wait({run_task})
+
+        if not superseded:
+            run_task.result()
+            return False
 
-        # Extract the handler types from the file names
-        return [os.path.basename(f)[:-11] for f in handler_files if not f.endswith(('__init__.py', 'base_handler.py'))]
+        print(f'Run {manager.run_id} superseded by a new message, chat_id: {request.chat_id}')
+        Metrics.increment(f'{self.config.name}.runs.superseded')
+        await manager.interrupt_answer()
+        # The thread accepts the new message only once the cancelled run has ended
+        await manager.wait_for_run_end()
+        return True
 
-    def log_user_interaction(self) -> None:
+    def log_user_interaction(self, request: RequestContext) -> None:
         """
         Logs the user's interaction with the bot.
 
         This method logs the details of the message received from the user, 
         including the user's name, username, and the content of their message.
+
+        :param request: Context of the update being processed.
         """
-        user_message = self.update.message.text or "sent a photo, file, video or voice."
-        print(f'{self.update.message.from_user.first_name}({self.update.message.from_user.username}) said: {user_message}')
+        user_message = request.message.text or "sent a photo, file, video or voice."
+        print(f'{request.message.from_user.first_name}({request.message.from_user.username}) said: {user_message}')
 
-    def is_balance_insufficient(self) -> bool:
+    def is_balance_insufficient(self, request: RequestContext) -> bool:
         """
         Checks if the user's balance is insufficient for further interactions.
 
+        :param request: Context of the update being processed.
         :return: True if balance is insufficient, False otherwise.
         """
-        if self.conversation.balance <= 0:
+        if request.conversation.balance <= 0:
             print("Insufficient balance.")
             return True
         return False
 
-    async def prompt_for_payment(self) -> None:
+    async def prompt_for_payment(self, request: RequestContext) -> None:
         """
         Sends a message to the user prompting for payment due to insufficient balance.
 
         This method is called when the user's balance is not enough to continue
         using the bot's services.
+
+        :param request: Context of the update being processed.
         """
-        await self.context.bot.send_message(self.update.message.chat_id, _("Insufficient balance to use the service."))
-        await self.payment.send_invoice(self.update, self.context, False)
+        await request.context.bot.send_message(request.chat_id, _("Insufficient balance to use the service."))
+        await self.payment.send_invoice(request.update, request.context, False)
 
     # Exception Handling Methods
 
-    async def handle_bad_request(self, exception: BadRequest) -> None:
+    async def handle_bad_request(self, request: RequestContext, exception: BadRequest) -> None:
         """
         Handles BadRequest exceptions from the Telegram API.
 
+        :param request: Context of the update being processed.
         :param exception: The BadRequest exception.
         """
         error_message = str(exception)
@@ -442,38 +544,69 @@ class BaseBot:
             file_size_limit = ConstraintsChecker.MAX_FILE_SIZE
             file_type_message = _("file")
 
-            if self.update.message.video:
+            if request.message.video:
                 file_size_limit = ConstraintsChecker.MAX_VIDEO_FILE_SIZE
                 file_type_message = _("video file")
             
             file_size_limit_mb = file_size_limit / (1024 * 1024)  # Convert bytes to MB
-            await self.context.bot.send_message(self.update.message.chat_id, _("The {file_type} you are trying to send is too large. The maximum allowed size is {size_limit:.2f} MB.").format(file_type=file_type_message, size_limit=file_size_limit_mb))
+            await request.context.bot.send_message(request.chat_id, _("The {file_type} you are trying to send is too large. The maximum allowed size is {size_limit:.2f} MB.").format(file_type=file_type_message, size_limit=file_size_limit_mb))
         else:
             print(f"Unhandled BadRequest: {error_message}")
             raise
 
-    async def handle_general_exception(self, session: SessionLocal, exception: Exception) -> None:
+    async def handle_general_exception(self, request: RequestContext, exception: Exception) -> None:
         """
         Handles general exceptions that occur during interaction.
 
-        :param session: Database session for managing transactions.
+        :param request: Context of the update being processed.
         :param exception: The exception that occurred.
         """
         error_message = str(exception)
         print(f"Error: {exception}")
         
-        self.thread_run_manager = ThreadRunManager(self.openai, self.update, self.context, self.conversation, session, self.update.message.chat_id)
+        request.thread_run_manager = ThreadRunManager(self.openai, request.update, request.context, request.conversation, request.session, request.chat_id, self.thread_pool, self.run_store, request.deadline)
 
         if "Error code: 404" in error_message and "No thread found with id" in error_message:
-            self.thread_run_manager.create_thread(session, self.conversation)
+            await request.thread_run_manager.create_thread(request.session, request.conversation)
         elif "Failed to index file: Unsupported file" in error_message:
-            self.thread_run_manager.recreate_thread(session, self.conversation)
+            await request.thread_run_manager.recreate_thread(request.session, request.conversation)
         elif "Can't add messages to thread_" in error_message:
             thread_id, run_id = Helpers.get_thread_id_and_run_id_from_string(error_message)
-            self.thread_run_manager.cancel_run(thread_id, run_id)
+            await request.thread_run_manager.cancel_run(thread_id, run_id)
         else:
             raise exception
 
+    async def handle_deadline_exceeded(self, request: RequestContext, exception: DeadlineExceeded) -> None:
+        """
+        Tells the user that the message couldn't be answered in time.
+
+        :param request: Context of the update being processed.
+        :param exception: The DeadlineExceeded exception naming the stage that ran out of time.
+        """
+        print(f"Deadline exceeded, chat_id: {request.chat_id}: {exception}")
+        try:
+            await request.context.bot.send_message(request.chat_id, _("Sorry, answering took too long. Please try again."))
+        except Exception as e:
+            print(f"Failed to send the deadline exceeded reply: {e}")
+
+    async def reply_busy(self, update: Update, expensive: bool) -> None:
+        """
+        Tells the user that the message was not processed because the bot is overloaded.
+
+        :param update: The rejected Telegram update.
+        :param expensive: Whether the message was rejected for being expensive to process (video, document).
+        """
+        change_language(update.message.from_user.language_code)
+        if expensive:
+            text = _("The bot is busy right now and can't process files and videos. Please send them again in a few minutes or send a text message.")
+        else:
+            text = _("The bot is busy right now. Please try again in a minute.")
+
+        try:
+            await update.message.reply_text(text)
+        except Exception as e:
+            print(f"Failed to send the busy reply: {e}")
+
     def error_handler(self, update: Update, context: CallbackContext) -> None:
         """
         Handles any uncaught errors during update processing.
@@ -487,26 +620,173 @@ class BaseBot:
 
     # Post-Interaction Methods
 
-    async def update_balance_and_cleanup(self, session: SessionLocal) -> None:
+    async def update_balance_and_cleanup(self, request: RequestContext) -> None:
         """
         Updates the user's balance and cleans up any temporary files.
 
-        :param session: Database session for transactions.
+        :param request: Context of the update being processed.
+        """
+        conversation = request.conversation
+        if conversation:
+            if request.thread_run_manager:
+                # Billed from the usage of the run, if there was one
+                amount = await request.thread_run_manager.calculate_turn_amount()
+            elif not conversation.thread_id:
+                # Thread deleted by the ThreadSweeper and no run created, e.g. the balance is
+                # insufficient: there is nothing to bill or to clean up
+                return
+            else:
+                messages = (await self.openai.beta.threads.messages.list(
+                    thread_id=conversation.thread_id, limit=ThreadRunManager.THREAD_MESSAGES_LIMIT)).data
+                amount = await self.tokenizer.calculate_thread_total_amount(messages, conversation.assistant_id)
+
+            print(f'---->>> Conversation balance decreased by: ${amount} for the turn')
+            conversation.balance -= amount
+            conversation.updated_at = datetime.utcnow()
+            request.session.commit()
+            Helpers.cleanup_folder(f'tmp/{conversation.thread_id}')
+
+    # Run Methods
+
+    async def start_processing(self, owns_chat: Callable[[int], bool] = None) -> None:
         """
-        if self.conversation:
-            messages = self.openai.beta.threads.messages.list(thread_id=self.conversation.thread_id, limit=100)
-            amount = self.tokenizer.calculate_thread_total_amount(messages)
+        Resumes the interrupted runs, starts processing updates and fills the thread pool.
+        Every way of running the bot (BotHost, webhook, sharded workers) starts it this way.
 
-            print(f'---->>> Conversation balance decreased by: ${amount} for input text')
-            self.conversation.balance -= amount
-            self.conversation.updated_at = datetime.utcnow()
-            session.commit()
-            Helpers.cleanup_folder(f'tmp/{self.conversation.thread_id}')
+        Call it after the application is initialized.
 
-    # Run Method
+        :param owns_chat: Returns whether this process answers a chat, all chats if None.
+        """
+        await self.resume_active_runs(owns_chat)
+        await self.application.start()
+        self.thread_pool.start()
+
+    async def stop_processing(self) -> None:
+        """
+        Drains the in-flight updates and stops processing updates, the counterpart of start_processing.
+
+        Call it after the bot stopped receiving updates and before shutting the application down.
+        """
+        if self.application.running:
+            await self.drain()
+            await self.application.stop()
+
+    async def resume_active_runs(self, owns_chat: Callable[[int], bool] = None) -> int:
+        """
+        Answers the runs that were started but not answered before the bot stopped, e.g.
+        after a crash. Each run is resumed in the queue of its chat, so it is answered
+        before the chat's new messages are processed.
+
+        Call it after the application is initialized and before it starts processing updates.
+
+        :param owns_chat: Returns whether this process answers a chat, all chats if None.
+        :return: The number of resumed runs.
+        """
+        try:
+            active_runs = self.run_store.list()
+        except SQLAlchemyError as e:
+            print(f'Bot {self.config.name}: failed to list the active runs: {e}')
+            return 0
+        if owns_chat:
+            active_runs = [active_run for active_run in active_runs if owns_chat(active_run.chat_id)]
+        for active_run in active_runs:
+            task = asyncio.create_task(self.scheduler.run(active_run.chat_id, self._resume_run(active_run)))
+            self.resumed_runs.add(task)
+            task.add_done_callback(self.resumed_runs.discard)
+        if active_runs:
+            # Lets the tasks join the queues of their chats before any update is processed
+            await asyncio.sleep(0)
+            print(f'Bot {self.config.name}: resuming {len(active_runs)} active runs')
+        return len(active_runs)
+
+    async def _resume_run(self, active_run) -> None:
+        """
+        Sends the answer of a run interrupted by a restart and updates the balance.
+
+        :param active_run: The ActiveRun recorded when the run was created.
+        """
+        with self.session_scope() as session:
+            conversation = session.get(Conversation, active_run.conversation_id)
+            if not conversation or conversation.thread_id != active_run.thread_id:
+                # The thread was replaced since, nobody waits for this answer anymore
+                await self.run_store.remove(active_run.run_id)
+                return
+
+            change_language(conversation.language_code)
+            context = CallbackContext(self.application)
+            request = RequestContext(None, context, session)
+            request.conversation = conversation
+            request.thread_run_manager = ThreadRunManager(self.openai, None, context, conversation, session,
+                                                          active_run.chat_id, self.thread_pool, self.run_store)
+            try:
+                await request.thread_run_manager.resume_run(active_run.run_id)
+            except asyncio.CancelledError:
+                await self.update_balance_and_cleanup(request)
+                raise
+            except Exception as e:
+                print(f'Failed to resume run {active_run.run_id}: {e}')
+                return
+
+            print(f'Resumed run {active_run.run_id}, chat_id: {active_run.chat_id}')
+            await self.update_balance_and_cleanup(request)
+
+    async def drain(self, timeout: float = None) -> None:
+        """
+        Lets the in-flight updates finish, cancelling the ones still running after the timeout.
+        Cancelled updates cancel their assistant run and update the balance. Then the threads
+        kept ready by the thread pool and the replaced threads are deleted.
+
+        Call it after the bot stopped receiving updates and before stopping the application.
+
+        :param timeout: Seconds to wait, DRAIN_TIMEOUT by default.
+        """
+        await self.scheduler.drain(self.DRAIN_TIMEOUT if timeout is None else timeout)
+        await self.thread_pool.close()
 
     def run(self) -> None:
         """
         Starts the bot and begins polling for updates.
         """
-        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+        BotHost([self]).run()
+
+    def run_webhook(self, webhook_url: str, listen: str = '0.0.0.0', port: int = 8443, url_path: str = 'webhook',
+                    secret_token: str = None, max_connections: int = None) -> None:
+        """
+        Starts the bot and receives updates through a webhook instead of polling.
+
+        :param webhook_url: Public HTTPS URL Telegram sends the updates to.
+        :param listen: The address the embedded server binds to.
+        :param port: The port the embedded server listens on.
+        :param url_path: The URL path of the webhook on the embedded server.
+        :param secret_token: Token Telegram sends with every update, requests without it are rejected.
+        :param max_connections: Maximum number of simultaneous connections Telegram opens to the webhook.
+        """
+        asyncio.run(self._serve_webhook(webhook_url, listen, port, url_path, secret_token, max_connections))
+
+    async def _serve_webhook(self, webhook_url: str, listen: str, port: int, url_path: str,
+                             secret_token: str, max_connections: int) -> None:
+        """
+        Registers the webhook with Telegram and serves updates until SIGINT or SIGTERM is received.
+        """
+        server = WebhookServer(listen, port)
+        server.add_application(url_path, self.application, secret_token)
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, stop_event.set)
+
+        async with self.application:
+            await self.application.bot.set_webhook(
+                webhook_url,
+                max_connections=max_connections,
+                allowed_updates=Update.ALL_TYPES,
+                secret_token=secret_token
+            )
+            await self.start_processing()
+            await server.start()
+            try:
+                await stop_event.wait()
+            finally:
+                await server.stop()
+                await self.stop_processing()
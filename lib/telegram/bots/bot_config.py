@@ -0,0 +1,97 @@
+import os
+from dotenv import load_dotenv
+
+class BotConfig:
+    """
+    Configuration of a single bot: its Telegram token, OpenAI assistant and payment tokens.
+
+    Every bot gets its own config object, so several bots can run in the same process
+    without overwriting each other's settings. Configs are registered by assistant ID,
+    which lets code that only has a conversation find the bot it belongs to.
+    """
+
+    _configs = {}  # assistant id -> config
+
+    def __init__(self, name: str, telegram_bot_token: str, assistant_id: str,
+                 yookassa_api_token: str = None, stripe_api_token: str = None, streaming_runs: bool = False,
+                 latest_message_wins: bool = False, concurrent_updates: int = None, debounce_window: float = 0):
+        """
+        Initialize the bot configuration.
+
+        :param name: Short name of the bot, e.g. 'diet'.
+        :param telegram_bot_token: Token of the Telegram bot.
+        :param assistant_id: ID of the OpenAI assistant answering the bot's users.
+        :param yookassa_api_token: YooKassa provider token used for invoices.
+        :param stripe_api_token: Stripe provider token used for invoices.
+        :param streaming_runs: Whether answers are streamed to the user while the run is in progress.
+        :param latest_message_wins: Whether a new message of the user cancels the run answering the
+                                    previous one, instead of waiting for it.
+        :param concurrent_updates: Number of chats processed at the same time, BaseBot.CONCURRENT_UPDATES if None.
+        :param debounce_window: Seconds to wait for more messages of a chat before starting a run, so that
+                                messages sent in a burst get one answer. 0 starts the run right away.
+        """
+        self.name = name
+        self.telegram_bot_token = telegram_bot_token
+        self.assistant_id = assistant_id
+        self.yookassa_api_token = yookassa_api_token
+        self.stripe_api_token = stripe_api_token
+        self.streaming_runs = streaming_runs
+        self.latest_message_wins = latest_message_wins
+        self.concurrent_updates = concurrent_updates
+        self.debounce_window = debounce_window
+
+    @classmethod
+    def from_env(cls, prefix: str = None) -> 'BotConfig':
+        """
+        Creates a configuration from environment variables like DIET_TELEGRAM_BOT_TOKEN.
+
+        :param prefix: Prefix of the environment variables, e.g. 'DIET'. Without a prefix
+                       the variables TELEGRAM_BOT_TOKEN, ASSISTANT_ID, etc. are used.
+        """
+        load_dotenv()
+
+        def getenv(name):
+            return os.getenv(f'{prefix}_{name}' if prefix else name)
+
+        def getflag(name):
+            return (getenv(name) or '').lower() in ('1', 'true', 'yes')
+
+        def getint(name):
+            value = getenv(name) or ''
+            return int(value) if value.isdigit() else None
+
+        def getfloat(name, default):
+            try:
+                return float(getenv(name))
+            except (TypeError, ValueError):
+                return default
+
+        return cls(
+            name=prefix.lower() if prefix else 'bot',
+            telegram_bot_token=getenv('TELEGRAM_BOT_TOKEN'),
+            assistant_id=getenv('ASSISTANT_ID'),
+            yookassa_api_token=getenv('YOOKASSA_API_TOKEN'),
+            stripe_api_token=getenv('STRIPE_API_TOKEN'),
+            streaming_runs=getflag('STREAMING_RUNS'),
+            latest_message_wins=getflag('LATEST_MESSAGE_WINS'),
+            concurrent_updates=getint('CONCURRENT_UPDATES'),
+            debounce_window=getfloat('DEBOUNCE_WINDOW', 0)
+        )
+
+    @classmethod
+    def register(cls, config: 'BotConfig') -> None:
+        """
+        Makes the configuration available by its assistant ID.
+
+        :param config: The bot configuration.
+        """
+        cls._configs[config.assistant_id] = config
+
+    @classmethod
+    def for_assistant(cls, assistant_id: str) -> 'BotConfig':
+        """
+        Returns the configuration of the bot using the given assistant, or None if there is none.
+
+        :param assistant_id: ID of the OpenAI assistant, e.g. conversation.assistant_id.
+        """
+        return cls._configs.get(assistant_id)
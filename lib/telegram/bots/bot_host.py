@@ -0,0 +1,135 @@
+import asyncio
+import json
+import signal
+from typing import List, TYPE_CHECKING
+
+from telegram import Update
+
+from lib.metrics import Metrics
+from lib.openai.thread_sweeper import ThreadSweeper
+
+if TYPE_CHECKING:
+    from lib.telegram.bots.base_bot import BaseBot
+
+class BotHost:
+    """
+    Runs several bots in one process and one event loop.
+
+    The bots share everything that is process-wide: the OpenAI client and its connection
+    pool, the database engine and the tokenizer encodings. Each bot keeps its own
+    configuration, Telegram application and update polling.
+
+    The host also periodically deletes the OpenAI threads of idle conversations with a
+    ThreadSweeper per bot.
+    """
+
+    METRICS_REPORT_INTERVAL = 300  # Seconds between metrics reports in the log, None to disable
+    THREAD_SWEEP_DELAY = 60  # Seconds after the start before the first thread sweep
+    THREAD_SWEEP_INTERVAL = 3600  # Seconds between thread sweeps, None to disable
+
+    def __init__(self, bots: List['BaseBot'] = None):
+        """
+        Initialize the host.
+
+        :param bots: The bots to run.
+        """
+        self.bots = list(bots or [])
+        self.stop_event = None
+
+    def add_bot(self, bot: 'BaseBot') -> None:
+        """
+        Adds a bot to the host. Bots must be added before the host is started.
+
+        :param bot: The bot to run.
+        """
+        self.bots.append(bot)
+
+    def run(self) -> None:
+        """
+        Starts all bots and polls for updates until SIGINT or SIGTERM is received.
+        """
+        asyncio.run(self.serve())
+
+    def stop(self) -> None:
+        """
+        Asks a running host to stop all bots.
+        """
+        if self.stop_event:
+            self.stop_event.set()
+
+    async def serve(self) -> None:
+        """
+        Starts all bots in the running event loop and serves them until the host is stopped.
+        """
+        self.stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, self.stop)
+
+        started = []
+        report_task = None
+        sweep_task = None
+        try:
+            for bot in self.bots:
+                started.append(bot)
+                await self._start_bot(bot)
+                print(f'Bot {bot.config.name} started')
+
+            if self.METRICS_REPORT_INTERVAL:
+                report_task = asyncio.create_task(self._report_metrics())
+            if self.THREAD_SWEEP_INTERVAL:
+                sweep_task = asyncio.create_task(self._sweep_threads())
+            await self.stop_event.wait()
+        finally:
+            if report_task:
+                report_task.cancel()
+            if sweep_task:
+                sweep_task.cancel()
+            # Bots drain at the same time, so the shutdown takes at most one drain timeout
+            await asyncio.gather(*(self._stop_bot(bot) for bot in started))
+            for stop_signal in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(stop_signal)
+
+    async def _report_metrics(self) -> None:
+        """
+        Periodically prints the process metrics, e.g. the scheduler queue depth and wait time.
+        """
+        while True:
+            await asyncio.sleep(self.METRICS_REPORT_INTERVAL)
+            print(f'Metrics: {json.dumps(Metrics.snapshot())}')
+
+    async def _sweep_threads(self) -> None:
+        """
+        Periodically deletes the threads of the bots' idle conversations.
+        """
+        await asyncio.sleep(self.THREAD_SWEEP_DELAY)
+        while True:
+            for bot in self.bots:
+                try:
+                    await ThreadSweeper(bot.openai, bot.config.assistant_id, bot.config.name).sweep()
+                except Exception as e:
+                    print(f'Thread sweep of bot {bot.config.name} failed: {e}')
+            await asyncio.sleep(self.THREAD_SWEEP_INTERVAL)
+
+    async def _start_bot(self, bot: 'BaseBot') -> None:
+        """
+        Initializes a bot application, resumes its interrupted runs and starts polling for its updates.
+
+        :param bot: The bot to start.
+        """
+        await bot.application.initialize()
+        await bot.application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        # Resumes the interrupted runs before the first update, so they are answered first
+        await bot.start_processing()
+
+    async def _stop_bot(self, bot: 'BaseBot') -> None:
+        """
+        Stops polling, drains the in-flight updates and shuts the bot application down.
+
+        :param bot: The bot to stop.
+        """
+        if bot.application.updater.running:
+            await bot.application.updater.stop()
+        await bot.stop_processing()
+        await bot.application.shutdown()
+        print(f'Bot {bot.config.name} stopped')
@@ -1,12 +1,9 @@
-import os
-from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext
 from lib.openai.tokenizer import Tokenizer
 from lib.localization import _, change_language
 from lib.telegram.bots.base_bot import BaseBot
-from lib.telegram.payment import Payment
-from lib.openai.assistant import Assistant
+from lib.telegram.bots.bot_config import BotConfig
 
 class DietBot(BaseBot):
     """
@@ -16,15 +13,13 @@ class DietBot(BaseBot):
 
     BOT_YOUTUBE_DEMO = 'https://youtu.be/evYtsJ5fzrs'
 
-    def __init__(self):
-        load_dotenv()
-        # Initialize the bot with the token from the environment variable
-        self.TELEGRAM_BOT_TOKEN = os.getenv('DIET_TELEGRAM_BOT_TOKEN')
-        Assistant.ASSISTANT_ID = os.getenv('DIET_ASSISTANT_ID')
-        Payment.YOOKASSA_API_TOKEN = os.getenv('DIET_YOOKASSA_API_TOKEN')
-        Payment.STRIPE_API_TOKEN = os.getenv('DIET_STRIPE_API_TOKEN')
+    def __init__(self, config: BotConfig = None):
+        """
+        Initializes the bot.
 
-        super().__init__()
+        :param config: Configuration of the bot, read from the DIET_* environment variables if not provided.
+        """
+        super().__init__(config or BotConfig.from_env('DIET'))
 
     async def start(self, update: Update, context: CallbackContext) -> None:
         """
@@ -33,13 +28,11 @@ class DietBot(BaseBot):
         :param update: Telegram update object.
         :param context: Telegram context object.
         """
-        self.update = update
-        self.context = context
         with self.session_scope() as session:
-            self.conversation = self._get_or_create_conversation(session)
-            change_language(self.conversation.language_code)
+            conversation = await self._get_or_create_conversation(session, update)
+            change_language(conversation.language_code)
 
-            current_balance = self.conversation.balance
+            current_balance = conversation.balance
             start_balance = Tokenizer.START_BALANCE
 
             initial_welcome_message = _(
@@ -0,0 +1,262 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from lib.deadline import Deadline
+from lib.metrics import Metrics
+
+# Deadline of the update processed by the current task, set when the update arrives
+_update_deadline = ContextVar('update_deadline', default=None)
+
+class ChatLane:
+    """
+    Queue of the updates of one chat. Only one of them is processed at a time.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.updates = []  # Updates queued or being processed, the first one is processed
+        self.new_update = asyncio.Event()  # Set when another update of the chat arrives
+
+    @property
+    def pending(self) -> int:
+        return len(self.updates)
+
+class ChatScheduler(BaseUpdateProcessor):
+    """
+    Update processor that runs the updates of a chat one after another and different
+    chats in parallel, up to a global number of active chats.
+
+    An OpenAI thread accepts only one active run, so a second message arriving while the
+    first one is still being answered has to wait for it instead of failing with
+    "Can't add messages to thread_". Updates without a chat (e.g. pre-checkout queries)
+    are only limited by the global cap.
+
+    Admission control: once max_queued_updates updates are waiting, new sheddable updates
+    are rejected instead of queued. Expensive updates (e.g. videos and documents) are
+    rejected earlier, when the queue is EXPENSIVE_QUEUE_SHARE full, to keep room for text.
+
+    Every admitted update gets its Deadline when it arrives, before it waits for its lane,
+    so the time spent queued counts against the update's budget, see current_deadline.
+
+    Metrics, prefixed with the scheduler name:
+    <name>.scheduler.queued (gauge): updates waiting for their lane or a free slot.
+    <name>.scheduler.active (gauge): updates being processed.
+    <name>.scheduler.lanes (gauge): chats with queued or running updates.
+    <name>.scheduler.max_lane_depth (gauge): longest per-chat queue seen.
+    <name>.scheduler.wait_time (histogram): seconds between receiving and starting an update.
+    <name>.scheduler.processed (counter): processed updates.
+    <name>.scheduler.rejected (counter): updates rejected because the queue was full.
+    <name>.scheduler.rejected_expensive (counter): expensive updates among the rejected ones.
+    <name>.scheduler.drain_cancelled (counter): updates cancelled because a drain timed out.
+    """
+
+    CANCEL_TIMEOUT = 10  # Seconds cancelled updates get to clean up, e.g. cancel their run and update the balance
+
+    MAX_PENDING_UPDATES = 1024  # Updates accepted from Telegram that are waiting or running
+    EXPENSIVE_QUEUE_SHARE = 0.5  # Share of the queue expensive updates may fill
+
+    def __init__(self, max_active_chats: int = 32, name: str = 'bot', max_pending_updates: int = MAX_PENDING_UPDATES,
+                 max_queued_updates: int = None, is_sheddable: Callable[[object], bool] = None,
+                 is_expensive: Callable[[object], bool] = None,
+                 rejection_handler: Callable[[object, bool], Awaitable[None]] = None):
+        """
+        Initialize the scheduler.
+
+        :param max_active_chats: Maximum number of updates processed at the same time.
+        :param name: Prefix of the scheduler metrics, usually the bot name.
+        :param max_pending_updates: Maximum number of updates waiting or being processed.
+        :param max_queued_updates: Number of waiting updates above which sheddable updates are rejected,
+                                   None to queue all updates.
+        :param is_sheddable: Returns True for updates that may be rejected, all updates by default.
+        :param is_expensive: Returns True for updates that are rejected first.
+        :param rejection_handler: Awaited with the rejected update and whether it was expensive,
+                                  e.g. to tell the user to retry later.
+        """
+        super().__init__(max_pending_updates)
+        self.max_active_chats = max_active_chats
+        self.name = name
+        self.max_queued_updates = max_queued_updates
+        self.is_sheddable = is_sheddable
+        self.is_expensive = is_expensive
+        self.rejection_handler = rejection_handler
+        self.lanes = {}  # chat id -> ChatLane
+        self.tasks = set()  # Tasks of the queued and running updates
+        self.queued = 0
+        self.active = 0
+        self._slots = asyncio.Semaphore(max_active_chats)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """
+        Processes an update in the lane of its chat.
+
+        :param update: The update to be processed.
+        :param coroutine: The coroutine processing the update.
+        """
+        expensive = bool(self.is_expensive and self.is_expensive(update))
+        if not self.admit(update, expensive):
+            coroutine.close()
+            print(f'Scheduler {self.name} is overloaded, rejected an update ({self.queued} queued)')
+            Metrics.increment(self._metric('rejected'))
+            if expensive:
+                Metrics.increment(self._metric('rejected_expensive'))
+            if self.rejection_handler:
+                await self.rejection_handler(update, expensive)
+            return
+
+        chat_id = None
+        if isinstance(update, Update) and update.effective_chat:
+            chat_id = update.effective_chat.id
+        token = _update_deadline.set(Deadline(name=self.name))
+        try:
+            await self.run(chat_id, coroutine, update)
+        finally:
+            _update_deadline.reset(token)
+
+    def current_deadline(self) -> Deadline:
+        """
+        Returns the deadline of the update processed by the current task, started when the
+        scheduler received it, or a new deadline if the update didn't go through the scheduler.
+        """
+        return _update_deadline.get() or Deadline(name=self.name)
+
+    def admit(self, update: object, expensive: bool = False) -> bool:
+        """
+        Checks whether there is room in the queue for an update.
+
+        :param update: The received update.
+        :param expensive: Whether the update is expensive to process.
+        :return: True if the update should be queued, False if it should be rejected.
+        """
+        if self.max_queued_updates is None:
+            return True
+        if self.is_sheddable and not self.is_sheddable(update):
+            return True
+
+        limit = self.max_queued_updates
+        if expensive:
+            limit = int(limit * self.EXPENSIVE_QUEUE_SHARE)
+        return self.queued < limit
+
+    async def run(self, chat_id, coroutine: Awaitable[Any], update: object = None) -> Any:
+        """
+        Waits for the chat's previous updates and a free slot, then awaits the coroutine.
+
+        :param chat_id: ID of the chat, or None if the work doesn't belong to a chat.
+        :param coroutine: The work to do.
+        :param update: The update processed by the coroutine.
+        :return: The result of the coroutine.
+        """
+        lane = ChatLane() if chat_id is None else self.lanes.setdefault(chat_id, ChatLane())
+        entry = [update]  # Wrapped, so that the entry is removed by identity
+        lane.updates.append(entry)
+        lane.new_update.set()
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        self._set_queued(self.queued + 1)
+        self._update_lane_metrics(lane)
+        queued_at = time.perf_counter()
+        started = False
+
+        try:
+            async with lane.lock:
+                async with self._slots:
+                    started = True
+                    self._set_queued(self.queued - 1)
+                    self._set_active(self.active + 1)
+                    Metrics.observe(self._metric('wait_time'), time.perf_counter() - queued_at)
+                    try:
+                        return await coroutine
+                    finally:
+                        self._set_active(self.active - 1)
+                        Metrics.increment(self._metric('processed'))
+        finally:
+            if not started:
+                self._set_queued(self.queued - 1)
+                if asyncio.iscoroutine(coroutine):
+                    coroutine.close()
+            self.tasks.discard(task)
+            lane.updates = [other for other in lane.updates if other is not entry]
+            if lane.pending == 0 and self.lanes.get(chat_id) is lane:
+                del self.lanes[chat_id]
+            Metrics.set_gauge(self._metric('lanes'), len(self.lanes))
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Waits for the queued and running updates to finish. Updates still unfinished after
+        the timeout are cancelled and get CANCEL_TIMEOUT seconds to clean up.
+
+        :param timeout: Maximum number of seconds to wait for the updates.
+        :return: The number of cancelled updates.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Updates may still be queued while waiting, e.g. the updates left in the application queue
+        while self.tasks and loop.time() < deadline:
+            await asyncio.wait(set(self.tasks), timeout=deadline - loop.time())
+
+        pending = set(self.tasks)
+        if not pending:
+            return 0
+
+        print(f'Scheduler {self.name}: cancelling {len(pending)} updates still running after {timeout} seconds')
+        Metrics.increment(self._metric('drain_cancelled'), len(pending))
+        for task in pending:
+            task.cancel()
+        await asyncio.wait(pending, timeout=self.CANCEL_TIMEOUT)
+        return len(pending)
+
+    async def wait_for_next_update(self, chat_id, timeout: float, predicate: Callable[[object], bool] = None) -> bool:
+        """
+        Waits until another update of the chat is queued behind the one being processed.
+
+        :param chat_id: ID of the chat.
+        :param timeout: Maximum number of seconds to wait.
+        :param predicate: Only updates it returns True for are taken into account.
+        :return: True if a matching update of the chat is waiting, False if none arrived in time.
+        """
+        lane = self.lanes.get(chat_id)
+        if lane is None:
+            return False  # Not processed by the scheduler, there is no queue to wait on
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self._has_next_update(lane, predicate):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            lane.new_update.clear()
+            try:
+                await asyncio.wait_for(lane.new_update.wait(), remaining)
+            except asyncio.TimeoutError:
+                return self._has_next_update(lane, predicate)
+        return True
+
+    def _has_next_update(self, lane: ChatLane, predicate: Callable[[object], bool]) -> bool:
+        return any(predicate is None or predicate(update) for update, in lane.updates[1:])
+
+    def _metric(self, name: str) -> str:
+        return f'{self.name}.scheduler.{name}'
+
+    def _set_queued(self, queued: int) -> None:
+        self.queued = queued
+        Metrics.set_gauge(self._metric('queued'), queued)
+
+    def _set_active(self, active: int) -> None:
+        self.active = active
+        Metrics.set_gauge(self._metric('active'), active)
+
+    def _update_lane_metrics(self, lane: ChatLane) -> None:
+        Metrics.set_gauge(self._metric('lanes'), len(self.lanes))
+        if lane.pending > Metrics.get_gauge(self._metric('max_lane_depth')):
+            Metrics.set_gauge(self._metric('max_lane_depth'), lane.pending)
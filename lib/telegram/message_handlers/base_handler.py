@@ -2,9 +2,12 @@ from lib.openai.tokenizer import Tokenizer
 from lib.telegram.payment import Payment
 from lib.telegram.transcriptor import Transcriptor
 from lib.openai.assistant import Assistant
+from lib.telegram.bots.bot_config import BotConfig
 from lib.telegram.answer import Answer
 from lib.constraints_checker import ConstraintsChecker
+from lib.deadline import Deadline, DeadlineExceeded
 from decimal import Decimal
+import asyncio
 import os
 import requests
 from io import BytesIO
@@ -14,17 +17,19 @@ class BaseHandler:
 
     MESSAGE_TYPE = 'photo'
 
-    def __init__(self, openai_client, update, context, conversation):
+    def __init__(self, openai_client, update, context, conversation, deadline: Deadline = None):
         self.openai = openai_client
+        self.deadline = deadline or Deadline()  # Budgets of the download, transcription and send stages
         self.update = update
         self.context = context
         self.conversation = conversation
         self.thread_id = conversation.thread_id
-        self.tokenizer = Tokenizer()
-        self.payment = Payment()
+        self.tokenizer = Tokenizer.get_shared()
+        self.payment = Payment(BotConfig.for_assistant(conversation.assistant_id))
         self.transcriptor = Transcriptor(self.openai)
-        self.assistant = Assistant()
-        self.answer = Answer(openai_client, context, update.message.chat_id, self.thread_id)
+        self.assistant = Assistant(self.openai, conversation.assistant_id)
+        self.answer = Answer(openai_client, context, update.message.chat_id, self.thread_id, self.deadline)
+        self.new_messages = []  # Messages for the OpenAI thread, sent with the run that answers them
 
     async def _send_chat_message(self, content):
         """
@@ -34,21 +39,20 @@ class BaseHandler:
         """
         await self.answer.answer_with_text(content)
         
-    def _create_openai_thread_message(self, content, file_ids=None):
+    def _add_thread_message(self, content, file_ids=None):
         """
-        Create a message in the OpenAI thread.
+        Add a user message for the OpenAI thread. The bot sends it together with the run
+        creation, see ThreadRunManager.create_run.
 
         :param content: The content of the message to be created in the thread.
         :param file_ids: List of file IDs to be attached to the message (optional).
         """
-        return self.openai.beta.threads.messages.create(
-            thread_id=self.thread_id,
-            role="user",
-            content=content,
-            file_ids=file_ids if file_ids else []
-        )
-
-    def _create_openai_non_thread_message(self, content):
+        message = {"role": "user", "content": content}
+        if file_ids:
+            message["file_ids"] = file_ids
+        self.new_messages.append(message)
+
+    async def _create_openai_non_thread_message(self, content):
         """
         Generate a non-thread response using the OpenAI API.
 
@@ -57,7 +61,7 @@ class BaseHandler:
         """
         try:
             # Get the prompt from the Assistant class
-            assistant_prompt = self.assistant.prompt() or ""
+            assistant_prompt = await self.assistant.prompt() or ""
 
             # Prepare the messages for the AI
             messages = [
@@ -66,7 +70,7 @@ class BaseHandler:
             ]
 
             # Send the request to OpenAI
-            response = self.openai.chat.completions.create(
+            response = await self.openai.chat.completions.create(
                 model=self.tokenizer.model,
                 messages=messages,
                 temperature=1.0,
@@ -79,6 +83,14 @@ class BaseHandler:
             print(f"Failed to generate non-thread message: {e}")
             return _("Error: Unable to process the request."), 0
 
+    async def _get_file(self, file_id: str):
+        """
+        Get the Telegram file information, needed to download the file.
+
+        :param file_id: The ID of the file in Telegram.
+        """
+        return await self.deadline.run('download', self.context.bot.get_file(file_id))
+
     async def _check_constraints(self, file_info, *args) -> bool:
         """
         Check if the content meets the defined constraints based on its type.
@@ -120,19 +132,18 @@ class BaseHandler:
         file_extension = Path(file_path).suffix
         local_file_path = tmp_dir_path / f'{self.MESSAGE_TYPE}{file_extension}'
 
-        response = requests.get(file_path)
+        response = await self._get_url(file_path)
         if response.status_code == 200:
-            with open(str(local_file_path), 'wb') as f:
-                f.write(response.content)
+            await asyncio.to_thread(local_file_path.write_bytes, response.content)
             return str(local_file_path)
         else:
             print(_(f'Failed to download the {self.MESSAGE_TYPE}'))
             return ""
 
-    def _download_file_to_stream(self, file_url: str) -> BytesIO:
+    async def _download_file_to_stream(self, file_url: str) -> BytesIO:
         """Download the file and return a BytesIO object."""
         try:
-            response = requests.get(file_url)
+            response = await self._get_url(file_url)
             if response.status_code == 200:
                 # Read content into BytesIO
                 file_stream = BytesIO(response.content)
@@ -141,10 +152,25 @@ class BaseHandler:
             else:
                 print(f"Failed to download {self.MESSAGE_TYPE}: HTTP Status {response.status_code}")
                 return BytesIO()  # Return an empty BytesIO object
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Exception occurred during file download: {e}")
             return BytesIO()  # Return an empty BytesIO object
 
+    async def _get_url(self, url: str) -> requests.Response:
+        """
+        Downloads a URL in a worker thread, so other chats go on meanwhile, within the budget
+        of the download stage. The requests timeout also ends the thread of a stalled download.
+
+        :raises DeadlineExceeded: If the download didn't finish within its budget.
+        """
+        budget = self.deadline.budget('download')
+        try:
+            return await self.deadline.run('download', asyncio.to_thread(requests.get, url, timeout=budget))
+        except requests.Timeout:
+            self.deadline.exceeded('download', budget)
+
     def _log_user_interaction(self, file):
         user_info = f'{self.update.message.from_user.first_name}({self.update.message.from_user.username})'
         file_info = f'"{file.file_path}" size: {file.file_size} bytes'
@@ -176,9 +202,9 @@ class BaseHandler:
         print(f'---->>> Conversation balance decreased by: ${amount} for {self.MESSAGE_TYPE} processing.')
         self.conversation.balance -= amount
 
-    def handle_message(self, *args) -> bool:
+    async def handle_message(self, *args) -> bool:
         try:
-            return self.process_message(*args)
+            return await self.process_message(*args)
         except Exception as e:
             print(f"Error in handle_message: {e}")
             raise
@@ -15,7 +15,7 @@ class DocumentHandler(BaseHandler):
             start_index = i * Transcriptor.MAX_MESSAGE_LENGTH
             end_index = start_index + Transcriptor.MAX_MESSAGE_LENGTH
             text_piece = text[start_index:end_index]
-            translated_text, total_tokens = self._create_openai_non_thread_message(f'{caption}: {text_piece}')
+            translated_text, total_tokens = await self._create_openai_non_thread_message(f'{caption}: {text_piece}')
             translated_text += translated_text + "\n\n"
             total_tokens += total_tokens
 
@@ -27,7 +27,7 @@ class DocumentHandler(BaseHandler):
         if not document:
             return False, _("No document provided.")
 
-        file_info = await self.context.bot.get_file(document.file_id)
+        file_info = await self._get_file(document.file_id)
         self._log_user_interaction(file_info)
 
         if not await self._check_constraints(file_info):
@@ -43,8 +43,10 @@ class DocumentHandler(BaseHandler):
         if not local_file_path:
             return False, _("Failed to download the document.")
         extracted_text = TextExtractor.extract_text(str(local_file_path)) 
-        caption_amount = self.tokenizer.tokens_to_money_from_string(caption)
-        amount = caption_amount + self.tokenizer.tokens_to_money_from_string(extracted_text)
+        # Counted outside the event loop, a large document takes a while to tokenize
+        caption_tokens, text_tokens = await self.tokenizer.count_tokens([caption, extracted_text])
+        caption_amount = self.tokenizer.tokens_to_money(caption_tokens)
+        amount = caption_amount + self.tokenizer.tokens_to_money(text_tokens)
         if not await self._check_sufficient_balance(amount):
             return False
 
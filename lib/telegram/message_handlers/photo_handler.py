@@ -18,7 +18,7 @@ class PhotoHandler(BaseHandler):
         if not photo:
             return False, _("No image provided.")
 
-        file_info = await self.context.bot.get_file(photo.file_id)
+        file_info = await self._get_file(photo.file_id)
         self._log_user_interaction(file_info)
 
         if not await self._check_constraints(file_info, photo):
@@ -43,10 +43,10 @@ class PhotoHandler(BaseHandler):
         process_method = getattr(self.transcriptor, f'transcript_{self.MESSAGE_TYPE}')
 
         # Call the method with unpacked arguments
-        transcripted_text, total_tokens = await process_method(*args)
+        transcripted_text, total_tokens = await self.deadline.run('transcription', process_method(*args))
 
         # Update balance and create a thread message
         self._update_balance(total_tokens)
-        self._create_openai_thread_message(transcripted_text)
+        self._add_thread_message(transcripted_text)
 
         return True
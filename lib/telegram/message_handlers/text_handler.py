@@ -2,20 +2,20 @@ from lib.telegram.message_handlers.base_handler import BaseHandler
 
 class TextHandler(BaseHandler):
 
-    def process_message(self, message: str) -> bool:
+    async def process_message(self, message: str) -> bool:
         """
-        Sends the text message to the OpenAI thread for processing.
+        Adds the text message for the OpenAI thread, it is sent with the run that answers it.
         """
-        self.openai.beta.threads.messages.create(thread_id=self.thread_id, role="user", content=message)
+        self._add_thread_message(message)
         return True
 
-    def handle_message(self, message: str) -> bool:
+    async def handle_message(self, message: str) -> bool:
         if not message:
             print("No message provided.")
             return False
 
         try:
-            return self.process_message(message)
+            return await self.process_message(message)
         except Exception as e:
             print(f"Error in handle_text_message: {e}")
             raise
@@ -31,7 +31,7 @@ class VideoHandler(BaseHandler):
             print(_("No video message provided."))
             return False
 
-        file_info = await self.context.bot.get_file(video.file_id)
+        file_info = await self._get_file(video.file_id)
         self._log_user_interaction(file_info)
 
         if not await self._check_constraints(file_info):
@@ -55,10 +55,11 @@ class VideoHandler(BaseHandler):
         :param args: Arguments needed for processing the message, e.g., file, caption, duration.
         :return: Boolean indicating if the message was processed successfully.
         """
-        transcripted_text, total_tokens = await self.transcriptor.transcript_video(file_path, caption)
+        transcripted_text, total_tokens = await self.deadline.run(
+            'transcription', self.transcriptor.transcript_video(file_path, caption))
 
         # Update balance and create a thread message
         self._update_balance(total_tokens, amount)
-        self._create_openai_thread_message(_('Translate: ') + transcripted_text)
+        self._add_thread_message(_('Translate: ') + transcripted_text)
 
         return True
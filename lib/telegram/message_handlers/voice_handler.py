@@ -18,7 +18,7 @@ class VoiceHandler(BaseHandler):
             print(_("No voice message provided."))
             return False
 
-        file_info = await self.context.bot.get_file(voice.file_id)
+        file_info = await self._get_file(voice.file_id)
         self._log_user_interaction(file_info)
 
         if not await self._check_constraints(file_info):
@@ -42,10 +42,10 @@ class VoiceHandler(BaseHandler):
         :param args: Arguments needed for processing the message, e.g., file, caption, duration.
         :return: Boolean indicating if the message was processed successfully.
         """
-        transcripted_text = await self.transcriptor.transcript_voice(file_path)
+        transcripted_text = await self.deadline.run('transcription', self.transcriptor.transcript_voice(file_path))
 
         # Update balance and create a thread message
         self._update_balance(0, amount)
-        self._create_openai_thread_message(transcripted_text)
+        self._add_thread_message(transcripted_text)
 
         return True
@@ -2,7 +2,7 @@ from telegram import LabeledPrice, Update
 from telegram.ext import CallbackContext
 from db.engine import SessionLocal
 from db.models.conversation import Conversation
-from lib.openai.assistant import Assistant
+from lib.telegram.bots.bot_config import BotConfig
 from decimal import Decimal
 from lib.localization import _, change_language
 from lib.currency_converter import CurrencyConverter
@@ -12,7 +12,9 @@ class Payment:
     Handles payment processing through Telegram using YOOKASSA.
 
     Attributes:
-    YOOKASSA_API_TOKEN (str): Class-level attribute that stores the Stripe API token.
+    yookassa_api_token (str): The YooKassa provider token of the bot.
+    stripe_api_token (str): The Stripe provider token of the bot.
+    assistant_id (str): ID of the bot's assistant, used to find the conversation of a payment.
     PAYLOAD (str): Constant payload string used to validate payment callbacks.
 
     Methods:
@@ -21,16 +23,23 @@ class Payment:
     successful_payment_callback: Confirms and responds to a successful payment.
 
     Note:
-    Ensure that the YOOKASSA_API_TOKEN environment variable is set correctly for payment processing.
+    Ensure that the <BOT>_YOOKASSA_API_TOKEN environment variable is set correctly for payment processing.
     This class assumes that the python-telegram-bot framework is used for the bot implementation.
     """
 
-    YOOKASSA_API_TOKEN = None
-    STRIPE_API_TOKEN = None
     PAYLOAD = "Custom-Payload"
 
-    @staticmethod
-    async def send_invoice(update: Update, context: CallbackContext, from_button: False) -> None:
+    def __init__(self, config: BotConfig = None):
+        """
+        Initializes the payment processing of a bot.
+
+        :param config: Configuration of the bot receiving the payments.
+        """
+        self.yookassa_api_token = config.yookassa_api_token if config else None
+        self.stripe_api_token = config.stripe_api_token if config else None
+        self.assistant_id = config.assistant_id if config else None
+
+    async def send_invoice(self, update: Update, context: CallbackContext, from_button: False) -> None:
         if from_button:
             chat_id = update.callback_query.message.chat_id
         else:
@@ -42,7 +51,7 @@ class Payment:
         prices = [LabeledPrice(_("Top Up the Balance"), 100*100)]
 
         await context.bot.send_invoice(
-            chat_id, title, description, Payment.PAYLOAD, Payment.YOOKASSA_API_TOKEN, currency, prices
+            chat_id, title, description, Payment.PAYLOAD, self.yookassa_api_token, currency, prices
         )
 
     @staticmethod
@@ -53,8 +62,7 @@ class Payment:
         else:
             await query.answer(ok=True)
 
-    @staticmethod
-    async def successful_payment_callback(update: Update, context: CallbackContext) -> None:
+    async def successful_payment_callback(self, update: Update, context: CallbackContext) -> None:
         currency = update.message.successful_payment.currency
         payment_amount = Decimal(update.message.successful_payment.total_amount) / 100
         
@@ -64,7 +72,7 @@ class Payment:
         try:
             conversation = session.query(Conversation).filter_by(
                 user_id=update.message.from_user.id,
-                assistant_id=Assistant.ASSISTANT_ID
+                assistant_id=self.assistant_id
             ).first()
 
             if conversation:
@@ -0,0 +1,43 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+from lib.deadline import Deadline
+
+class RequestContext:
+    """
+    Holds the state of a single Telegram update while it travels through the bot.
+
+    One instance is created per incoming update, so several updates can be processed
+    concurrently by the same bot without overwriting each other's conversation,
+    database session or thread run manager.
+    """
+
+    def __init__(self, update: Update, context: CallbackContext, session=None, deadline: Deadline = None):
+        """
+        Initialize the request context.
+
+        :param update: Telegram update object being processed.
+        :param context: Telegram context object for the update.
+        :param session: Database session used while processing the update.
+        :param deadline: Time budget of the update, starting when it was received.
+        """
+        self.update = update
+        self.context = context
+        self.session = session
+        self.deadline = deadline or Deadline()
+        self.conversation = None
+        self.thread_run_manager = None
+        self.new_messages = []  # Messages for the OpenAI thread added by the message handler
+
+    @property
+    def message(self):
+        """
+        Returns the message of the update.
+        """
+        return self.update.message
+
+    @property
+    def chat_id(self) -> int:
+        """
+        Returns the ID of the chat the update came from.
+        """
+        return self.update.message.chat_id
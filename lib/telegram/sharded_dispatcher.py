@@ -0,0 +1,244 @@
+import asyncio
+import multiprocessing
+import queue
+import signal
+import zlib
+from typing import Type
+
+from telegram import Bot, Update
+from telegram.ext import Updater
+
+from lib.metrics import Metrics
+from lib.telegram.bots.bot_config import BotConfig
+
+class ShardedDispatcher:
+    """
+    Receives the updates of a bot once and spreads them over several worker processes.
+
+    Every update is routed by a hash of its user ID, so all updates of a user are
+    processed by the same worker, in the order they were received. Each worker runs its
+    own instance of the bot and processes its updates with the bot's usual concurrency
+    settings, so the bot is no longer limited to one CPU core.
+
+    Workers are separate processes started with the 'spawn' method, connected to the
+    dispatcher by multiprocessing queues. The bot class must accept a BotConfig as its
+    only constructor argument, and have start_processing and stop_processing coroutines
+    like BaseBot.
+
+    A worker that exited, e.g. after an error in the bot, is restarted with the same queue,
+    so the updates already sent to it are not lost. After MAX_WORKER_RESTARTS restarts of a
+    worker the dispatcher gives up and stops instead of sending updates nobody processes.
+    """
+
+    STOP_TIMEOUT = 30  # Seconds to wait for a worker to finish its queued updates
+    MAX_WORKER_RESTARTS = 3  # Restarts of a worker before the dispatcher gives up
+    WORKER_CHECK_INTERVAL = 5  # Seconds between the checks of the workers while serving
+
+    def __init__(self, bot_class: Type, config: BotConfig, workers: int = 4):
+        """
+        Initialize the dispatcher.
+
+        :param bot_class: The bot class instantiated in every worker, e.g. DietBot.
+        :param config: Configuration of the bot.
+        :param workers: Number of worker processes.
+        """
+        if workers < 1:
+            raise ValueError("The number of workers must be a positive integer.")
+
+        self.bot_class = bot_class
+        self.config = config
+        self.workers = workers
+        self.queues = []
+        self.processes = []
+        self.restarts = []  # Number of restarts of each worker
+        self.stop_event = None
+
+    def shard_for(self, update: Update) -> int:
+        """
+        Returns the index of the worker processing an update.
+
+        :param update: The Telegram update.
+        """
+        if update.effective_user:
+            key = update.effective_user.id
+        elif update.effective_chat:
+            key = update.effective_chat.id
+        else:
+            key = 0
+        return self.shard_for_key(key, self.workers)
+
+    @staticmethod
+    def shard_for_key(key: int, workers: int) -> int:
+        """
+        Returns the index of the worker owning a user or chat ID.
+
+        :param key: The user ID, or the chat ID of updates without a user.
+        :param workers: Number of worker processes.
+        """
+        return zlib.crc32(str(key).encode()) % workers
+
+    def start(self) -> None:
+        """
+        Starts the worker processes.
+        """
+        context = multiprocessing.get_context('spawn')
+        for shard in range(self.workers):
+            worker_queue = context.Queue()
+            self.queues.append(worker_queue)
+            self.processes.append(self._start_worker(shard, worker_queue))
+            self.restarts.append(0)
+        print(f'Started {self.workers} workers for bot {self.config.name}')
+
+    def _start_worker(self, shard: int, worker_queue: multiprocessing.Queue) -> multiprocessing.Process:
+        process = multiprocessing.get_context('spawn').Process(
+            target=run_worker,
+            args=(self.bot_class, self.config, shard, self.workers, worker_queue),
+            name=f'{self.config.name}-worker-{shard}',
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def check_workers(self) -> None:
+        """
+        Restarts the workers that exited.
+
+        :raises RuntimeError: If a worker exited more than MAX_WORKER_RESTARTS times.
+        """
+        for shard in range(len(self.processes)):
+            self._check_worker(shard)
+
+    def _check_worker(self, shard: int) -> None:
+        process = self.processes[shard]
+        if process.is_alive():
+            return
+        if self.restarts[shard] >= self.MAX_WORKER_RESTARTS:
+            raise RuntimeError(f'Worker {process.name} exited with code {process.exitcode} '
+                               f'after {self.restarts[shard]} restarts')
+        print(f'Worker {process.name} exited with code {process.exitcode}, restarting it')
+        Metrics.increment(f'{self.config.name}.dispatcher.shard_{shard}.restarts')
+        self.restarts[shard] += 1
+        self.processes[shard] = self._start_worker(shard, self.queues[shard])
+
+    def dispatch(self, update: Update) -> int:
+        """
+        Sends an update to the worker owning its user.
+
+        :param update: The Telegram update.
+        :return: The index of the worker.
+        :raises RuntimeError: If the worker exited and can't be restarted anymore.
+        """
+        shard = self.shard_for(update)
+        self._check_worker(shard)
+        self.queues[shard].put(update.to_dict())
+        Metrics.increment(f'{self.config.name}.dispatcher.shard_{shard}.updates')
+        return shard
+
+    def stop(self) -> None:
+        """
+        Asks the workers to finish their queued updates and waits for them to exit.
+        """
+        for worker_queue in self.queues:
+            worker_queue.put(None)
+        for process in self.processes:
+            process.join(self.STOP_TIMEOUT)
+            if process.is_alive():
+                print(f'Worker {process.name} did not stop in time, terminating it')
+                process.terminate()
+        self.queues = []
+        self.processes = []
+        self.restarts = []
+
+    def run(self) -> None:
+        """
+        Starts the workers and polls for updates until SIGINT or SIGTERM is received.
+        """
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        """
+        Polls Telegram for updates in the running event loop and dispatches them to the workers.
+        """
+        self.stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, self.stop_event.set)
+
+        update_queue = asyncio.Queue()
+        updater = Updater(Bot(self.config.telegram_bot_token), update_queue)
+
+        self.start()
+        try:
+            async with updater:
+                await updater.start_polling(allowed_updates=Update.ALL_TYPES)
+                dispatch_task = asyncio.create_task(self._dispatch_updates(update_queue))
+                watch_task = asyncio.create_task(self._watch_workers())
+                await self.stop_event.wait()
+                await updater.stop()
+                dispatch_task.cancel()
+                watch_task.cancel()
+
+                # Updates fetched before the updater stopped
+                while not update_queue.empty():
+                    self.dispatch(update_queue.get_nowait())
+        finally:
+            await asyncio.to_thread(self.stop)
+
+    async def _dispatch_updates(self, update_queue: asyncio.Queue) -> None:
+        while True:
+            update = await update_queue.get()
+            try:
+                self.dispatch(update)
+            except RuntimeError as e:
+                self._give_up(e)
+                return
+
+    async def _watch_workers(self) -> None:
+        while True:
+            await asyncio.sleep(self.WORKER_CHECK_INTERVAL)
+            try:
+                self.check_workers()
+            except RuntimeError as e:
+                self._give_up(e)
+                return
+
+    def _give_up(self, error: RuntimeError) -> None:
+        print(f'Stopping bot {self.config.name}: {error}')
+        self.stop_event.set()
+
+def run_worker(bot_class: Type, config: BotConfig, shard: int, workers: int, worker_queue: multiprocessing.Queue) -> None:
+    """
+    Entry point of a worker process.
+
+    :param bot_class: The bot class to instantiate.
+    :param config: Configuration of the bot.
+    :param shard: Index of the worker.
+    :param workers: Number of worker processes.
+    :param worker_queue: Queue the dispatcher sends the updates to, None stops the worker.
+    """
+    # The dispatcher handles the signals and stops the workers through their queues
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_worker(bot_class, config, shard, workers, worker_queue))
+
+async def _serve_worker(bot_class: Type, config: BotConfig, shard: int, workers: int,
+                        worker_queue: multiprocessing.Queue) -> None:
+    bot = bot_class(config)
+    application = bot.application
+
+    async with application:
+        # Every worker resumes the interrupted runs of its own chats only. The chat ID of
+        # a private chat is the user ID the updates are routed by.
+        await bot.start_processing(lambda chat_id: ShardedDispatcher.shard_for_key(chat_id, workers) == shard)
+        print(f'Worker {shard} of bot {config.name} started')
+        try:
+            while True:
+                try:
+                    data = worker_queue.get_nowait()
+                except queue.Empty:
+                    data = await asyncio.to_thread(worker_queue.get)
+                if data is None:
+                    break
+                await application.update_queue.put(Update.de_json(data, application.bot))
+        finally:
+            await bot.stop_processing()
+    print(f'Worker {shard} of bot {config.name} stopped')
@@ -33,7 +33,7 @@ class Transcriptor:
         :return: Transcription text and the number of tokens used.
         """
         try:
-            response = self.openai.chat.completions.create(
+            response = await self.openai.chat.completions.create(
                 model="gpt-4-vision-preview",
                 messages=[
                     {"role": "user", "content": [{"type": "text", "text": caption}, {"type": "image_url", "image_url": {"url": file_path, "detail": "low"}}]}
@@ -57,7 +57,7 @@ class Transcriptor:
         """
         try:
             with open(file_path, "rb") as audio_file:
-                transcription = self.openai.audio.transcriptions.create(
+                transcription = await self.openai.audio.transcriptions.create(
                     model="whisper-1",
                     file=audio_file,
                     response_format="text",
@@ -154,7 +154,7 @@ class Transcriptor:
             "temperature": 1.0,
         }
 
-        response = self.openai.chat.completions.create(**params)
+        response = await self.openai.chat.completions.create(**params)
         return response.choices[0].message.content, response.usage.total_tokens
 
 
@@ -0,0 +1,104 @@
+import hmac
+import json
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from lib.metrics import Metrics
+
+class WebhookServer:
+    """
+    Embedded aiohttp server that receives Telegram updates through webhooks.
+
+    Every registered bot application gets its own URL path and secret token. Incoming
+    updates are validated and put on the application's update queue, where they are
+    processed with the application's concurrent update settings.
+    """
+
+    SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+    HEALTH_PATH = '/health'
+    METRICS_PATH = '/metrics'
+
+    def __init__(self, listen: str = '0.0.0.0', port: int = 8443):
+        """
+        Initialize the webhook server.
+
+        :param listen: The address the server binds to.
+        :param port: The port the server listens on.
+        """
+        self.listen = listen
+        self.port = port
+        self.routes = {}  # URL path -> (application, secret token)
+        self.runner = None
+
+    def add_application(self, url_path: str, application: Application, secret_token: str = None) -> None:
+        """
+        Registers a bot application to receive updates on the given URL path.
+
+        :param url_path: The URL path Telegram sends the updates to, e.g. '/translator'.
+        :param application: The bot application processing the updates.
+        :param secret_token: Token Telegram sends in the secret token header with every update.
+        """
+        url_path = '/' + url_path.strip('/')
+        self.routes[url_path] = (application, secret_token)
+
+    def create_app(self) -> web.Application:
+        """
+        Creates the aiohttp application with the webhook, health check and metrics routes.
+        """
+        app = web.Application()
+        app.router.add_get(self.HEALTH_PATH, self.handle_health)
+        app.router.add_get(self.METRICS_PATH, self.handle_metrics)
+        for url_path in self.routes:
+            app.router.add_post(url_path, self.handle_update)
+        return app
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """
+        Responds to load balancer health checks.
+        """
+        return web.Response(text='ok')
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """
+        Returns the current metrics of the process as JSON.
+        """
+        return web.json_response(Metrics.snapshot())
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """
+        Validates an incoming update and queues it for processing.
+
+        :param request: The HTTP request sent by Telegram.
+        """
+        application, secret_token = self.routes[request.path]
+
+        if secret_token and not hmac.compare_digest(request.headers.get(self.SECRET_TOKEN_HEADER, ''), secret_token):
+            print(f'Rejected webhook request with invalid secret token on {request.path}')
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400)
+
+        update = Update.de_json(data, application.bot)
+        await application.update_queue.put(update)
+        return web.Response()
+
+    async def start(self) -> None:
+        """
+        Starts serving webhook requests.
+        """
+        self.runner = web.AppRunner(self.create_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.listen, self.port)
+        await site.start()
+        print(f'Webhook server listening on {self.listen}:{self.port}')
+
+    async def stop(self) -> None:
+        """
+        Stops the server and closes open connections.
+        """
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
@@ -9,7 +9,7 @@ from lib.telegram.services.poster import Poster
 from db.models.post import Post
 from dotenv import load_dotenv
 
-from db.engine import SessionLocal  # Import your SessionLocal
+from db.engine import SessionLocal, create_tables  # Import your SessionLocal
 
 def setup_logging():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,6 +26,7 @@ def main():
             logging.error("Environment variables DIET_TELEGRAM_BOT_TOKEN or DIET_ASSISTANT_ID are not set.")
             return
 
+        create_tables()
         logging.info("Creating Poster and PostCreator instances.")
         poster = Poster(telegram_token)
         post_creator = PostCreator(assistant_id=assistant_id)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+from db.engine import create_tables
+from lib.telegram.bots.bot_config import BotConfig
+from lib.telegram.bots.diet_bot import DietBot
+from lib.telegram.bots.translator_bot import TranslatorBot
+from lib.telegram.sharded_dispatcher import ShardedDispatcher
+
+BOTS = {
+    'diet': DietBot,
+    'translator': TranslatorBot,
+}
+
+def main():
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in BOTS:
+        print(f"Usage: {sys.argv[0]} {{{'|'.join(BOTS)}}} [workers]")
+        sys.exit(1)
+
+    name = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) == 3 else (os.cpu_count() or 1)
+
+    create_tables()  # Once, before the workers start
+    dispatcher = ShardedDispatcher(BOTS[name], BotConfig.from_env(name.upper()), workers)
+    dispatcher.run()
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
 #!/bin/bash
-python3 /aihelper/diet_bot.py &
-python3 /aihelper/translator_bot.py &
-wait
+# All bots run in one process and share the OpenAI client, DB engine and tokenizer encodings
+exec python3 /aihelper/bot_host.py diet translator
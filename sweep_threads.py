@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+from db.engine import create_tables
+from lib.openai.assistant import Assistant
+from lib.openai.thread_sweeper import ThreadSweeper
+from lib.telegram.bots.bot_config import BotConfig
+
+BOTS = ['diet', 'translator']
+
+def main():
+    parser = argparse.ArgumentParser(description='Deletes the OpenAI threads of idle conversations.')
+    parser.add_argument('bots', nargs='*', choices=BOTS, default=BOTS, help='Bots whose conversations are swept.')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the expired threads.')
+    parser.add_argument('--batch-size', type=int, default=ThreadSweeper.BATCH_SIZE)
+    parser.add_argument('--requests-per-second', type=float, default=ThreadSweeper.REQUESTS_PER_SECOND)
+    args = parser.parse_args()
+    create_tables()
+
+    async def sweep():
+        openai_client = Assistant.get_shared_client()
+        for name in args.bots:
+            config = BotConfig.from_env(name.upper())
+            sweeper = ThreadSweeper(openai_client, config.assistant_id, config.name,
+                                    batch_size=args.batch_size,
+                                    requests_per_second=args.requests_per_second,
+                                    dry_run=args.dry_run)
+            await sweeper.sweep()
+
+    asyncio.run(sweep())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.metrics import Metrics
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+        Metrics.reset()
+
+    def test_budget_is_bounded_by_stage_and_total(self):
+        deadline = Deadline(total=100, budgets={'download': 5})
+
+        self.assertEqual(deadline.budget('download'), 5)
+        self.assertEqual(deadline.budget('send'), Deadline.STAGE_BUDGETS['send'])
+        self.assertAlmostEqual(deadline.budget('run'), 100, delta=1)
+        self.assertAlmostEqual(deadline.budget('unknown'), 100, delta=1)
+
+    @patch('lib.deadline.time.monotonic')
+    def test_expired_deadline_fails_fast(self, mock_monotonic):
+        mock_monotonic.return_value = 1000
+        deadline = Deadline(total=10, name='test')
+        mock_monotonic.return_value = 1010
+
+        with self.assertRaises(DeadlineExceeded) as context:
+            deadline.budget('download')
+
+        self.assertEqual(context.exception.stage, 'download')
+        self.assertEqual(Metrics.snapshot()['counters'], {'test.deadline.exceeded.download': 1})
+
+    def test_run(self):
+        deadline = Deadline(budgets={'transcription': 0.05}, name='test')
+
+        async def work(delay):
+            await asyncio.sleep(delay)
+            return 'done'
+
+        self.assertEqual(asyncio.run(deadline.run('transcription', work(0))), 'done')
+        with self.assertRaises(DeadlineExceeded) as context:
+            asyncio.run(deadline.run('transcription', work(1)))
+
+        self.assertEqual(context.exception.stage, 'transcription')
+        self.assertEqual(context.exception.budget, 0.05)
+        self.assertEqual(Metrics.snapshot()['counters'], {'test.deadline.exceeded.transcription': 1})
+
+if __name__ == '__main__':
+    unittest.main()
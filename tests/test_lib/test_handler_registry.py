@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import Mock
+from lib.handler_registry import HandlerRegistry
+from lib.telegram.message_handlers.photo_handler import PhotoHandler
+from lib.telegram.message_handlers.text_handler import TextHandler
+from lib.openai.function_handlers.generate_image_handler import GenerateImageHandler
+from lib.openai.function_handlers.send_email_handler import SendEmailHandler
+
+class TestHandlerRegistry(unittest.TestCase):
+
+    def setUp(self):
+        HandlerRegistry.setup()
+
+    def test_message_types(self):
+        self.assertEqual(HandlerRegistry.get_message_types(), ['document', 'photo', 'text', 'video', 'voice'])
+
+    def test_get_message_handler(self):
+        self.assertIs(HandlerRegistry.get_message_handler('photo'), PhotoHandler)
+        self.assertIs(HandlerRegistry.get_message_handler('text'), TextHandler)
+        self.assertIsNone(HandlerRegistry.get_message_handler('sticker'))
+
+    def test_get_message_type(self):
+        message = Mock(document=None, photo=None, text='Hello', video=None, voice=None)
+        self.assertEqual(HandlerRegistry.get_message_type(message), 'text')
+
+        message = Mock(document=None, photo=[Mock()], text=None, video=None, voice=None)
+        self.assertEqual(HandlerRegistry.get_message_type(message), 'photo')
+
+        message = Mock(document=None, photo=None, text=None, video=None, voice=None)
+        self.assertIsNone(HandlerRegistry.get_message_type(message))
+
+    def test_get_function_handler(self):
+        self.assertIs(HandlerRegistry.get_function_handler('generateImage'), GenerateImageHandler)
+        self.assertIs(HandlerRegistry.get_function_handler('generate_image'), GenerateImageHandler)
+        self.assertIs(HandlerRegistry.get_function_handler('sendEmail'), SendEmailHandler)
+        self.assertIsNone(HandlerRegistry.get_function_handler('unknownFunction'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock, ANY
-from lib.localization import Localization
+from lib.localization import Localization, change_language
 
 class TestLocalization(unittest.TestCase):
 
@@ -62,5 +63,27 @@ class TestLocalization(unittest.TestCase):
         Localization.setup(language='ru')
         mock_gettext.translation.assert_not_called()
 
+    @patch('lib.localization.gettext')
+    def test_change_language_is_per_request(self, mock_gettext):
+        mock_gettext.translation.side_effect = lambda domain, path, languages, fallback: MagicMock(
+            gettext=MagicMock(side_effect=lambda message: f'{languages[0]}: {message}'))
+        Localization.setup(language='en')
+
+        async def handle_update(language, other_switched, switched):
+            change_language(language)
+            switched.set()
+            await other_switched.wait()  # The other update switches its language meanwhile
+            return Localization.get_text('Hello')
+
+        async def handle_updates():
+            ru_switched, ua_switched = asyncio.Event(), asyncio.Event()
+            return await asyncio.gather(
+                handle_update('ru', ua_switched, ru_switched),
+                handle_update('ua', ru_switched, ua_switched)
+            )
+
+        self.assertEqual(asyncio.run(handle_updates()), ['ru: Hello', 'ua: Hello'])
+        self.assertEqual(Localization.get_text('Hello'), 'en: Hello')  # The default language is unchanged
+
 if __name__ == '__main__':
     unittest.main()
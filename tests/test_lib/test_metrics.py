@@ -0,0 +1,34 @@
+import unittest
+from lib.metrics import Histogram, Metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        Metrics.reset()
+
+    def test_counters_and_gauges(self):
+        Metrics.increment('updates')
+        Metrics.increment('updates', 2)
+        Metrics.set_gauge('queued', 5)
+        Metrics.set_gauge('queued', 3)
+
+        snapshot = Metrics.snapshot()
+        self.assertEqual(snapshot['counters'], {'updates': 3})
+        self.assertEqual(snapshot['gauges'], {'queued': 3})
+
+    def test_histogram(self):
+        for value in (0.001, 0.02, 0.02, 0.3, 7):
+            Metrics.observe('wait_time', value)
+
+        histogram = Metrics.snapshot()['histograms']['wait_time']
+        self.assertEqual(histogram['count'], 5)
+        self.assertAlmostEqual(histogram['sum'], 7.341)
+        self.assertEqual(histogram['p50'], 0.025)
+        self.assertEqual(histogram['p95'], 7)
+        self.assertEqual(histogram['max'], 7)
+
+    def test_empty_histogram(self):
+        self.assertEqual(Histogram().percentile(50), 0)
+
+if __name__ == '__main__':
+    unittest.main()
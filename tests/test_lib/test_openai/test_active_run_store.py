@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import Mock
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from db.base import Base
+from db.models.active_run import ActiveRun
+from lib.openai.active_run_store import ActiveRunStore
+
+class TestActiveRunStore(unittest.TestCase):
+
+    def setUp(self):
+        # One in-memory database shared by the test and the writer thread of the store
+        engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.store = ActiveRunStore('assistant_id', session_factory=self.session_factory)
+        self.conversation = Mock(id=1, assistant_id='assistant_id', thread_id='thread_id')
+
+    def test_add_and_list(self):
+        asyncio.run(self.store.add(self.conversation, 'run_1', 12345))
+        asyncio.run(self.store.add(self.conversation, 'run_2', 12345))
+        asyncio.run(ActiveRunStore('other_assistant_id', session_factory=self.session_factory).add(
+            Mock(id=2, assistant_id='other_assistant_id', thread_id='other_thread_id'), 'run_3', 67890))
+
+        active_runs = self.store.list()
+
+        self.assertEqual([active_run.run_id for active_run in active_runs], ['run_1', 'run_2'])
+        self.assertEqual(active_runs[0].conversation_id, 1)
+        self.assertEqual(active_runs[0].thread_id, 'thread_id')
+        self.assertEqual(active_runs[0].chat_id, 12345)
+        self.assertIsNotNone(active_runs[0].started_at)
+        self.assertEqual(len(ActiveRunStore(session_factory=self.session_factory).list()), 3)
+
+    def test_remove(self):
+        async def add_and_remove():
+            await self.store.add(self.conversation, 'run_1', 12345)
+            await self.store.add(self.conversation, 'run_2', 12345)
+            await self.store.remove('run_1')
+            await self.store.remove('unknown_run')
+
+        asyncio.run(add_and_remove())
+
+        self.assertEqual([active_run.run_id for active_run in self.store.list()], ['run_2'])
+
+    def test_writes_run_outside_the_event_loop_in_order(self):
+        write_threads = []
+
+        def session_factory():
+            write_threads.append(threading.current_thread())
+            return self.session_factory()
+
+        store = ActiveRunStore('assistant_id', session_factory=session_factory)
+
+        async def add_and_remove():
+            # Not awaited one by one, the removal must still run after the addition
+            await asyncio.gather(store.add(self.conversation, 'run_1', 12345), store.remove('run_1'))
+
+        asyncio.run(add_and_remove())
+
+        self.assertEqual(len(write_threads), 2)
+        self.assertNotIn(threading.main_thread(), write_threads)
+        self.assertEqual(self.store.list(), [])
+
+    def test_database_errors_are_ignored(self):
+        session_factory = Mock(side_effect=OperationalError('INSERT', {}, Exception('no such table: active_runs')))
+        store = ActiveRunStore('assistant_id', session_factory=session_factory)
+
+        asyncio.run(store.add(self.conversation, 'run_1', 12345))
+        asyncio.run(store.remove('run_1'))
+
+if __name__ == '__main__':
+    unittest.main()
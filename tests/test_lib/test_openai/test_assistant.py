@@ -1,5 +1,6 @@
+import asyncio
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 from lib.openai.assistant import Assistant
 
 class TestAssistantClass(unittest.TestCase):
@@ -7,6 +8,11 @@ class TestAssistantClass(unittest.TestCase):
     def setUp(self):
         # Mocking the OpenAI's API client
         self.mock_openai_client = MagicMock()
+        self.mock_openai_client.beta.assistants.update = AsyncMock()
+        self.mock_openai_client.beta.assistants.retrieve = AsyncMock(
+            return_value=MagicMock(instructions='Be helpful.', model='gpt-4-1106-preview'))
+        Assistant.invalidate()
+        self.addCleanup(Assistant.invalidate)
 
     def test_raise_error_without_assistant_id(self):
         # Temporarily remove ASSISTANT_ID if set
@@ -30,16 +36,16 @@ class TestAssistantClass(unittest.TestCase):
         # Initialize Assistant instance
         self.assistant = Assistant(self.mock_openai_client)
         # Test adding a function to the assistant
-        self.assistant.add_function_to_assistant(
+        asyncio.run(self.assistant.add_function_to_assistant(
             'generateImage', 
             'Generate image', 
             'Now you are able to generate an image with that function. Use the provided functions to generate an image.',
             properties={"description": {"type": "string", "description": "Image description (prompt) for dall-e-3."}},
             required=['description']
-        )
+        ))
 
         # Verify if the openai client was called correctly
-        self.mock_openai_client.beta.assistants.update.assert_called_once_with(
+        self.mock_openai_client.beta.assistants.update.assert_awaited_once_with(
             'test-assistant-id',
             instructions='Now you are able to generate an image with that function. Use the provided functions to generate an image.',
             model="gpt-4-1106-preview",
@@ -57,6 +63,51 @@ class TestAssistantClass(unittest.TestCase):
             }]
         )
 
+    def test_metadata_is_cached(self):
+        assistant = Assistant(self.mock_openai_client, 'test-assistant-id')
+
+        async def read_twice():
+            return await assistant.metadata(), await Assistant(self.mock_openai_client, 'test-assistant-id').prompt()
+
+        metadata, prompt = asyncio.run(read_twice())
+
+        self.assertEqual(metadata['instructions'], 'Be helpful.')
+        self.assertEqual(metadata['model'], 'gpt-4-1106-preview')
+        self.assertEqual(prompt, 'Be helpful.')
+        self.mock_openai_client.beta.assistants.retrieve.assert_awaited_once_with('test-assistant-id')
+
+    @patch('lib.openai.assistant.time.monotonic')
+    def test_metadata_expires(self, mock_monotonic):
+        assistant = Assistant(self.mock_openai_client, 'test-assistant-id')
+        mock_monotonic.return_value = 1000
+        asyncio.run(assistant.prompt())
+
+        mock_monotonic.return_value = 1000 + Assistant.METADATA_TTL - 1
+        asyncio.run(assistant.prompt())
+        self.assertEqual(self.mock_openai_client.beta.assistants.retrieve.await_count, 1)
+
+        mock_monotonic.return_value = 1000 + Assistant.METADATA_TTL
+        asyncio.run(assistant.prompt())
+        self.assertEqual(self.mock_openai_client.beta.assistants.retrieve.await_count, 2)
+
+    def test_prompt_tokens_counted_once(self):
+        assistant = Assistant(self.mock_openai_client, 'test-assistant-id')
+        tokenizer = MagicMock(model='gpt-3.5-turbo')
+        tokenizer.num_tokens_from_string.return_value = 3
+
+        self.assertEqual(asyncio.run(assistant.prompt_tokens(tokenizer)), 3)
+        self.assertEqual(asyncio.run(assistant.prompt_tokens(tokenizer)), 3)
+        tokenizer.num_tokens_from_string.assert_called_once_with('Be helpful.')
+
+    def test_update_invalidates_metadata(self):
+        assistant = Assistant(self.mock_openai_client, 'test-assistant-id')
+        asyncio.run(assistant.prompt())
+
+        asyncio.run(assistant.add_function_to_assistant('generateImage', 'Generate image', 'New instructions.'))
+        asyncio.run(assistant.prompt())
+
+        self.assertEqual(self.mock_openai_client.beta.assistants.retrieve.await_count, 2)
+
 # Add more tests as necessary
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
+import asyncio
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from lib.openai.image import Image
 from lib.localization import Localization
 
@@ -9,6 +10,7 @@ class TestImageClass(unittest.TestCase):
         Localization._translator = None
         # Mocking OpenAI's API client
         self.mock_openai = MagicMock()
+        self.mock_openai.images.generate = AsyncMock()
         self.image = Image(self.mock_openai)
 
     def test_initialization(self):
@@ -20,21 +22,21 @@ class TestImageClass(unittest.TestCase):
         self.mock_openai.images.generate.return_value = MagicMock(
             data=[MagicMock(url='http://example.com/image.png', revised_prompt='Generated Image Description')]
         )
-        url, revised_prompt = self.image.generate('test description')
+        url, revised_prompt = asyncio.run(self.image.generate('test description'))
         self.assertEqual(url, 'http://example.com/image.png')
         self.assertEqual(revised_prompt, 'Generated Image Description')
 
     def test_generate_no_image(self):
         # Mocking a response with no image
         self.mock_openai.images.generate.return_value = MagicMock(data=[])
-        url, revised_prompt = self.image.generate('test description')
+        url, revised_prompt = asyncio.run(self.image.generate('test description'))
         self.assertEqual(url, 'No image generated')
         self.assertEqual(revised_prompt, '')
 
     def test_generate_exception(self):
         # Mocking an exception
         self.mock_openai.images.generate.side_effect = Exception("Test Exception")
-        response, revised_prompt = self.image.generate('test description')
+        response, revised_prompt = asyncio.run(self.image.generate('test description'))
         self.assertTrue("Error in generating image." in response)
         self.assertEqual(revised_prompt, '')
 
@@ -0,0 +1,47 @@
+import unittest
+from itertools import islice
+from unittest.mock import patch
+from lib.openai.polling_strategy import PollingStrategy
+
+class TestPollingStrategy(unittest.TestCase):
+
+    def test_fast_polls_then_backoff(self):
+        strategy = PollingStrategy(initial_delay=0.5, fast_polls=2, multiplier=2, max_delay=3, jitter=0)
+
+        self.assertEqual(list(islice(strategy.delays(), 6)), [0.5, 0.5, 1, 2, 3, 3])
+
+    @patch('lib.openai.polling_strategy.random.uniform', side_effect=lambda low, high: high)
+    def test_jitter_is_capped(self, mock_uniform):
+        strategy = PollingStrategy(initial_delay=1, fast_polls=1, multiplier=2, max_delay=4, jitter=0.1)
+
+        self.assertAlmostEqual(strategy.delay(1), 1.1)
+        self.assertEqual(strategy.delay(10), 4)
+
+    def test_jitter_range(self):
+        strategy = PollingStrategy(initial_delay=1, jitter=0.2)
+
+        for _ in range(100):
+            self.assertTrue(0.8 <= strategy.delay(1) <= 1.2)
+
+    def test_polls_per_hour(self):
+        strategy = PollingStrategy()
+        elapsed, polls = 0, 0
+        for delay in strategy.delays():
+            if elapsed >= 3600:
+                break
+            elapsed += delay
+            polls += 1
+
+        # A fixed 3-second poll needs 1200 calls
+        self.assertLess(polls, 400)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            PollingStrategy(initial_delay=0)
+        with self.assertRaises(ValueError):
+            PollingStrategy(initial_delay=5, max_delay=1)
+        with self.assertRaises(ValueError):
+            PollingStrategy(jitter=1)
+
+if __name__ == '__main__':
+    unittest.main()
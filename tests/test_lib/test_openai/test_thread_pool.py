@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, AsyncMock
+from lib.metrics import Metrics
+from lib.openai.thread_pool import ThreadPool
+
+class TestThreadPool(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        Metrics.reset()
+        self.created = 0
+        self.mock_openai_client = Mock()
+
+        async def create_thread():
+            self.created += 1
+            return Mock(id=f'thread_{self.created}')
+
+        self.mock_openai_client.beta.threads.create = AsyncMock(side_effect=create_thread)
+        self.mock_openai_client.beta.threads.delete = AsyncMock()
+        self.pool = ThreadPool(self.mock_openai_client, size=2, name='test')
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    async def test_acquire_from_warm_pool(self):
+        self.pool.start()
+        await asyncio.sleep(0)
+        self.assertEqual(list(self.pool.threads), ['thread_1', 'thread_2'])
+
+        thread_id = await self.pool.acquire()
+
+        self.assertEqual(thread_id, 'thread_1')
+        self.assertEqual(Metrics.get_counter('test.thread_pool.hits'), 1)
+
+        # The pool is refilled in the background
+        await asyncio.sleep(0)
+        self.assertEqual(list(self.pool.threads), ['thread_2', 'thread_3'])
+
+    async def test_acquire_from_empty_pool(self):
+        thread_id = await self.pool.acquire()
+
+        self.assertEqual(thread_id, 'thread_1')
+        self.assertEqual(Metrics.get_counter('test.thread_pool.misses'), 1)
+
+    async def test_release_deletes_in_background(self):
+        self.pool.release('old_thread')
+        self.mock_openai_client.beta.threads.delete.assert_not_awaited()
+
+        await self.pool.deletions.join()
+
+        self.mock_openai_client.beta.threads.delete.assert_awaited_once_with('old_thread')
+
+    async def test_failed_deletion_is_skipped(self):
+        self.mock_openai_client.beta.threads.delete.side_effect = [Exception('API Error'), None]
+
+        self.pool.release('first_thread')
+        self.pool.release('second_thread')
+        await self.pool.deletions.join()
+
+        self.assertEqual(self.mock_openai_client.beta.threads.delete.await_count, 2)
+
+    async def test_close_deletes_ready_threads(self):
+        self.pool.start()
+        await asyncio.sleep(0)
+        self.pool.release('old_thread')
+
+        await self.pool.close()
+
+        deleted = {call.args[0] for call in self.mock_openai_client.beta.threads.delete.await_args_list}
+        self.assertEqual(deleted, {'old_thread', 'thread_1', 'thread_2'})
+        self.assertEqual(self.pool.tasks, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,17 +2,42 @@ import io
 import json
 import shutil
 import os
+import time
 import unittest
 import asyncio
 from unittest.mock import Mock, patch, mock_open, AsyncMock, ANY
 from lib.openai.thread_run_manager import ThreadRunManager
+from lib.openai.polling_strategy import PollingStrategy
+from lib.openai.run_stream import RunEvent
+from lib.telegram.bots.bot_config import BotConfig
+from lib.metrics import Metrics
+from lib.deadline import Deadline, DeadlineExceeded
 from decimal import Decimal
+from openai import BadRequestError
+
+class FakeRunEventStream:
+    def __init__(self, *events):
+        self.events = [RunEvent(event, data) for event, data in events]
+        self.response = AsyncMock()
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+
+def text_delta(text):
+    return 'thread.message.delta', {'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': text}}]}}
+
+def message_completed(text):
+    return 'thread.message.completed', {
+        'id': 'msg_id', 'object': 'thread.message', 'role': 'assistant', 'thread_id': 'thread_id',
+        'content': [{'type': 'text', 'text': {'value': text, 'annotations': []}}]
+    }
 
 class TestThreadRunManager(unittest.TestCase):
 
     def setUp(self):
         # Mock dependencies
-        self.mock_openai_client = Mock()
+        self.mock_openai_client = AsyncMock()
         self.mock_update = Mock()
         self.mock_context = Mock()
         self.mock_session = Mock()
@@ -61,7 +86,7 @@ class TestThreadRunManager(unittest.TestCase):
 
         # Assertions
         mock_create_run.assert_called_once()
-        mock_process_run.assert_called_once_with('run_id')
+        mock_process_run.assert_called_once_with('run_id', Deadline.STAGE_BUDGETS['run'])
 
     def test_process_run(self):
         # Create a new event loop for this test
@@ -87,7 +112,7 @@ class TestThreadRunManager(unittest.TestCase):
         await self.handler.process_run('run_id')
 
         # Assertions
-        mock_wait_for_run_completion.assert_called_once_with('run_id', ANY)
+        mock_wait_for_run_completion.assert_called_once_with('run_id', ANY, None)
         mock_handle_run_response.assert_called_once_with(mock_run)
 
     def test_create_run(self):
@@ -114,15 +139,72 @@ class TestThreadRunManager(unittest.TestCase):
         run_id = await self.handler.create_run()
 
         # Assertions
-        self.mock_openai_client.beta.threads.runs.create.assert_called_once_with(thread_id=self.mock_conversation.thread_id, assistant_id=self.mock_conversation.assistant_id)
+        self.mock_openai_client.beta.threads.runs.create.assert_awaited_once_with(thread_id=self.mock_conversation.thread_id, assistant_id=self.mock_conversation.assistant_id)
+        self.assertEqual(run_id, 'run_id')
+
+    def test_create_run_with_new_messages(self):
+        self.mock_openai_client.beta.threads.runs.create.return_value = Mock(id='run_id')
+        self.handler.new_messages = [{'role': 'user', 'content': 'Hello'}]
+
+        run_id = asyncio.run(self.handler.create_run())
+
+        self.assertEqual(run_id, 'run_id')
+        self.mock_openai_client.beta.threads.runs.create.assert_awaited_once_with(
+            thread_id='thread_id', assistant_id='assistant_id',
+            extra_body={'additional_messages': [{'role': 'user', 'content': 'Hello'}]})
+        self.mock_openai_client.beta.threads.messages.create.assert_not_awaited()
+        self.assertEqual(self.handler.new_messages, [])
+
+    @patch.dict(ThreadRunManager._additional_messages_refused_at, clear=True)
+    @patch('lib.openai.thread_run_manager.time.monotonic', return_value=1000)
+    def test_create_run_without_additional_messages_support(self, mock_monotonic):
+        error = BadRequestError("Unrecognized request argument supplied: additional_messages",
+                                response=Mock(status_code=400, headers={}), body=None)
+        self.mock_openai_client.beta.threads.runs.create.side_effect = [error, Mock(id='run_id'), Mock(id='next_run_id')]
+        self.handler.new_messages = [{'role': 'user', 'content': 'Hello'}]
+
+        run_id = asyncio.run(self.handler.create_run())
+
         self.assertEqual(run_id, 'run_id')
+        self.mock_openai_client.beta.threads.messages.create.assert_awaited_once_with(
+            thread_id='thread_id', role='user', content='Hello')
+        self.mock_openai_client.beta.threads.runs.create.assert_awaited_with(
+            thread_id='thread_id', assistant_id='assistant_id')
+        self.assertFalse(self.handler.additional_messages_supported())
+
+        # Later runs of the assistant add the messages to the thread right away
+        self.handler.new_messages = [{'role': 'user', 'content': 'Hi again'}]
+        asyncio.run(self.handler.create_run())
+        self.assertEqual(self.mock_openai_client.beta.threads.runs.create.await_count, 3)
+        self.mock_openai_client.beta.threads.messages.create.assert_awaited_with(
+            thread_id='thread_id', role='user', content='Hi again')
+
+        # Other assistants still send them along
+        other_conversation = Mock(thread_id='thread_id', assistant_id='other_assistant_id')
+        other_handler = ThreadRunManager(self.mock_openai_client, None, self.mock_context, other_conversation, None, 1)
+        self.assertTrue(other_handler.additional_messages_supported())
+
+        # Sending them along is tried again after the retry interval
+        mock_monotonic.return_value = 1000 + ThreadRunManager.ADDITIONAL_MESSAGES_RETRY_INTERVAL
+        self.assertTrue(self.handler.additional_messages_supported())
+
+    def test_create_run_with_file_ids(self):
+        self.mock_openai_client.beta.threads.runs.create.return_value = Mock(id='run_id')
+        self.handler.new_messages = [{'role': 'user', 'content': 'Hello', 'file_ids': ['file_id']}]
+
+        asyncio.run(self.handler.create_run())
+
+        self.mock_openai_client.beta.threads.messages.create.assert_awaited_once_with(
+            thread_id='thread_id', role='user', content='Hello', file_ids=['file_id'])
+        self.mock_openai_client.beta.threads.runs.create.assert_awaited_once_with(
+            thread_id='thread_id', assistant_id='assistant_id')
 
     def test_create_thread(self):
         self.mock_conversation.id = 'conversation_id'
         mock_thread = Mock(id='new_thread_id')
         self.mock_openai_client.beta.threads.create.return_value = mock_thread
 
-        self.handler.create_thread(self.mock_session, self.mock_conversation)
+        asyncio.run(self.handler.create_thread(self.mock_session, self.mock_conversation))
 
         # Assertions
         self.mock_session.query().filter_by().update.assert_called_once_with({"thread_id": "new_thread_id"})
@@ -131,18 +213,32 @@ class TestThreadRunManager(unittest.TestCase):
     def test_recreate_thread(self):
         self.mock_conversation.thread_id = 'existing_thread_id'
 
-        self.handler.recreate_thread(self.mock_session, self.mock_conversation)
+        asyncio.run(self.handler.recreate_thread(self.mock_session, self.mock_conversation))
 
         # Assertions
-        self.mock_openai_client.beta.threads.delete.assert_called_once_with('existing_thread_id')
+        self.mock_openai_client.beta.threads.delete.assert_awaited_once_with('existing_thread_id')
         self.mock_session.query().filter_by().update.assert_called_once()
         self.mock_session.commit.assert_called_once()
 
+    def test_recreate_thread_with_pool(self):
+        thread_pool = Mock()
+        thread_pool.acquire = AsyncMock(return_value='new_thread_id')
+        self.handler.thread_pool = thread_pool
+
+        asyncio.run(self.handler.recreate_thread(self.mock_session, self.mock_conversation))
+
+        thread_pool.release.assert_called_once_with('thread_id')
+        self.mock_openai_client.beta.threads.delete.assert_not_awaited()
+        self.mock_openai_client.beta.threads.create.assert_not_awaited()
+        self.assertEqual(self.handler.thread_id, 'new_thread_id')
+        self.assertEqual(self.mock_conversation.thread_id, 'new_thread_id')
+        self.mock_session.commit.assert_called_once()
+
     def test_cancel_run_with_valid_ids(self):
         # Test cancel_run with valid thread_id and run_id
-        self.handler.cancel_run('valid_thread_id', 'valid_run_id')
+        asyncio.run(self.handler.cancel_run('valid_thread_id', 'valid_run_id'))
         # Verify if the openai client's cancel method was called correctly
-        self.mock_openai_client.beta.threads.runs.cancel.assert_called_once_with(
+        self.mock_openai_client.beta.threads.runs.cancel.assert_awaited_once_with(
             thread_id='valid_thread_id',
             run_id='valid_run_id'
         )
@@ -150,13 +246,13 @@ class TestThreadRunManager(unittest.TestCase):
     def test_cancel_run_exception_handling(self):
         with patch('sys.stdout', new=io.StringIO()) as fake_output:
             self.mock_openai_client.beta.threads.runs.cancel.side_effect = Exception("Test Exception")
-            self.handler.cancel_run('valid_thread_id', 'valid_run_id')
+            asyncio.run(self.handler.cancel_run('valid_thread_id', 'valid_run_id'))
             self.assertIn("Error occurred while cancelling the run: Test Exception", fake_output.getvalue())
 
     def test_cancel_run_with_none_or_invalid_ids(self):
         # This method is now an async method
         with patch('sys.stdout', new=io.StringIO()) as fake_output:
-            self.handler.cancel_run(None, None)
+            asyncio.run(self.handler.cancel_run(None, None))
             self.assertIn("Failed to cancel run with invalid IDs.", fake_output.getvalue())
 
     def test_submit_tool_outputs(self):
@@ -183,12 +279,392 @@ class TestThreadRunManager(unittest.TestCase):
 
         # Assertions
         mock_handle_tool_call.assert_awaited()
-        self.mock_openai_client.beta.threads.runs.submit_tool_outputs.assert_called_once_with(
+        self.mock_openai_client.beta.threads.runs.submit_tool_outputs.assert_awaited_once_with(
             thread_id='thread_id',
             run_id=mock_run.id,
             tool_outputs=[{'tool_call_id': 'tool_call_id', 'output': 'test_output'}]
         )
 
+    def test_submit_tool_outputs_in_parallel(self):
+        active = 0
+        max_active = 0
+
+        async def handle_tool_call(tool_call):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.01 if tool_call.id == 'first' else 0)
+            active -= 1
+            if tool_call.id == 'failing':
+                raise RuntimeError('Image generation failed')
+            return {'tool_call_id': tool_call.id, 'output': tool_call.id}
+
+        self.handler._handle_tool_call = handle_tool_call
+        mock_run = Mock(id='run_id')
+        mock_run.required_action.submit_tool_outputs.tool_calls = [
+            Mock(id='first'), Mock(id='failing'), Mock(id='third')]
+
+        asyncio.run(self.handler.submit_tool_outputs(mock_run))
+
+        self.assertEqual(max_active, 3)
+        self.mock_openai_client.beta.threads.runs.submit_tool_outputs.assert_awaited_once_with(
+            thread_id='thread_id',
+            run_id='run_id',
+            tool_outputs=[
+                {'tool_call_id': 'first', 'output': 'first'},
+                {'tool_call_id': 'failing', 'output': 'Error: Image generation failed'},
+                {'tool_call_id': 'third', 'output': 'third'},
+            ]
+        )
+
+    def test_submit_tool_outputs_bounded(self):
+        active = 0
+        max_active = 0
+
+        async def handle_tool_call(tool_call):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0)
+            active -= 1
+            return {'tool_call_id': tool_call.id, 'output': ''}
+
+        self.handler._handle_tool_call = handle_tool_call
+        self.handler.MAX_PARALLEL_TOOL_CALLS = 2
+        mock_run = Mock(id='run_id')
+        mock_run.required_action.submit_tool_outputs.tool_calls = [Mock(id=str(index)) for index in range(5)]
+
+        asyncio.run(self.handler.submit_tool_outputs(mock_run))
+
+        self.assertEqual(max_active, 2)
+
+    @patch('lib.openai.thread_run_manager.ThreadRunManager._process_message')
+    def test_handle_run_response(self, mock_process_message):
+        answers = [Mock(run_id='run_id', role='assistant'), Mock(run_id='run_id', role='assistant')]
+        user_message = Mock(run_id=None, role='user')
+        older_answer = Mock(run_id='older_run_id', role='assistant')
+        self.mock_openai_client.beta.threads.messages.list.return_value = Mock(
+            data=[answers[1], answers[0], user_message, older_answer])
+
+        asyncio.run(self.handler.handle_run_response(Mock(id='run_id')))
+
+        self.mock_openai_client.beta.threads.messages.list.assert_awaited_once_with(
+            thread_id='thread_id', limit=ThreadRunManager.THREAD_MESSAGES_LIMIT, order='desc')
+        self.assertEqual([call.args[0] for call in mock_process_message.await_args_list], answers)
+
+        # The listing is reused for the rest of the update, e.g. billing
+        messages = asyncio.run(self.handler.list_thread_messages())
+        self.assertEqual(messages, [answers[1], answers[0], user_message, older_answer])
+        self.mock_openai_client.beta.threads.messages.list.assert_awaited_once()
+
+    def test_handle_unknown_tool_call(self):
+        tool_call = Mock(id='tool_call_id')
+        tool_call.function.name = 'unknownFunction'
+        tool_call.function.arguments = '{}'
+
+        output = asyncio.run(self.handler._handle_tool_call(tool_call))
+
+        self.assertEqual(output, {'tool_call_id': 'tool_call_id', 'output': ''})
+
+    def test_process_run_cancelled(self):
+        async def wait_forever(run_id, start_time, timeout):
+            await asyncio.Event().wait()
+
+        async def cancel_process_run():
+            task = asyncio.create_task(self.handler.process_run('run_id'))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.handler.wait_for_run_completion = wait_forever
+        asyncio.run(cancel_process_run())
+
+        self.mock_openai_client.beta.threads.runs.cancel.assert_awaited_once_with(thread_id='thread_id', run_id='run_id')
+
+    @patch('lib.openai.thread_run_manager.asyncio.sleep', new_callable=AsyncMock)
+    def test_wait_for_run_completion_backoff(self, mock_sleep):
+        BotConfig.register(BotConfig('test', 'token', 'assistant_id'))
+        self.addCleanup(BotConfig._configs.pop, 'assistant_id', None)
+        Metrics.reset()
+        statuses = ['queued', 'in_progress', 'in_progress', 'in_progress', 'in_progress', 'completed']
+        self.mock_openai_client.beta.threads.runs.retrieve.side_effect = [Mock(status=status) for status in statuses]
+
+        with patch.object(ThreadRunManager, 'POLLING_STRATEGY', PollingStrategy(
+                initial_delay=0.5, fast_polls=2, multiplier=2, max_delay=3, jitter=0)):
+            run = asyncio.run(self.handler.wait_for_run_completion('run_id', time.time()))
+
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual([call.args[0] for call in mock_sleep.await_args_list], [0.5, 0.5, 1, 2, 3])
+        self.assertEqual(Metrics.get_histogram('test.run.polling.polls').sum, 6)
+        self.assertEqual(Metrics.get_histogram('test.run.polling.completion_latency').count, 1)
+
+    @patch('lib.openai.thread_run_manager.asyncio.sleep', new_callable=AsyncMock)
+    def test_wait_for_run_completion_failed_run(self, mock_sleep):
+        self.mock_openai_client.beta.threads.runs.retrieve.side_effect = [Mock(status='in_progress'), Mock(status='failed')]
+
+        run = asyncio.run(self.handler.wait_for_run_completion('run_id', time.time()))
+
+        self.assertIsNone(run)
+        self.assertEqual(self.mock_openai_client.beta.threads.runs.retrieve.await_count, 2)
+        self.mock_openai_client.beta.threads.runs.cancel.assert_not_awaited()
+
+    @patch('lib.openai.thread_run_manager.asyncio.sleep', new_callable=AsyncMock)
+    def test_process_run_deadline_exceeded(self, mock_sleep):
+        self.handler.deadline = Deadline(budgets={'run': 0})
+        self.mock_openai_client.beta.threads.runs.retrieve.return_value = Mock(status='in_progress')
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(self.handler.process_run('run_id'))
+
+        self.mock_openai_client.beta.threads.runs.cancel.assert_awaited_once_with(thread_id='thread_id', run_id='run_id')
+
+    @patch('lib.openai.thread_run_manager.ThreadRunManager.create_run')
+    def test_manage_run_with_spent_budget_creates_no_run(self, mock_create_run):
+        self.handler.deadline = Deadline(total=0)
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(self.handler.manage_run())
+
+        mock_create_run.assert_not_called()
+
+    @patch('lib.openai.thread_run_manager.ThreadRunManager.handle_run_response')
+    def test_process_run_cancels_run_when_sending_the_answer_runs_out_of_time(self, mock_handle_run_response):
+        # E.g. the 'send' stage of a tool call's message
+        self.mock_openai_client.beta.threads.runs.retrieve.return_value = Mock(
+            status='requires_action', required_action=Mock(submit_tool_outputs=Mock(tool_calls=[])))
+        self.handler.submit_tool_outputs = AsyncMock(side_effect=DeadlineExceeded('send', 30))
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(self.handler.process_run('run_id'))
+
+        self.mock_openai_client.beta.threads.runs.cancel.assert_awaited_once_with(thread_id='thread_id', run_id='run_id')
+
+    def test_stream_run_deadline_exceeded(self):
+        class StalledStream(FakeRunEventStream):
+            async def __aiter__(self):
+                yield RunEvent('thread.run.created', {'id': 'run_id', 'status': 'queued'})
+                await asyncio.Event().wait()
+
+        self.handler.deadline = Deadline(budgets={'run': 0.01})
+        stream = StalledStream()
+        self.mock_openai_client.post.return_value = stream
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(self.handler.stream_run())
+
+        self.mock_openai_client.beta.threads.runs.cancel.assert_awaited_once_with(thread_id='thread_id', run_id='run_id')
+        stream.response.aclose.assert_awaited_once()
+
+    def test_stream_run_with_spent_budget_creates_no_run(self):
+        self.handler.deadline = Deadline(total=0)
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(self.handler.stream_run())
+
+        self.mock_openai_client.post.assert_not_awaited()
+
+    def test_stream_run_interrupted_before_the_run_created_event_cancels_run(self):
+        class BrokenStream(FakeRunEventStream):
+            async def __aiter__(self):
+                raise ConnectionError('Stream interrupted')
+                yield
+
+        stream = BrokenStream()
+        self.mock_openai_client.post.return_value = stream
+        self.mock_openai_client.beta.threads.runs.list.return_value = Mock(data=[Mock(id='run_id', status='queued')])
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(self.handler.stream_run())
+
+        self.mock_openai_client.beta.threads.runs.list.assert_awaited_once_with(thread_id='thread_id', limit=1)
+        self.mock_openai_client.beta.threads.runs.cancel.assert_awaited_once_with(thread_id='thread_id', run_id='run_id')
+        stream.response.aclose.assert_awaited_once()
+
+    def test_manage_run_streaming(self):
+        BotConfig.register(BotConfig('test', 'token', 'assistant_id', streaming_runs=True))
+        self.addCleanup(BotConfig._configs.pop, 'assistant_id', None)
+        Metrics.reset()
+        self.mock_context.bot.send_message = AsyncMock(return_value=Mock(message_id=1))
+        self.mock_context.bot.edit_message_text = AsyncMock()
+        self.mock_openai_client.post.return_value = FakeRunEventStream(
+            ('thread.run.created', {'id': 'run_id', 'status': 'queued'}),
+            text_delta('Hello'),
+            text_delta(', world!'),
+            message_completed('Hello, world!'),
+            ('thread.run.completed', {'id': 'run_id', 'status': 'completed',
+                                      'usage': {'prompt_tokens': 120, 'completion_tokens': 4, 'total_tokens': 124}}),
+        )
+
+        asyncio.run(self.handler.manage_run([{'role': 'user', 'content': 'Hi'}]))
+
+        self.mock_openai_client.post.assert_awaited_once()
+        self.assertEqual(self.mock_openai_client.post.call_args.args[0], '/threads/thread_id/runs')
+        self.assertEqual(self.mock_openai_client.post.call_args.kwargs['body'], {
+            'assistant_id': 'assistant_id', 'additional_messages': [{'role': 'user', 'content': 'Hi'}], 'stream': True})
+        self.mock_openai_client.beta.threads.runs.create.assert_not_awaited()
+
+        # The first tokens are sent right away, the rest is shown by editing the message
+        self.mock_context.bot.send_message.assert_awaited_once_with(12345, 'Hello')
+        self.mock_context.bot.edit_message_text.assert_awaited_once_with('Hello, world!', chat_id=12345, message_id=1)
+        self.assertEqual(self.handler.output_texts, ['Hello, world!'])
+        self.assertEqual(self.handler.usage, {'prompt_tokens': 120, 'completion_tokens': 4})
+        self.assertEqual(Metrics.get_histogram('test.run.streaming.time_to_first_token').count, 1)
+        self.assertEqual(Metrics.get_histogram('test.run.streaming.duration').count, 1)
+
+    @patch('lib.openai.thread_run_manager.random.randint', return_value=10)
+    @patch('lib.openai.thread_run_manager.ThreadRunManager._handle_tool_call')
+    def test_stream_run_requires_action(self, mock_handle_tool_call, mock_randint):
+        mock_handle_tool_call.return_value = {'tool_call_id': 'call_id', 'output': 'test_output'}
+        self.mock_context.bot.send_message = AsyncMock(return_value=Mock(message_id=1))
+        first_stream = FakeRunEventStream(
+            ('thread.run.created', {'id': 'run_id', 'status': 'queued'}),
+            ('thread.run.requires_action', {
+                'id': 'run_id', 'status': 'requires_action',
+                'required_action': {'type': 'submit_tool_outputs', 'submit_tool_outputs': {'tool_calls': [
+                    {'id': 'call_id', 'type': 'function', 'function': {'name': 'generateImage', 'arguments': '{}'}}
+                ]}}
+            }),
+        )
+        second_stream = FakeRunEventStream(
+            message_completed('Done'),
+            ('thread.run.completed', {'id': 'run_id', 'status': 'completed'}),
+        )
+        self.mock_openai_client.post.side_effect = [first_stream, second_stream]
+
+        asyncio.run(self.handler.stream_run())
+
+        mock_handle_tool_call.assert_awaited_once()
+        first_stream.response.aclose.assert_awaited_once()
+        submit_call = self.mock_openai_client.post.call_args_list[1]
+        self.assertEqual(submit_call.args[0], '/threads/thread_id/runs/run_id/submit_tool_outputs')
+        self.assertEqual(submit_call.kwargs['body'], {
+            'tool_outputs': [{'tool_call_id': 'call_id', 'output': 'test_output'}], 'stream': True})
+        self.mock_context.bot.send_message.assert_awaited_once_with(12345, 'Done')
+
+    def test_stream_run_failure_cancels_run(self):
+        class FailingStream(FakeRunEventStream):
+            async def __aiter__(self):
+                yield RunEvent('thread.run.created', {'id': 'run_id', 'status': 'queued'})
+                raise ConnectionError('Stream interrupted')
+
+        self.mock_openai_client.post.return_value = FailingStream()
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(self.handler.stream_run())
+
+        self.mock_openai_client.beta.threads.runs.cancel.assert_awaited_once_with(thread_id='thread_id', run_id='run_id')
+
+    @patch('lib.openai.thread_run_manager.ThreadRunManager.process_run')
+    @patch('lib.openai.thread_run_manager.ThreadRunManager.create_run')
+    def test_manage_run_tracks_run(self, mock_create_run, mock_process_run):
+        mock_create_run.return_value = 'run_id'
+        run_store = AsyncMock()
+        mock_process_run.side_effect = lambda run_id, timeout: run_store.add.assert_called_once_with(
+            self.mock_conversation, 'run_id', 12345)
+        self.handler.run_store = run_store
+
+        asyncio.run(self.handler.manage_run())
+
+        mock_process_run.assert_awaited_once_with('run_id', Deadline.STAGE_BUDGETS['run'])
+        run_store.remove.assert_awaited_once_with('run_id')
+
+    def test_stream_run_tracks_run(self):
+        run_store = AsyncMock()
+        self.handler.run_store = run_store
+        self.mock_context.bot.send_message = AsyncMock(return_value=Mock(message_id=1))
+        self.mock_openai_client.post.return_value = FakeRunEventStream(
+            ('thread.run.created', {'id': 'run_id', 'status': 'queued'}),
+            ('thread.run.completed', {'id': 'run_id', 'status': 'completed'}),
+        )
+
+        asyncio.run(self.handler.stream_run())
+
+        run_store.add.assert_awaited_once_with(self.mock_conversation, 'run_id', 12345)
+        run_store.remove.assert_awaited_once_with('run_id')
+
+    @patch('lib.openai.thread_run_manager.ThreadRunManager.handle_run_response')
+    def test_resume_run(self, mock_handle_run_response):
+        run_store = AsyncMock()
+        self.handler.run_store = run_store
+        completed_run = Mock(status='completed')
+        self.mock_openai_client.beta.threads.runs.retrieve.return_value = completed_run
+
+        asyncio.run(self.handler.resume_run('run_id'))
+
+        self.mock_openai_client.beta.threads.runs.retrieve.assert_awaited_once_with(thread_id='thread_id', run_id='run_id')
+        mock_handle_run_response.assert_awaited_once_with(completed_run)
+        run_store.add.assert_not_awaited()
+        run_store.remove.assert_awaited_once_with('run_id')
+
+    def test_resume_run_failure_removes_run(self):
+        run_store = AsyncMock()
+        self.handler.run_store = run_store
+        self.mock_openai_client.beta.threads.runs.retrieve.side_effect = Exception('No run found with id')
+
+        with self.assertRaises(Exception):
+            asyncio.run(self.handler.resume_run('run_id'))
+
+        run_store.remove.assert_awaited_once_with('run_id')
+
+    @patch('lib.openai.thread_run_manager.asyncio.sleep', new_callable=AsyncMock)
+    def test_calculate_turn_amount_from_usage(self, mock_sleep):
+        self.mock_openai_client.beta.threads.runs.retrieve.side_effect = [
+            Mock(status='requires_action', required_action=Mock(submit_tool_outputs=Mock(tool_calls=[]))),
+            Mock(status='completed', usage={'prompt_tokens': 10000, 'completion_tokens': 5000, 'total_tokens': 15000}),
+        ]
+
+        asyncio.run(self.handler.wait_for_run_completion('run_id', time.time()))
+        amount = asyncio.run(self.handler.calculate_turn_amount())
+
+        self.assertEqual(amount, self.handler.tokenizer.tokens_to_money_from_usage(10000, 5000))
+        # The thread isn't listed nor tokenized
+        self.mock_openai_client.beta.threads.messages.list.assert_not_awaited()
+
+    @patch('lib.openai.tokenizer.Tokenizer.calculate_assistant_prompt_tokens', new_callable=AsyncMock, return_value=0)
+    def test_calculate_turn_amount_without_usage(self, mock_prompt_tokens):
+        message = Mock()
+        message.content = [Mock(type='text', text=Mock(value=' '.join(['Hello'] * 3000)))]
+        self.mock_openai_client.beta.threads.messages.list.return_value = Mock(data=[message])
+        self.handler.output_texts = ['Hi']
+
+        amount = asyncio.run(self.handler.calculate_turn_amount())
+
+        tokenizer = self.handler.tokenizer
+        self.assertEqual(amount, tokenizer.tokens_to_money(3000, 'input') + tokenizer.tokens_to_money_from_string('Hi', 'output'))
+
+    def test_interrupt_answer(self):
+        self.mock_context.bot.send_message = AsyncMock(return_value=Mock(message_id=1))
+        self.mock_context.bot.edit_message_text = AsyncMock()
+        self.mock_openai_client.post.return_value = FakeRunEventStream(
+            ('thread.run.created', {'id': 'run_id', 'status': 'queued'}),
+            text_delta('The first part of the answer'),
+        )
+        asyncio.run(self.handler.stream_run())
+
+        asyncio.run(self.handler.interrupt_answer())
+
+        self.mock_context.bot.edit_message_text.assert_awaited_once_with(
+            'The first part of the answer\n\n(Interrupted by your new message)', chat_id=12345, message_id=1)
+        self.assertLess(self.mock_conversation.balance, Decimal('10.0'))
+        self.assertIsNone(self.handler.streaming_message)
+
+    def test_interrupt_answer_without_streamed_text(self):
+        asyncio.run(self.handler.interrupt_answer())
+
+        self.assertEqual(self.mock_conversation.balance, Decimal('10.0'))
+
+    @patch('lib.openai.thread_run_manager.asyncio.sleep', new_callable=AsyncMock)
+    def test_wait_for_run_end(self, mock_sleep):
+        self.handler.run_id = 'run_id'
+        self.mock_openai_client.beta.threads.runs.retrieve.side_effect = [
+            Mock(status='cancelling'), Mock(status='cancelling'), Mock(status='cancelled')]
+
+        asyncio.run(self.handler.wait_for_run_end())
+
+        self.assertEqual(self.mock_openai_client.beta.threads.runs.retrieve.await_count, 3)
+        self.assertEqual(mock_sleep.await_count, 2)
+
     def tearDown(self):
         temp_dir_path = './tmp/thread_id'  # Ensure this is the correct path
         if os.path.exists(temp_dir_path):
@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, AsyncMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from db.base import Base
+from db.models.conversation import Conversation
+from lib.openai.thread_sweeper import ThreadSweeper
+
+class TestThreadSweeper(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.idle_at = datetime.utcnow() - timedelta(hours=2)
+
+        with self.session_factory() as session:
+            session.add_all([
+                Conversation(id=1, assistant_id='assistant_id', thread_id='expired_1', updated_at=self.idle_at),
+                Conversation(id=2, assistant_id='assistant_id', thread_id='active', updated_at=datetime.utcnow()),
+                Conversation(id=3, assistant_id='assistant_id', thread_id='expired_2', updated_at=self.idle_at),
+                Conversation(id=4, assistant_id='other_assistant_id', thread_id='other', updated_at=self.idle_at),
+                Conversation(id=5, assistant_id='assistant_id', thread_id=None, updated_at=self.idle_at),
+            ])
+            session.commit()
+
+        self.mock_openai_client = Mock()
+        self.mock_openai_client.beta.threads.delete = AsyncMock()
+
+    def _create_sweeper(self, **kwargs):
+        return ThreadSweeper(self.mock_openai_client, 'assistant_id', 'test', batch_size=1,
+                             requests_per_second=1000, session_factory=self.session_factory, **kwargs)
+
+    def _thread_ids(self):
+        with self.session_factory() as session:
+            return {conversation.id: conversation.thread_id for conversation in session.query(Conversation)}
+
+    def test_sweep(self):
+        stats = asyncio.run(self._create_sweeper().sweep())
+
+        self.assertEqual(stats['expired'], 2)
+        self.assertEqual(stats['deleted'], 2)
+        self.assertEqual(stats['failed'], 0)
+        deleted = [call.args[0] for call in self.mock_openai_client.beta.threads.delete.await_args_list]
+        self.assertEqual(deleted, ['expired_1', 'expired_2'])
+        self.assertEqual(self._thread_ids(), {1: None, 2: 'active', 3: None, 4: 'other', 5: None})
+
+        # The time of the last message is kept
+        with self.session_factory() as session:
+            self.assertEqual(session.get(Conversation, 1).updated_at, self.idle_at)
+
+    def test_dry_run(self):
+        stats = asyncio.run(self._create_sweeper(dry_run=True).sweep())
+
+        self.assertEqual(stats['expired'], 2)
+        self.assertEqual(stats['deleted'], 0)
+        self.mock_openai_client.beta.threads.delete.assert_not_awaited()
+        self.assertEqual(self._thread_ids()[1], 'expired_1')
+
+    def test_thread_replaced_since_read(self):
+        sweeper = self._create_sweeper()
+        batch = sweeper._get_expired_batch(datetime.utcnow() - timedelta(hours=1), 0)
+        with self.session_factory() as session:
+            session.query(Conversation).filter_by(id=1).update({'thread_id': 'new_thread'})
+            session.commit()
+
+        stats = {'deleted': 0, 'failed': 0, 'skipped': 0}
+        asyncio.run(sweeper._sweep_batch(batch, stats))
+
+        self.assertEqual(stats['skipped'], 1)
+        self.mock_openai_client.beta.threads.delete.assert_not_awaited()
+        self.assertEqual(self._thread_ids()[1], 'new_thread')
+
+    def test_failed_deletion(self):
+        self.mock_openai_client.beta.threads.delete.side_effect = [Exception('API Error'), None]
+
+        stats = asyncio.run(self._create_sweeper().sweep())
+
+        self.assertEqual(stats['deleted'], 1)
+        self.assertEqual(stats['failed'], 1)
+
+    @patch('lib.openai.thread_sweeper.asyncio.sleep', new_callable=AsyncMock)
+    def test_rate_limit(self, mock_sleep):
+        sweeper = self._create_sweeper()
+        sweeper.requests_per_second = 2
+
+        asyncio.run(sweeper.sweep())
+
+        mock_sleep.assert_awaited_once()
+        self.assertAlmostEqual(mock_sleep.await_args.args[0], 0.5, places=1)
+
+if __name__ == '__main__':
+    unittest.main()
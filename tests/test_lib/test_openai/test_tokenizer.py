@@ -1,5 +1,8 @@
+import asyncio
 import unittest
-from unittest.mock import patch, MagicMock
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, AsyncMock, MagicMock
+from lib.openai.assistant import Assistant
 from lib.openai.tokenizer import Tokenizer
 from decimal import Decimal
 
@@ -7,9 +10,16 @@ class TestTokenizer(unittest.TestCase):
 
     @patch('tiktoken.encoding_for_model')
     def setUp(self, mock_encoding):
+        # Fresh registries, so the mocked encodings don't leak into other tests
+        for registry in (Tokenizer._encodings, Tokenizer._shared_tokenizers, Tokenizer._message_tokens):
+            registry_patcher = patch.dict(registry, clear=True)
+            registry_patcher.start()
+            self.addCleanup(registry_patcher.stop)
+
         # Setup a default Tokenizer for use in all tests
         mock_encoding.return_value = MagicMock(encode=MagicMock(side_effect=lambda x: list(range(len(x)))))
         self.tokenizer = Tokenizer()
+        Tokenizer._encodings.clear()
 
     @patch('tiktoken.encoding_for_model')
     def test_default_model_initialization(self, mock_encoding):
@@ -26,6 +36,37 @@ class TestTokenizer(unittest.TestCase):
         self.assertEqual(tokenizer.model, test_model)
         self.assertEqual(tokenizer.encoding, 'mocked_encoding_gpt4')
 
+    @patch('tiktoken.encoding_for_model')
+    def test_encodings_are_loaded_once_per_model(self, mock_encoding):
+        mock_encoding.side_effect = lambda model: f'encoding_{model}'
+
+        self.assertEqual(Tokenizer().encoding, 'encoding_gpt-3.5-turbo')
+        self.assertEqual(Tokenizer().encoding, 'encoding_gpt-3.5-turbo')
+        self.assertEqual(Tokenizer('gpt-4').encoding, 'encoding_gpt-4')
+
+        self.assertEqual(mock_encoding.call_count, 2)
+
+    @patch('tiktoken.encoding_for_model')
+    def test_get_shared_returns_one_tokenizer_per_model(self, mock_encoding):
+        default_tokenizer = Tokenizer.get_shared()
+
+        self.assertIs(Tokenizer.get_shared(), default_tokenizer)
+        self.assertIs(Tokenizer.get_shared("gpt-3.5-turbo"), default_tokenizer)
+        self.assertEqual(default_tokenizer.model, "gpt-3.5-turbo")
+        self.assertIsNot(Tokenizer.get_shared("gpt-4"), default_tokenizer)
+        self.assertEqual(Tokenizer.get_shared("gpt-4").model, "gpt-4")
+
+    @patch('tiktoken.encoding_for_model')
+    def test_warm_up_loads_the_encodings(self, mock_encoding):
+        mock_encoding.side_effect = lambda model: f'encoding_{model}'
+
+        Tokenizer.warm_up(("gpt-3.5-turbo", "gpt-4"))
+        self.assertEqual(mock_encoding.call_count, 2)
+
+        # Nothing is loaded after startup
+        self.assertEqual(Tokenizer.get_shared("gpt-4").encoding, 'encoding_gpt-4')
+        self.assertEqual(mock_encoding.call_count, 2)
+
     def test_num_tokens_from_empty_string(self):
         self.assertEqual(self.tokenizer.num_tokens_from_string(""), 0)
 
@@ -175,6 +216,70 @@ class TestTokenizer(unittest.TestCase):
                 total_tokens = self.tokenizer.calculate_thread_tokens(adjusted_messages)
                 self.assertEqual(total_tokens, expected_total_tokens)
 
+    def test_calculate_thread_tokens_counts_each_message_once(self):
+        def thread_message(message_id, text):
+            return MagicMock(id=message_id, content=[MagicMock(type='text', text=MagicMock(value=text))])
+
+        first_turn = [thread_message('msg_2', 'World'), thread_message('msg_1', 'Hello')]
+        second_turn = [thread_message('msg_3', 'Again'), *first_turn]
+
+        with patch.object(self.tokenizer, 'num_tokens_from_string', wraps=self.tokenizer.num_tokens_from_string) as mock_count:
+            self.assertEqual(self.tokenizer.calculate_thread_tokens(first_turn), 10)
+            self.assertEqual(self.tokenizer.calculate_thread_tokens(second_turn), 15)
+
+        self.assertEqual([call.args[0] for call in mock_count.call_args_list], ['World', 'Hello', 'Again'])
+
+    @patch.object(Tokenizer, 'MESSAGE_TOKENS_CACHE_SIZE', 2)
+    def test_message_tokens_cache_is_bounded(self):
+        messages = [MagicMock(id=f'msg_{i}', content=[MagicMock(type='text', text=MagicMock(value='Hi'))]) for i in range(3)]
+
+        self.tokenizer.calculate_thread_tokens(messages[:2])
+        self.tokenizer.num_tokens_from_message(messages[0])  # msg_1 becomes the least recently used
+        self.tokenizer.num_tokens_from_message(messages[2])
+
+        self.assertEqual(list(Tokenizer._message_tokens), [('gpt-3.5-turbo', 'msg_0'), ('gpt-3.5-turbo', 'msg_2')])
+
+    @patch.object(Tokenizer, 'MESSAGE_TOKENS_CACHE_SIZE', 50)
+    def test_message_tokens_cache_is_shared_by_threads(self):
+        messages = [MagicMock(id=f'msg_{i % 100}', content=[MagicMock(type='text', text=MagicMock(value='Hi'))]) for i in range(2000)]
+
+        with ThreadPoolExecutor(4) as executor:
+            totals = list(executor.map(lambda index: self.tokenizer.calculate_thread_tokens(messages[index::8]), range(8)))
+
+        self.assertEqual(sum(totals), 4000)
+        self.assertEqual(len(Tokenizer._message_tokens), 50)
+
+    @patch.object(Tokenizer, 'CHUNK_SIZE', 10)
+    def test_split_text_before_spaces(self):
+        text = 'Hello world,  how are you? ' + 'x' * 25
+
+        chunks = self.tokenizer._split_text(text)
+
+        self.assertEqual(''.join(chunks), text)
+        self.assertEqual(chunks[:4], ['Hello', ' world,', '  how are', ' you?'])
+        self.assertTrue(all(len(chunk) <= Tokenizer.CHUNK_SIZE for chunk in chunks))
+        self.assertEqual(self.tokenizer._split_text('short'), ['short'])
+
+    @patch.object(Tokenizer, 'CHUNK_SIZE', 10)
+    def test_num_tokens_from_strings(self):
+        self.tokenizer.encoding.encode_ordinary = MagicMock(side_effect=lambda x: x.split())
+        strings = ['one two three four five six seven', '', 'eight']
+
+        self.assertEqual(self.tokenizer.num_tokens_from_strings(strings), [7, 0, 1])
+        self.assertEqual(asyncio.run(self.tokenizer.count_tokens(strings)), [7, 0, 1])
+        self.assertEqual(self.tokenizer.num_tokens_from_strings([]), [])
+
+    @patch.object(Tokenizer, 'CHUNK_SIZE', 10)
+    def test_count_tokens_uses_the_shared_thread_pool(self):
+        self.tokenizer.encoding.encode_ordinary = MagicMock(side_effect=lambda x: x.split())
+        strings = ['one two three four five six seven', 'eight']
+
+        with patch('lib.openai.tokenizer.ThreadPoolExecutor') as mock_executor:
+            self.assertEqual(asyncio.run(self.tokenizer.count_tokens(strings)), [7, 1])
+            self.assertEqual(self.tokenizer.num_tokens_from_strings(strings), [7, 1])
+
+        mock_executor.assert_not_called()
+
     @patch('lib.openai.tokenizer.Assistant')
     def test_calculate_assistant_prompt_tokens(self, mock_assistant):
         test_cases = [
@@ -182,14 +287,22 @@ class TestTokenizer(unittest.TestCase):
             ("", 0),  # Empty prompt
             ("A longer prompt sentence for testing.", 37),  # Longer prompt
         ]
+        mock_openai_client = MagicMock()
+        mock_assistant.side_effect = lambda assistant_id=None: Assistant(mock_openai_client, 'assistant_id')
+        self.addCleanup(Assistant.invalidate)
         for prompt_text, expected_token_count in test_cases:
             with self.subTest(prompt_text=prompt_text):
-                mock_assistant.return_value.prompt.return_value = prompt_text
-                actual_token_count = self.tokenizer.calculate_assistant_prompt_tokens()
+                Assistant.invalidate()
+                mock_openai_client.beta.assistants.retrieve = AsyncMock(return_value=MagicMock(instructions=prompt_text))
+                actual_token_count = asyncio.run(self.tokenizer.calculate_assistant_prompt_tokens())
                 self.assertEqual(actual_token_count, expected_token_count)
 
+                # Cached with the assistant's metadata
+                self.assertEqual(asyncio.run(self.tokenizer.calculate_assistant_prompt_tokens()), expected_token_count)
+                mock_openai_client.beta.assistants.retrieve.assert_awaited_once()
+
     @patch('lib.openai.tokenizer.Tokenizer.calculate_thread_tokens')
-    @patch('lib.openai.tokenizer.Tokenizer.calculate_assistant_prompt_tokens')
+    @patch('lib.openai.tokenizer.Tokenizer.calculate_assistant_prompt_tokens', new_callable=AsyncMock)
     def test_calculate_thread_total_amount(self, mock_calculate_prompt_tokens, mock_calculate_thread_tokens):
         test_cases = [
             # Test case format: (thread_tokens, prompt_tokens, expected_total_cost)
@@ -202,8 +315,13 @@ class TestTokenizer(unittest.TestCase):
             with self.subTest(thread_tokens=thread_tokens, prompt_tokens=prompt_tokens):
                 mock_calculate_thread_tokens.return_value = thread_tokens
                 mock_calculate_prompt_tokens.return_value = prompt_tokens
-                actual_total_cost = self.tokenizer.calculate_thread_total_amount([])
+                actual_total_cost = asyncio.run(self.tokenizer.calculate_thread_total_amount([]))
                 self.assertEqual(actual_total_cost, expected_total_cost)
 
+    def test_tokens_to_money_from_usage(self):
+        # 1000 input tokens cost $0.001 and 1000 output tokens $0.002, plus the profit margin
+        self.assertEqual(self.tokenizer.tokens_to_money_from_usage(10000, 5000), Decimal('0.01') + Decimal('0.01'))
+        self.assertEqual(self.tokenizer.tokens_to_money_from_usage(0, 0), Decimal('0.006'))
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,16 @@
 import unittest
 from unittest.mock import Mock, AsyncMock, patch
 from lib.telegram.bots.base_bot import BaseBot
+from lib.telegram.bots.bot_config import BotConfig
+from lib.telegram.chat_scheduler import ChatScheduler
 from telegram import Update, User, CallbackQuery
 from telegram.ext import CallbackContext
 from db.models.conversation import Conversation
 from lib.openai.assistant import Assistant
 from sqlalchemy.exc import SQLAlchemyError
+from lib.deadline import DeadlineExceeded
 import asyncio
+from decimal import Decimal
 
 class TestBaseBot(unittest.TestCase):
 
@@ -21,9 +25,15 @@ class TestBaseBot(unittest.TestCase):
         self.mock_builder = patcher.start()
         self.mock_application = self.mock_builder.return_value
         self.mock_application.token.return_value = self.mock_application
+        self.mock_application.concurrent_updates.return_value = self.mock_application
         self.mock_application.build.return_value = Mock()
         self.addCleanup(patcher.stop)
 
+        # No warm threads, so the pool never calls OpenAI in the background
+        patcher = patch.object(BaseBot, 'THREAD_POOL_SIZE', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         self.bot = BaseBot()
 
     @patch('lib.telegram.bots.base_bot.Assistant')
@@ -34,6 +44,7 @@ class TestBaseBot(unittest.TestCase):
         mock_builder = Mock()
         mock_Application.builder.return_value = mock_builder
         mock_builder.token.return_value = mock_builder
+        mock_builder.concurrent_updates.return_value = mock_builder
         mock_builder.build.return_value = Mock()
 
         # Initialize BaseBot
@@ -67,6 +78,7 @@ class TestBaseBot(unittest.TestCase):
         mock_builder = Mock()
         mock_Application.builder.return_value = mock_builder
         mock_builder.token.return_value = mock_builder
+        mock_builder.concurrent_updates.return_value = mock_builder
         mock_builder.build.return_value = Mock()
 
         # Initialize BaseBot
@@ -75,15 +87,30 @@ class TestBaseBot(unittest.TestCase):
         # Assert the builder pattern is used correctly
         mock_Application.builder.assert_called_once()
         mock_builder.token.assert_called_once_with(base_bot.TELEGRAM_BOT_TOKEN)
+        scheduler, = mock_builder.concurrent_updates.call_args.args
+        self.assertIsInstance(scheduler, ChatScheduler)
+        self.assertEqual(scheduler.max_active_chats, BaseBot.CONCURRENT_UPDATES)
         mock_builder.build.assert_called_once()
 
+    @patch('lib.telegram.bots.base_bot.Application')
+    def test_concurrent_updates_from_config(self, mock_Application):
+        mock_builder = mock_Application.builder.return_value
+        mock_builder.token.return_value = mock_builder
+        mock_builder.concurrent_updates.return_value = mock_builder
+
+        BaseBot(BotConfig('diet', 'diet-token', 'diet-assistant-id', concurrent_updates=4))
+
+        scheduler, = mock_builder.concurrent_updates.call_args.args
+        self.assertEqual(scheduler.max_active_chats, 4)
+
     @patch('lib.telegram.bots.base_bot.SessionLocal')
     @patch('lib.telegram.bots.base_bot.Assistant')
+    @patch.object(Assistant, 'ASSISTANT_ID', 'mock_assistant_id')  # Read from ASSISTANT_ID on import
     def test_create_conversation(self, mock_assistant, mock_session_local):
         # Mocking the openai client and the database session
         mock_openai_client = Mock()
         mock_thread = Mock(id='mock_thread_id')
-        mock_openai_client.beta.threads.create.return_value = mock_thread
+        mock_openai_client.beta.threads.create = AsyncMock(return_value=mock_thread)
         mock_assistant.return_value.get_openai_client.return_value = mock_openai_client
 
         mock_session = Mock()
@@ -102,10 +129,10 @@ class TestBaseBot(unittest.TestCase):
 
         # Initializing BaseBot and calling _create_conversation
         base_bot = BaseBot()
-        conversation = base_bot._create_conversation(mock_session, mock_update)
+        conversation = asyncio.run(base_bot._create_conversation(mock_session, mock_update))
 
         # Assertions
-        mock_openai_client.beta.threads.create.assert_called_once()
+        mock_openai_client.beta.threads.create.assert_awaited_once()
         self.assertIsInstance(conversation, Conversation)
         self.assertEqual(conversation.user_id, 123)
         self.assertEqual(conversation.language_code, 'en')
@@ -223,7 +250,7 @@ class TestBaseBot(unittest.TestCase):
             mock_session.query().filter_by.return_value.first.return_value = mock_conversation
 
             # Mock OpenAI delete thread call
-            with patch('openai.resources.beta.threads.Threads.delete') as mock_delete_thread:
+            with patch('openai.resources.beta.threads.AsyncThreads.delete', new_callable=AsyncMock) as mock_delete_thread:
                 mock_delete_thread.return_value = None
 
                 mock_update = Mock(spec=Update)
@@ -233,6 +260,7 @@ class TestBaseBot(unittest.TestCase):
                 mock_update.message = Mock(from_user=mock_user, chat=mock_chat)
 
                 mock_context.bot.send_message = AsyncMock()
+                self.bot.thread_pool = Mock(acquire=AsyncMock(return_value='new_thread_id'))
 
                 await self.bot.finish(mock_update, mock_context)
                 mock_context.bot.send_message.assert_awaited()
@@ -346,25 +374,101 @@ class TestBaseBot(unittest.TestCase):
         # Assert that payment's send_invoice method is called with the correct arguments
         base_bot.payment.send_invoice.assert_awaited_once_with(mock_update, mock_context, from_button=False)
 
+    @patch('lib.telegram.bots.base_bot._', side_effect=lambda text: text)
+    @patch('lib.telegram.bots.base_bot.change_language')
+    def test_reply_busy(self, mock_change_language, mock_gettext):
+        mock_update = Mock()
+        mock_update.message.from_user.language_code = 'en'
+        mock_update.message.reply_text = AsyncMock()
+
+        asyncio.run(self.bot.reply_busy(mock_update, False))
+        mock_change_language.assert_called_once_with('en')
+        mock_update.message.reply_text.assert_awaited_once_with("The bot is busy right now. Please try again in a minute.")
+
+        mock_update.message.reply_text.reset_mock()
+        asyncio.run(self.bot.reply_busy(mock_update, True))
+        self.assertIn("can't process files and videos", mock_update.message.reply_text.await_args.args[0])
+
+    @patch('lib.telegram.bots.base_bot._', side_effect=lambda text: text)
+    def test_handle_interaction_deadline_exceeded(self, mock_gettext):
+        request = Mock()
+        request.context.bot.send_message = AsyncMock()
+        self.bot._get_or_create_conversation = AsyncMock(return_value=Mock(balance=10, language_code='en'))
+        self.bot.process_message = AsyncMock(side_effect=DeadlineExceeded('download', 30))
+
+        self.assertFalse(asyncio.run(self.bot.handle_interaction(request)))
+
+        # Not retried, the user is told right away
+        self.bot.process_message.assert_awaited_once()
+        request.context.bot.send_message.assert_awaited_once_with(
+            request.chat_id, "Sorry, answering took too long. Please try again.")
+
+    def test_scheduler_admission_filters(self):
+        text_update = Update.de_json({'update_id': 1, 'message': {
+            'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': 'Hello'}}, None)
+        command_update = Update.de_json({'update_id': 2, 'message': {
+            'message_id': 2, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': '/balance',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 8}]}}, None)
+        video_update = Update.de_json({'update_id': 3, 'message': {
+            'message_id': 3, 'date': 0, 'chat': {'id': 1, 'type': 'private'},
+            'video': {'file_id': 'id', 'file_unique_id': 'uid', 'width': 1, 'height': 1, 'duration': 1}}}, None)
+
+        self.assertTrue(self.bot.scheduler.is_sheddable(text_update))
+        self.assertFalse(self.bot.scheduler.is_sheddable(command_update))
+        self.assertFalse(self.bot.scheduler.is_expensive(text_update))
+        self.assertTrue(self.bot.scheduler.is_expensive(video_update))
+
+    @patch('lib.telegram.bots.base_bot.Helpers.cleanup_folder')
+    def test_update_balance_bills_the_turn(self, mock_cleanup_folder):
+        self.bot.openai = AsyncMock()
+        self.bot.tokenizer = Mock()
+        self.bot.tokenizer.calculate_thread_total_amount = AsyncMock()
+        request = Mock()
+        request.conversation.balance = 10
+        request.thread_run_manager.calculate_turn_amount = AsyncMock(return_value=1)
+
+        asyncio.run(self.bot.update_balance_and_cleanup(request))
+
+        self.bot.openai.beta.threads.messages.list.assert_not_awaited()
+        self.bot.tokenizer.calculate_thread_total_amount.assert_not_awaited()
+        self.assertEqual(request.conversation.balance, 9)
+        request.session.commit.assert_called_once()
+
+    @patch('lib.telegram.bots.base_bot.Helpers.cleanup_folder')
+    def test_update_balance_of_a_swept_conversation_with_low_balance(self, mock_cleanup_folder):
+        self.bot.openai = AsyncMock()
+        self.bot.tokenizer = Mock()
+        self.bot.tokenizer.calculate_thread_total_amount = AsyncMock()
+        request = Mock(thread_run_manager=None)  # process_message wasn't reached
+        request.conversation.thread_id = None
+        request.conversation.balance = Decimal('0.001')
+
+        asyncio.run(self.bot.update_balance_and_cleanup(request))
+
+        self.bot.openai.beta.threads.messages.list.assert_not_awaited()
+        self.bot.tokenizer.calculate_thread_total_amount.assert_not_awaited()
+        mock_cleanup_folder.assert_not_called()
+        self.assertEqual(request.conversation.balance, Decimal('0.001'))
+
     @patch('lib.telegram.bots.base_bot.Application')
     def test_run(self, mock_Application):
         # Mock the Application builder and its methods
         mock_builder = Mock()
         mock_Application.builder.return_value = mock_builder
         mock_builder.token.return_value = mock_builder
+        mock_builder.concurrent_updates.return_value = mock_builder
         mock_builder.build.return_value = Mock()
 
         # Initialize BaseBot
         base_bot = BaseBot()
 
-        # Mock the run_polling method
-        mock_builder.build.return_value.run_polling = Mock()
-
         # Run the bot
-        base_bot.run()
+        with patch('lib.telegram.bots.base_bot.BotHost') as mock_bot_host:
+            base_bot.run()
 
-        # Assert that run_polling is called
-        mock_builder.build.return_value.run_polling.assert_called_once()
+        # Assert that the bot is run by a host, which drains the updates on shutdown
+        mock_bot_host.assert_called_once_with([base_bot])
+        mock_bot_host.return_value.run.assert_called_once()
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import gc
+import time
+import unittest
+from unittest.mock import Mock, AsyncMock, patch
+from telegram import Update
+from lib.telegram.bots.base_bot import BaseBot
+
+class TestBaseBotLoad(unittest.IsolatedAsyncioTestCase):
+    """
+    Load test for concurrent update processing.
+
+    Every simulated update spends RUN_DURATION seconds waiting on the assistant run,
+    so with per-update request contexts the throughput should grow with the number
+    of chats handled at the same time.
+    """
+
+    RUN_DURATION = 0.1
+
+    def setUp(self):
+        patcher = patch('telegram.ext.Application.builder')
+        self.mock_builder = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('lib.telegram.bots.base_bot.Assistant')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.bot = BaseBot()
+        self.runs = 0
+        self.bot.session_scope = Mock()
+        self.bot.session_scope.return_value.__enter__ = Mock(return_value=Mock())
+        self.bot.session_scope.return_value.__exit__ = Mock(return_value=False)
+        self.bot.update_balance_and_cleanup = AsyncMock()
+        self.handled = {}
+        self.managers = []
+
+        async def handle_interaction(request):
+            request.conversation = Mock(user_id=request.update.message.from_user.id)
+            request.thread_run_manager = Mock()
+            request.thread_run_manager.add_messages = AsyncMock()
+            request.thread_run_manager.interrupt_answer = AsyncMock()
+            request.thread_run_manager.wait_for_run_end = AsyncMock()
+            self.managers.append(request.thread_run_manager)
+
+            async def manage_run(new_messages=None):
+                await asyncio.sleep(self.RUN_DURATION)
+                # The request must still point to its own chat after the others have run
+                self.handled[request.chat_id] = request.conversation.user_id
+                self.runs += 1
+
+            request.thread_run_manager.manage_run = manage_run
+            return True
+
+        self.bot.handle_interaction = handle_interaction
+
+    def _create_update(self, chat_id):
+        update = Mock()
+        update.message.chat_id = chat_id
+        update.message.from_user.id = chat_id
+        update.message.text = 'Hello'
+        update.message.document = None
+        return update
+
+    async def _measure_throughput(self, chats):
+        updates = [self._create_update(chat_id) for chat_id in range(chats)]
+        # A full collection of the objects left by earlier tests would distort the measurement
+        gc.collect()
+        start_time = time.perf_counter()
+        await asyncio.gather(*(self.bot.message_handler(update, Mock()) for update in updates))
+        elapsed = time.perf_counter() - start_time
+        return chats / elapsed
+
+    async def test_throughput_scales_with_concurrent_chats(self):
+        throughput = {}
+        for chats in (1, 4, 16):
+            throughput[chats] = await self._measure_throughput(chats)
+            print(f'{chats} concurrent chats: {throughput[chats]:.1f} updates/sec')
+
+        self.assertGreater(throughput[4], throughput[1] * 2)
+        self.assertGreater(throughput[16], throughput[4] * 2)
+
+    async def test_requests_do_not_share_state(self):
+        await self._measure_throughput(8)
+
+        self.assertEqual(self.handled, {chat_id: chat_id for chat_id in range(8)})
+        self.assertEqual(self.bot.update_balance_and_cleanup.await_count, 8)
+
+    async def test_cancelled_interaction_updates_balance(self):
+        self.RUN_DURATION = 10
+        task = asyncio.create_task(self.bot.scheduler.run(1, self.bot.message_handler(self._create_update(1), Mock())))
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(await self.bot.scheduler.drain(0.01), 1)
+        self.assertTrue(task.cancelled())
+        self.bot.update_balance_and_cleanup.assert_awaited_once()
+        self.assertEqual(self.handled, {})
+
+    def _create_chat_updates(self, count):
+        return [Update.de_json({
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': 0,
+                'chat': {'id': 1, 'type': 'private'},
+                'from': {'id': 1, 'is_bot': False, 'first_name': 'User'},
+                'text': f'Message {update_id}'
+            }
+        }, None) for update_id in range(count)]
+
+    async def test_burst_is_answered_by_one_run(self):
+        self.bot.config.debounce_window = 0.2
+        updates = self._create_chat_updates(3)
+
+        tasks = []
+        for update in updates:
+            tasks.append(asyncio.create_task(self.bot.scheduler.process_update(update, self.bot.message_handler(update, Mock()))))
+            await asyncio.sleep(0.05)
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(self.bot.update_balance_and_cleanup.await_count, 1)
+
+    async def test_latest_message_wins(self):
+        self.bot.config.latest_message_wins = True
+        self.RUN_DURATION = 0.3
+        first_update, second_update = self._create_chat_updates(2)
+
+        first_task = asyncio.create_task(self.bot.scheduler.process_update(
+            first_update, self.bot.message_handler(first_update, Mock())))
+        await asyncio.sleep(0.05)
+        second_task = asyncio.create_task(self.bot.scheduler.process_update(
+            second_update, self.bot.message_handler(second_update, Mock())))
+        await first_task
+        # The first run is cancelled as soon as the second message arrives
+        self.assertEqual(self.runs, 0)
+        await second_task
+
+        self.assertEqual(self.runs, 1)
+        first_manager, second_manager = self.managers
+        first_manager.interrupt_answer.assert_awaited_once()
+        first_manager.wait_for_run_end.assert_awaited_once()
+        second_manager.interrupt_answer.assert_not_awaited()
+        self.assertEqual(self.bot.update_balance_and_cleanup.await_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+from lib.telegram.bots.bot_config import BotConfig
+
+class TestBotConfig(unittest.TestCase):
+
+    @patch('lib.telegram.bots.bot_config.load_dotenv')
+    @patch('os.getenv', side_effect=lambda name: f'{name.lower()}_value')
+    def test_from_env_with_prefix(self, mock_getenv, mock_load_dotenv):
+        config = BotConfig.from_env('DIET')
+
+        self.assertEqual(config.name, 'diet')
+        self.assertEqual(config.telegram_bot_token, 'diet_telegram_bot_token_value')
+        self.assertEqual(config.assistant_id, 'diet_assistant_id_value')
+        self.assertEqual(config.yookassa_api_token, 'diet_yookassa_api_token_value')
+        self.assertEqual(config.stripe_api_token, 'diet_stripe_api_token_value')
+
+    @patch('lib.telegram.bots.bot_config.load_dotenv')
+    @patch('os.getenv', side_effect=lambda name: f'{name.lower()}_value')
+    def test_from_env_without_prefix(self, mock_getenv, mock_load_dotenv):
+        config = BotConfig.from_env()
+
+        self.assertEqual(config.telegram_bot_token, 'telegram_bot_token_value')
+        self.assertEqual(config.assistant_id, 'assistant_id_value')
+
+    @patch('lib.telegram.bots.bot_config.load_dotenv')
+    @patch('os.getenv', side_effect={'DIET_STREAMING_RUNS': 'true', 'DIET_LATEST_MESSAGE_WINS': '1'}.get)
+    def test_from_env_flags(self, mock_getenv, mock_load_dotenv):
+        config = BotConfig.from_env('DIET')
+
+        self.assertTrue(config.streaming_runs)
+        self.assertTrue(config.latest_message_wins)
+        self.assertFalse(BotConfig('diet', 'diet-token', 'diet-assistant-id').latest_message_wins)
+
+    @patch('lib.telegram.bots.bot_config.load_dotenv')
+    @patch('os.getenv', side_effect={'DIET_CONCURRENT_UPDATES': '8', 'DIET_DEBOUNCE_WINDOW': '0.5'}.get)
+    def test_from_env_numbers(self, mock_getenv, mock_load_dotenv):
+        self.assertEqual(BotConfig.from_env('DIET').concurrent_updates, 8)
+        self.assertEqual(BotConfig.from_env('DIET').debounce_window, 0.5)
+        self.assertIsNone(BotConfig.from_env('TRANSLATOR').concurrent_updates)
+        self.assertEqual(BotConfig.from_env('TRANSLATOR').debounce_window, 0)
+
+    def test_for_assistant(self):
+        diet_config = BotConfig('diet', 'diet-token', 'diet-assistant-id', 'diet-yookassa')
+        translator_config = BotConfig('translator', 'translator-token', 'translator-assistant-id', 'translator-yookassa')
+        BotConfig.register(diet_config)
+        BotConfig.register(translator_config)
+
+        self.assertIs(BotConfig.for_assistant('diet-assistant-id'), diet_config)
+        self.assertIs(BotConfig.for_assistant('translator-assistant-id'), translator_config)
+        self.assertIsNone(BotConfig.for_assistant('unknown-assistant-id'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, AsyncMock, patch
+from lib.telegram.bots.base_bot import BaseBot
+from lib.telegram.bots.bot_config import BotConfig
+from lib.telegram.bots.bot_host import BotHost
+
+class TestBotHost(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        patcher = patch('telegram.ext.Application.builder')
+        self.mock_builder = patcher.start()
+        self.mock_builder.return_value.token.return_value = self.mock_builder.return_value
+        self.mock_builder.return_value.concurrent_updates.return_value = self.mock_builder.return_value
+        self.mock_builder.return_value.build.side_effect = self._create_application
+        self.addCleanup(patcher.stop)
+
+        self.diet_bot = BaseBot(BotConfig('diet', 'diet-token', 'diet-assistant-id', 'diet-yookassa'))
+        self.translator_bot = BaseBot(BotConfig('translator', 'translator-token', 'translator-assistant-id', 'translator-yookassa'))
+        for bot in (self.diet_bot, self.translator_bot):
+            bot.run_store = Mock()
+            bot.run_store.list.return_value = []
+
+    def _create_application(self):
+        application = Mock()
+        application.initialize = AsyncMock()
+        application.start = AsyncMock()
+        application.stop = AsyncMock()
+        application.shutdown = AsyncMock()
+        application.updater.start_polling = AsyncMock()
+        application.updater.stop = AsyncMock()
+        return application
+
+    def test_bots_have_separate_config(self):
+        self.assertEqual(self.diet_bot.TELEGRAM_BOT_TOKEN, 'diet-token')
+        self.assertEqual(self.translator_bot.TELEGRAM_BOT_TOKEN, 'translator-token')
+        self.assertEqual(self.diet_bot.assistant.assistant_id, 'diet-assistant-id')
+        self.assertEqual(self.translator_bot.assistant.assistant_id, 'translator-assistant-id')
+        self.assertEqual(self.diet_bot.payment.yookassa_api_token, 'diet-yookassa')
+        self.assertEqual(self.translator_bot.payment.yookassa_api_token, 'translator-yookassa')
+
+    def test_bots_share_openai_client(self):
+        self.assertIs(self.diet_bot.openai, self.translator_bot.openai)
+
+    async def test_serve_starts_and_stops_all_bots(self):
+        host = BotHost([self.diet_bot])
+        host.add_bot(self.translator_bot)
+
+        serve_task = asyncio.create_task(host.serve())
+        await asyncio.sleep(0)
+        for bot in host.bots:
+            bot.application.updater.start_polling.assert_awaited_once()
+            bot.application.start.assert_awaited_once()
+
+        host.stop()
+        await serve_task
+        for bot in host.bots:
+            bot.application.updater.stop.assert_awaited_once()
+            bot.application.stop.assert_awaited_once()
+            bot.application.shutdown.assert_awaited_once()
+
+    async def test_start_bot_resumes_active_runs_first(self):
+        active_run = Mock(run_id='run_id', chat_id=12345)
+        self.diet_bot.run_store.list.return_value = [active_run]
+        resumed = []
+        started = asyncio.Event()
+
+        async def resume_run(run):
+            await started.wait()
+            resumed.append(run)
+
+        async def start():
+            # The resumed runs are queued before the first update is processed
+            self.assertIn(12345, self.diet_bot.scheduler.lanes)
+            started.set()
+
+        self.diet_bot._resume_run = resume_run
+        self.diet_bot.application.start.side_effect = start
+
+        await BotHost()._start_bot(self.diet_bot)
+        await asyncio.gather(*self.diet_bot.resumed_runs)
+
+        self.assertEqual(resumed, [active_run])
+        self.diet_bot.application.start.assert_awaited_once()
+        await self.diet_bot.thread_pool.close()
+
+    async def test_resume_only_owned_chats(self):
+        self.diet_bot.run_store.list.return_value = [Mock(run_id='run_1', chat_id=1), Mock(run_id='run_2', chat_id=2)]
+        self.diet_bot._resume_run = AsyncMock()
+
+        self.assertEqual(await self.diet_bot.resume_active_runs(lambda chat_id: chat_id == 2), 1)
+        await asyncio.gather(*self.diet_bot.resumed_runs)
+
+        self.diet_bot._resume_run.assert_awaited_once_with(self.diet_bot.run_store.list.return_value[1])
+
+if __name__ == '__main__':
+    unittest.main()
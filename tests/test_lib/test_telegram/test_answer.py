@@ -3,7 +3,7 @@ from unittest.mock import Mock, AsyncMock, patch, mock_open
 import tempfile
 import shutil  # Import shutil module
 import os
-from lib.telegram.answer import Answer
+from lib.telegram.answer import Answer, StreamingMessage
 import asyncio
 
 class TestAnswer(unittest.IsolatedAsyncioTestCase):
@@ -29,7 +29,7 @@ class TestAnswer(unittest.IsolatedAsyncioTestCase):
         # Mock the OpenAI API response
         mock_response = Mock()
         mock_response.read.return_value = b'Some audio bytes'  # Corrected to return bytes directly
-        self.mock_openai_client.audio.speech.create.return_value = mock_response
+        self.mock_openai_client.audio.speech.create = AsyncMock(return_value=mock_response)
 
         # Ensure send_voice is an AsyncMock
         self.mock_bot.send_voice = AsyncMock()
@@ -38,13 +38,47 @@ class TestAnswer(unittest.IsolatedAsyncioTestCase):
         await self.answer.answer_with_voice(message)
 
         # Verify that the OpenAI API was called correctly
-        self.mock_openai_client.audio.speech.create.assert_called_once_with(
+        self.mock_openai_client.audio.speech.create.assert_awaited_once_with(
             model="tts-1", voice="nova", input=message
         )
 
         # Verify that the Telegram bot's send_voice method was called
         self.mock_bot.send_voice.assert_awaited_once()
 
+    async def test_streaming_message(self):
+        self.mock_bot.send_message.return_value = Mock(message_id=7)
+        self.mock_bot.edit_message_text = AsyncMock()
+        message = self.answer.start_streaming_message()
+
+        await message.append('Hello')
+        self.mock_bot.send_message.assert_awaited_once_with('chat_id', 'Hello')
+
+        # Edits are throttled until EDIT_INTERVAL seconds have passed
+        await message.append(', world! This is a longer answer.')
+        self.mock_bot.edit_message_text.assert_not_awaited()
+
+        message.last_edit_at -= StreamingMessage.EDIT_INTERVAL
+        await message.append(' Still streaming.')
+        self.mock_bot.edit_message_text.assert_awaited_once_with(
+            'Hello, world! This is a longer answer. Still streaming.', chat_id='chat_id', message_id=7)
+
+        await message.finish('Final answer')
+        self.mock_bot.edit_message_text.assert_awaited_with('Final answer', chat_id='chat_id', message_id=7)
+        self.mock_bot.send_message.assert_awaited_once()
+
+    async def test_streaming_message_splits_long_text(self):
+        self.mock_bot.send_message.side_effect = [Mock(message_id=1), Mock(message_id=2)]
+        self.mock_bot.edit_message_text = AsyncMock()
+        message = self.answer.start_streaming_message()
+
+        await message.append('a' * 10)
+        await message.finish('a' * (StreamingMessage.MAX_MESSAGE_LENGTH + 10))
+
+        self.mock_bot.edit_message_text.assert_awaited_once_with(
+            'a' * StreamingMessage.MAX_MESSAGE_LENGTH, chat_id='chat_id', message_id=1)
+        self.mock_bot.send_message.assert_awaited_with('chat_id', 'a' * 10)
+        self.assertEqual(self.mock_bot.send_message.await_count, 2)
+
     def tearDown(self):
         # Cleanup code to delete the test folder
         if self.temp_dir and os.path.exists(self.temp_dir):
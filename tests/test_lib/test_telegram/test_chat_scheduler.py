@@ -0,0 +1,177 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, AsyncMock
+from telegram import Update
+from lib.deadline import Deadline
+from lib.metrics import Metrics
+from lib.telegram.chat_scheduler import ChatScheduler
+
+class TestChatScheduler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        Metrics.reset()
+        self.scheduler = ChatScheduler(max_active_chats=2, name='test')
+        self.events = []
+        self.running = 0
+        self.max_running = 0
+
+    async def _work(self, chat_id, index, duration=0.01):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.events.append(('start', chat_id, index))
+        await asyncio.sleep(duration)
+        self.events.append(('end', chat_id, index))
+        self.running -= 1
+        return index
+
+    async def test_updates_of_a_chat_run_in_order(self):
+        results = await asyncio.gather(*(self.scheduler.run(1, self._work(1, index)) for index in range(3)))
+
+        self.assertEqual(results, [0, 1, 2])
+        self.assertEqual(self.events, [
+            ('start', 1, 0), ('end', 1, 0),
+            ('start', 1, 1), ('end', 1, 1),
+            ('start', 1, 2), ('end', 1, 2),
+        ])
+
+    async def test_different_chats_run_in_parallel_up_to_the_cap(self):
+        await asyncio.gather(*(self.scheduler.run(chat_id, self._work(chat_id, 0)) for chat_id in range(5)))
+
+        self.assertEqual(self.max_running, 2)
+        self.assertEqual(self.scheduler.lanes, {})
+
+    async def test_metrics(self):
+        await asyncio.gather(*(self.scheduler.run(1, self._work(1, index)) for index in range(3)))
+
+        self.assertEqual(Metrics.get_counter('test.scheduler.processed'), 3)
+        self.assertEqual(Metrics.get_gauge('test.scheduler.queued'), 0)
+        self.assertEqual(Metrics.get_gauge('test.scheduler.active'), 0)
+        self.assertEqual(Metrics.get_gauge('test.scheduler.max_lane_depth'), 3)
+        wait_time = Metrics.get_histogram('test.scheduler.wait_time')
+        self.assertEqual(wait_time.count, 3)
+        self.assertGreaterEqual(wait_time.max, 0.02)
+
+    async def test_failure_does_not_block_the_lane(self):
+        async def fail():
+            raise ValueError('failed')
+
+        with self.assertRaises(ValueError):
+            await self.scheduler.run(1, fail())
+        self.assertEqual(await self.scheduler.run(1, self._work(1, 1)), 1)
+        self.assertEqual(self.scheduler.active, 0)
+
+    async def test_wait_for_next_update(self):
+        async def first_update():
+            return await self.scheduler.wait_for_next_update(1, 1, predicate=lambda update: update == 'message')
+
+        first = asyncio.create_task(self.scheduler.run(1, first_update(), 'message'))
+        await asyncio.sleep(0.01)
+        command = asyncio.create_task(self.scheduler.run(1, self._work(1, 1), 'command'))
+        await asyncio.sleep(0.01)
+        self.assertFalse(first.done())  # Commands don't count as the next update
+
+        message = asyncio.create_task(self.scheduler.run(1, self._work(1, 2), 'message'))
+        self.assertTrue(await asyncio.wait_for(first, 0.5))
+        await asyncio.gather(command, message)
+
+    async def test_wait_for_next_update_timeout(self):
+        async def update():
+            return await self.scheduler.wait_for_next_update(1, 0.01)
+
+        self.assertFalse(await self.scheduler.run(1, update()))
+        self.assertFalse(await self.scheduler.wait_for_next_update(2, 0.01))
+
+    async def test_admission_control(self):
+        rejection_handler = AsyncMock()
+        scheduler = ChatScheduler(
+            max_active_chats=1,
+            name='test',
+            max_queued_updates=4,
+            is_sheddable=lambda update: update != 'command',
+            is_expensive=lambda update: update == 'video',
+            rejection_handler=rejection_handler
+        )
+        # One running update and three waiting ones
+        tasks = [asyncio.create_task(scheduler.process_update('text', self._work(chat_id, 0, 0.05))) for chat_id in range(4)]
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.queued, 3)
+
+        # Expensive updates may fill only half of the queue
+        await scheduler.process_update('video', self._work(10, 0))
+        rejection_handler.assert_awaited_once_with('video', True)
+
+        # Text is still accepted until the queue is full
+        tasks.append(asyncio.create_task(scheduler.process_update('text', self._work(11, 0, 0.05))))
+        await asyncio.sleep(0)
+        await scheduler.process_update('text', self._work(12, 0))
+        rejection_handler.assert_awaited_with('text', False)
+
+        # Updates that are not sheddable are always queued
+        tasks.append(asyncio.create_task(scheduler.process_update('command', self._work(13, 0))))
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(Metrics.get_counter('test.scheduler.rejected'), 2)
+        self.assertEqual(Metrics.get_counter('test.scheduler.rejected_expensive'), 1)
+        self.assertEqual(Metrics.get_counter('test.scheduler.processed'), 6)
+        self.assertNotIn(10, [chat_id for _, chat_id, _ in self.events])
+
+    async def test_drain_waits_for_updates(self):
+        tasks = [asyncio.create_task(self.scheduler.run(1, self._work(1, index))) for index in range(3)]
+        await asyncio.sleep(0)
+
+        self.assertEqual(await self.scheduler.drain(1), 0)
+        self.assertTrue(all(task.done() and not task.cancelled() for task in tasks))
+
+    async def test_drain_cancels_updates_after_timeout(self):
+        cleaned_up = []
+
+        async def run_forever():
+            try:
+                await asyncio.Event().wait()
+            finally:
+                cleaned_up.append(True)
+
+        tasks = [asyncio.create_task(self.scheduler.run(chat_id, run_forever())) for chat_id in range(3)]
+        await asyncio.sleep(0)
+
+        # Two updates are running, the third one waits for a free slot
+        self.assertEqual(await self.scheduler.drain(0.01), 3)
+        self.assertTrue(all(task.cancelled() for task in tasks))
+        self.assertEqual(cleaned_up, [True, True])
+        self.assertEqual(Metrics.get_counter('test.scheduler.drain_cancelled'), 3)
+        self.assertEqual((self.scheduler.queued, self.scheduler.active), (0, 0))
+
+    async def test_process_update_uses_the_chat_of_the_update(self):
+        update = Mock(spec=Update)
+        update.effective_chat.id = 42
+        self.scheduler.run = Mock(side_effect=lambda chat_id, coroutine, update: coroutine)
+
+        await self.scheduler.process_update(update, self._work(42, 0))
+
+        self.scheduler.run.assert_called_once()
+        self.assertEqual(self.scheduler.run.call_args.args[0], 42)
+
+    async def test_deadline_starts_when_the_update_arrives(self):
+        first, second = Mock(spec=Update), Mock(spec=Update)
+        first.effective_chat.id = second.effective_chat.id = 1
+        deadlines = {}
+
+        async def handle(update, duration):
+            deadlines[update] = self.scheduler.current_deadline()
+            await asyncio.sleep(duration)
+
+        await asyncio.gather(self.scheduler.process_update(first, handle(first, 0.05)),
+                             self.scheduler.process_update(second, handle(second, 0)))
+
+        # The second update waited for the first one, and that time is already spent
+        self.assertLess(deadlines[second].remaining(), Deadline.TOTAL - 0.04)
+        self.assertIsNot(deadlines[first], deadlines[second])
+
+    def test_deadline_outside_the_scheduler(self):
+        deadline = self.scheduler.current_deadline()
+
+        self.assertIsInstance(deadline, Deadline)
+        self.assertEqual(deadline.name, 'test')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,7 +23,7 @@ class TestPayment(unittest.TestCase):
         self.update.message.from_user.id = 12345
 
         # Call the method
-        await Payment.successful_payment_callback(self.update, self.context)
+        await Payment().successful_payment_callback(self.update, self.context)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+import asyncio
+import queue
+import unittest
+from unittest.mock import AsyncMock, MagicMock, Mock
+from telegram import Update
+from lib.telegram.bots.bot_config import BotConfig
+from lib.telegram.sharded_dispatcher import ShardedDispatcher, _serve_worker
+
+class TestShardedDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = ShardedDispatcher(Mock(), BotConfig('test', 'token', 'assistant-id'), workers=4)
+        self.dispatcher.queues = [queue.Queue() for _ in range(4)]
+        self.dispatcher.processes = [Mock(is_alive=Mock(return_value=True)) for _ in range(4)]
+        self.dispatcher.restarts = [0] * 4
+
+    def _create_update(self, update_id, user_id):
+        return Update.de_json({
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': 0,
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+                'text': f'Message {update_id}'
+            }
+        }, None)
+
+    def test_invalid_number_of_workers(self):
+        with self.assertRaises(ValueError):
+            ShardedDispatcher(Mock(), BotConfig('test', 'token', 'assistant-id'), workers=0)
+
+    def test_updates_of_a_user_go_to_the_same_worker_in_order(self):
+        shards = {self.dispatcher.dispatch(self._create_update(update_id, 42)) for update_id in range(5)}
+
+        self.assertEqual(len(shards), 1)
+        worker_queue = self.dispatcher.queues[shards.pop()]
+        self.assertEqual([worker_queue.get_nowait()['update_id'] for _ in range(5)], list(range(5)))
+
+    def test_users_are_spread_over_the_workers(self):
+        for user_id in range(1000):
+            self.dispatcher.dispatch(self._create_update(user_id, user_id))
+
+        sizes = [worker_queue.qsize() for worker_queue in self.dispatcher.queues]
+        self.assertEqual(sum(sizes), 1000)
+        for size in sizes:
+            self.assertGreater(size, 150)
+
+    def test_update_without_user(self):
+        update = Update.de_json({'update_id': 1}, None)
+
+        self.assertEqual(self.dispatcher.shard_for(update), self.dispatcher.shard_for(Update.de_json({'update_id': 2}, None)))
+
+    def test_stop_sends_stop_signal_to_workers(self):
+        queues = self.dispatcher.queues
+        process = Mock()
+        process.is_alive.return_value = False
+        self.dispatcher.processes = [process]
+
+        self.dispatcher.stop()
+
+        for worker_queue in queues:
+            self.assertIsNone(worker_queue.get_nowait())
+        process.join.assert_called_once_with(ShardedDispatcher.STOP_TIMEOUT)
+        process.terminate.assert_not_called()
+
+    def test_dead_worker_is_restarted_with_its_queue(self):
+        update = self._create_update(1, 42)
+        shard = self.dispatcher.shard_for(update)
+        self.dispatcher.processes[shard].is_alive.return_value = False
+        new_process = Mock()
+        self.dispatcher._start_worker = Mock(return_value=new_process)
+
+        self.dispatcher.dispatch(update)
+
+        self.dispatcher._start_worker.assert_called_once_with(shard, self.dispatcher.queues[shard])
+        self.assertIs(self.dispatcher.processes[shard], new_process)
+        self.assertEqual(self.dispatcher.queues[shard].get_nowait()['update_id'], 1)
+
+    def test_worker_exiting_too_often_stops_the_dispatch(self):
+        update = self._create_update(1, 42)
+        shard = self.dispatcher.shard_for(update)
+        dead_process = Mock(exitcode=1, is_alive=Mock(return_value=False))
+        self.dispatcher.processes[shard] = dead_process
+        self.dispatcher._start_worker = Mock(return_value=dead_process)
+
+        with self.assertRaises(RuntimeError):
+            for _ in range(ShardedDispatcher.MAX_WORKER_RESTARTS + 1):
+                self.dispatcher.check_workers()
+
+        self.assertEqual(self.dispatcher._start_worker.call_count, ShardedDispatcher.MAX_WORKER_RESTARTS)
+        with self.assertRaises(RuntimeError):
+            self.dispatcher.dispatch(update)
+        self.assertTrue(self.dispatcher.queues[shard].empty())
+
+    def test_worker_starts_and_stops_the_bot(self):
+        bot = Mock(application=MagicMock(), start_processing=AsyncMock(), stop_processing=AsyncMock())
+        bot.application.bot = None
+        bot.application.update_queue.put = AsyncMock()
+        worker_queue = queue.Queue()
+        worker_queue.put(self._create_update(1, 42).to_dict())
+        worker_queue.put(None)
+        shard = ShardedDispatcher.shard_for_key(42, 4)
+
+        asyncio.run(_serve_worker(Mock(return_value=bot), self.dispatcher.config, shard, 4, worker_queue))
+
+        bot.start_processing.assert_awaited_once()
+        owns_chat, = bot.start_processing.call_args.args
+        self.assertTrue(owns_chat(42))
+        self.assertFalse(owns_chat(next(chat_id for chat_id in range(100) if ShardedDispatcher.shard_for_key(chat_id, 4) != shard)))
+        bot.application.update_queue.put.assert_awaited_once()
+        bot.stop_processing.assert_awaited_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+from aiohttp.test_utils import TestClient, TestServer
+from lib.metrics import Metrics
+from lib.telegram.webhook_server import WebhookServer
+
+class TestWebhookServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.application = Mock()
+        self.application.bot = None
+        self.application.update_queue = asyncio.Queue()
+
+        self.server = WebhookServer()
+        self.server.add_application('translator', self.application, 'secret')
+        self.client = TestClient(TestServer(self.server.create_app()))
+        await self.client.start_server()
+
+        self.update = {
+            'update_id': 1,
+            'message': {
+                'message_id': 1,
+                'date': 0,
+                'chat': {'id': 456, 'type': 'private'},
+                'text': 'Hello'
+            }
+        }
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_update_with_valid_secret_token(self):
+        response = await self.client.post('/translator', json=self.update, headers={WebhookServer.SECRET_TOKEN_HEADER: 'secret'})
+
+        self.assertEqual(response.status, 200)
+        update = self.application.update_queue.get_nowait()
+        self.assertEqual(update.update_id, 1)
+        self.assertEqual(update.message.text, 'Hello')
+
+    async def test_update_with_invalid_secret_token(self):
+        response = await self.client.post('/translator', json=self.update, headers={WebhookServer.SECRET_TOKEN_HEADER: 'wrong'})
+
+        self.assertEqual(response.status, 403)
+        self.assertTrue(self.application.update_queue.empty())
+
+    async def test_update_without_secret_token(self):
+        response = await self.client.post('/translator', json=self.update)
+
+        self.assertEqual(response.status, 403)
+        self.assertTrue(self.application.update_queue.empty())
+
+    async def test_invalid_json(self):
+        response = await self.client.post('/translator', data='not json', headers={WebhookServer.SECRET_TOKEN_HEADER: 'secret'})
+
+        self.assertEqual(response.status, 400)
+
+    async def test_health(self):
+        response = await self.client.get(WebhookServer.HEALTH_PATH)
+
+        self.assertEqual(response.status, 200)
+
+    async def test_metrics(self):
+        Metrics.reset()
+        Metrics.increment('translator.scheduler.processed')
+
+        response = await self.client.get(WebhookServer.METRICS_PATH)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual((await response.json())['counters'], {'translator.scheduler.processed': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,9 @@ from translator_bot import main
 
 class TestTranslatorBot(unittest.TestCase):
 
+    @patch('translator_bot.create_tables')
     @patch('translator_bot.TranslatorBot')
-    def test_main_initialization(self, mock_translator_bot_class):
+    def test_main_initialization(self, mock_translator_bot_class, mock_create_tables):
         # Mock the TranslatorBot instance
         mock_bot_instance = MagicMock()
         mock_translator_bot_class.return_value = mock_bot_instance
@@ -13,7 +14,8 @@ class TestTranslatorBot(unittest.TestCase):
         # Call the main function
         main()
 
-        # Assert that the TranslatorBot was instantiated
+        # Assert that the tables were created and the TranslatorBot was instantiated
+        mock_create_tables.assert_called_once()
         mock_translator_bot_class.assert_called_once()
 
         # Assert that the run method was called on the bot instance
@@ -6,9 +6,11 @@ import sys
 # Adjust the path as necessary
 sys.path.append('/home/impotepus/aihelper/lib')
 
+from db.engine import create_tables
 from lib.telegram.bots.translator_bot import TranslatorBot
 
 def main():
+    create_tables()
     bot = TranslatorBot()
     bot.run()
 
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import os
+import secrets
+import sys
+from dotenv import load_dotenv
+from db.engine import create_tables
+from lib.telegram.bots.bot_config import BotConfig
+from lib.telegram.bots.diet_bot import DietBot
+from lib.telegram.bots.translator_bot import TranslatorBot
+
+BOTS = {
+    'diet': DietBot,
+    'translator': TranslatorBot,
+}
+
+def main():
+    load_dotenv()
+
+    if len(sys.argv) != 2 or sys.argv[1] not in BOTS:
+        print(f"Usage: {sys.argv[0]} {{{'|'.join(BOTS)}}}")
+        sys.exit(1)
+
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if not webhook_url:
+        print("Environment variable WEBHOOK_URL is not set.")
+        sys.exit(1)
+
+    create_tables()
+    name = sys.argv[1]
+    config = BotConfig.from_env(name.upper())
+    if config.concurrent_updates is None and os.getenv('WEBHOOK_CONCURRENT_UPDATES'):
+        config.concurrent_updates = int(os.getenv('WEBHOOK_CONCURRENT_UPDATES'))
+
+    bot = BOTS[name](config)
+    bot.run_webhook(
+        webhook_url=f"{webhook_url.rstrip('/')}/{name}",
+        listen=os.getenv('WEBHOOK_LISTEN', '0.0.0.0'),
+        port=int(os.getenv('WEBHOOK_PORT', 8443)),
+        url_path=name,
+        secret_token=os.getenv('WEBHOOK_SECRET_TOKEN') or secrets.token_urlsafe(32),
+        max_connections=int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+    )
+
+if __name__ == "__main__":
+    main()